@@ -0,0 +1,161 @@
+"""
+Benchmark: instanced dots (pacman_dots.DotCloud, one point mesh + geometry nodes, one
+material) against one UV sphere object and one material per dot, as create_dots did.
+
+Headless, it checks the dot index bookkeeping: games of pacman_sim.PacmanSim on the game
+maze and on generated ones, with a scripted input (with and without ghosts), hide the dot of every 'eat_dot' event;
+each eaten dot must still be visible and lie within the 0.8 collision distance of where
+pacman moved that tick, and at the end the visible mask must equal the simulation's live
+dots. Inside Blender it also reports scene setup time and per-eat latency (including the
+depsgraph update) of both ways:
+
+    python bench_pacman_dots.py
+    blender --background --python bench_pacman_dots.py -- --sizes 21 41 --eats 100
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pacman_grid import generate_maze
+from pacman_sim import PacmanSim, MAZE_LAYOUT, MAZE_ORIGIN, GHOSTS_START, DIRECTIONS
+from pacman_dots import DotCloud
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def check_bookkeeping(sim, ticks, hold, seed):
+    rng = random.Random(seed)
+    dots = DotCloud(sim.grid.dot_locations())
+    eaten = 0
+    while sim.ticks < ticks and not sim.game_over:
+        sim.direction = rng.choice(DIRECTIONS)
+        for _ in range(hold):
+            # Where pacman moves to this tick (a death in the same tick sends it back to the start)
+            x, y, _ = sim.pacman_location
+            x, y = x + sim.direction[0] * 0.5, y + sim.direction[1] * 0.5
+            sim.step(1)
+            for event, value in sim.drain_events():
+                if event != "eat_dot":
+                    continue
+                if not dots.visible[value]:
+                    sys.exit(f"Dot {value} eaten twice")
+                dx, dy, _ = dots.locations[value]
+                if math.hypot(x - dx, y - dy) >= 0.8:
+                    sys.exit(f"Dot {value} at {(dx, dy)} eaten by pacman at {(x, y)}")
+                dots.hide(value)
+                eaten += 1
+    alive = np.frombuffer(bytes(sim.dot_alive), dtype=np.uint8).astype(bool)
+    if not np.array_equal(dots.visible, alive) or dots.remaining() != sim.dots_left:
+        sys.exit("Dot mask and simulation disagree")
+    return eaten, len(dots)
+
+
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for collection in (bpy.data.meshes, bpy.data.materials, bpy.data.node_groups):
+        for block in list(collection):
+            collection.remove(block)
+
+
+def basic_material(color):
+    mat = bpy.data.materials.new(name="Basic")
+    mat.use_nodes = False
+    mat.diffuse_color = color
+    return mat
+
+
+def setup_objects(locations):
+    # create_dots as it was: one sphere operator call and one material per dot
+    for location in locations:
+        bpy.ops.mesh.primitive_uv_sphere_add(segments=32, ring_count=16, location=location, radius=0.1)
+        dot = bpy.context.active_object
+        dot.name = "Dot"
+        dot.data.materials.append(basic_material((2, 2, 2, 1)))
+    bpy.context.view_layer.update()
+
+
+def eat_object(pos):
+    # move_pacman as it was: find the dot by position among all objects, then delete it
+    bpy.ops.object.select_all(action='DESELECT')
+    for obj in bpy.data.objects:
+        if ((obj.location[0]-pos[0])**2 + (obj.location[1]-pos[1])**2 + (obj.location[2]-pos[2])**2) <= 0.1:
+            obj.select_set(True)
+            bpy.data.objects.remove(obj)
+            bpy.ops.object.delete()
+            break
+    bpy.context.view_layer.update()
+
+
+def setup_instanced(locations):
+    dots = DotCloud(locations)
+    dots.create_object(basic_material((2, 2, 2, 1)), radius=0.1)
+    bpy.context.view_layer.update()
+    return dots
+
+
+def eat_instanced(dots, dot):
+    dots.hide(dot)
+    bpy.context.view_layer.update()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[21, 41], help="Generated maze sizes")
+    parser.add_argument("--ticks", type=int, default=20000, help="Ticks per bookkeeping game")
+    parser.add_argument("--eats", type=int, default=100, help="Dots eaten for the per-eat latency")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    mazes = [("game maze", MAZE_LAYOUT, MAZE_ORIGIN, GHOSTS_START)]
+    for size in args.sizes:
+        layout = generate_maze(size, size, seed=args.seed)
+        free = [(x - 1, y - 1, 0) for y, row in enumerate(layout) for x, c in enumerate(row)
+                if c != "#" and abs(x - 1) + abs(y - 1) > 4]
+        mazes.append((f"{size}x{size}", layout, (-1, -1), random.Random(args.seed).sample(free, 3)))
+
+    header = f"{'maze':<12}{'dots':>7}{'eaten':>7}{'bookkeeping':>13}"
+    if bpy is not None:
+        header += f"{'objects setup s':>17}{'instanced setup s':>19}{'objects eat ms':>16}{'instanced eat ms':>18}"
+    print(header)
+    for name, layout, origin, ghosts in mazes:
+        # With ghosts (deaths in the middle of eating) and without (pacman clears a larger part of the maze)
+        eaten = 0
+        for ghosts_start in (ghosts, []):
+            sim = PacmanSim(layout, origin=origin, ghosts_start=ghosts_start, lives=10**6)
+            n, n_dots = check_bookkeeping(sim, args.ticks, 8, args.seed)
+            eaten += n
+        row = f"{name:<12}{n_dots:>7}{eaten:>7}{'ok':>13}"
+        if bpy is not None:
+            locations = sim.grid.dot_locations()
+            order = random.Random(args.seed).sample(range(len(locations)), min(args.eats, len(locations)))
+            clear_scene()
+            setup_old, _ = timed(setup_objects, locations)
+            eat_old, _ = timed(lambda: [eat_object(locations[i]) for i in order])
+            clear_scene()
+            setup_new, dots = timed(setup_instanced, locations)
+            eat_new, _ = timed(lambda: [eat_instanced(dots, i) for i in order])
+            clear_scene()
+            row += (f"{setup_old:>17.3f}{setup_new:>19.3f}{eat_old / len(order) * 1e3:>16.3f}"
+                    f"{eat_new / len(order) * 1e3:>18.3f}")
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
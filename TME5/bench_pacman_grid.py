@@ -0,0 +1,138 @@
+"""
+Benchmark: grid-indexed collisions (pacman_grid.MazeGrid, through pacman_sim.PacmanSim)
+against the linear scans of wall_position / dot_position that PacmanGame used, on large
+generated mazes.
+
+Both run the same headless ticks (no Blender): pacman moves by pacman_speed and turns at
+random when blocked, every ghost tests the four directions by ghosts_speed and takes the
+one closest to pacman, as in move_pacman / choose_direction / move_ghosts. The linear
+scans use the simulation's integer positions, so the runs also check that both give the
+same trajectory, score and deaths.
+
+    python bench_pacman_grid.py --sizes 21 101 401 --ticks 3000 --linear-max 101
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pacman_grid import MazeGrid, generate_maze
+from pacman_sim import PacmanSim, DIRECTIONS
+
+PACMAN_SPEED = 0.5
+GHOSTS_SPEED = 0.3
+LIVES = 10**9 # pacman never runs out of lives, deaths are counted
+
+
+class LinearIndex:
+    # The lists PacmanGame scanned on every move, in the simulation's units
+    def __init__(self, grid):
+        res = grid.resolution
+        self.reach2 = grid.reach2
+        self.wall_position = [(int(x) * res, int(y) * res) for y, x in zip(*grid.walls.nonzero())]
+        self.dot_position = [(x * res, y * res) for x, y in grid.dot_cells]
+
+    def hits_wall(self, x, y):
+        for wx, wy in self.wall_position:
+            if (x - wx) ** 2 + (y - wy) ** 2 < self.reach2:
+                return True
+        return False
+
+    def eat_dot(self, x, y):
+        for pos in self.dot_position:
+            if (x - pos[0]) ** 2 + (y - pos[1]) ** 2 < self.reach2:
+                self.dot_position.remove(pos)
+                return True
+        return False
+
+
+def run_linear(grid, ghosts_start, ticks, seed):
+    rng = random.Random(seed)
+    index = LinearIndex(grid)
+    pacman_start = grid.to_units((0, 0))
+    ghosts_start = [grid.to_units(g) for g in ghosts_start]
+    pace, step = grid.units(PACMAN_SPEED), grid.units(GHOSTS_SPEED)
+    limit2 = (30 * grid.resolution) ** 2
+    pacman, direction, ghosts = pacman_start, (0, 0), list(ghosts_start)
+    score, deaths, trace = 0, 0, 0
+    for _ in range(ticks):
+        if direction == (0, 0) or index.hits_wall(pacman[0] + direction[0] * pace, pacman[1] + direction[1] * pace):
+            direction = rng.choice(DIRECTIONS)
+        x, y = pacman[0] + direction[0] * pace, pacman[1] + direction[1] * pace
+        if not index.hits_wall(x, y):
+            if index.eat_dot(x, y):
+                score += 10
+            pacman = (x, y)
+        if not index.dot_position:
+            trace += pacman[0] + 2 * pacman[1]
+            break
+        for i, (gx, gy) in enumerate(ghosts):
+            best, min_d2 = (gx, gy), limit2
+            for dx, dy in DIRECTIONS:
+                nx, ny = gx + dx * step, gy + dy * step
+                if not index.hits_wall(nx, ny):
+                    d2 = (pacman[0] - nx) ** 2 + (pacman[1] - ny) ** 2
+                    if d2 < min_d2:
+                        min_d2, best = d2, (nx, ny)
+            ghosts[i] = best
+            if (best[0] - pacman[0]) ** 2 + (best[1] - pacman[1]) ** 2 < index.reach2:
+                deaths += 1
+                pacman, direction, ghosts = pacman_start, (0, 0), list(ghosts_start)
+                break
+        trace += pacman[0] + 2 * pacman[1]
+    return score, deaths, trace
+
+
+def run_grid(layout, ghosts_start, ticks, seed):
+    rng = random.Random(seed)
+    sim = PacmanSim(layout, origin=(-1, -1), ghosts_start=ghosts_start, pacman_speed=PACMAN_SPEED,
+                    ghosts_speed=GHOSTS_SPEED, lives=LIVES, ghost_mode="greedy")
+    trace = 0
+    for _ in range(ticks):
+        if sim.direction == (0, 0) or not sim.can_move(sim.direction):
+            sim.direction = rng.choice(DIRECTIONS)
+        if not sim.step(1):
+            break
+        trace += sim.pacman[0] + 2 * sim.pacman[1]
+    return sim.score, LIVES - sim.lives, trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[21, 101, 401], help="Maze width = height (odd)")
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--ghosts", type=int, default=3)
+    parser.add_argument("--linear-max", type=int, default=101,
+                        help="Skip the linear scans above this size (they take about half a minute at 101x101)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'maze':>10}{'walls':>9}{'dots':>9}{'index s':>10}{'linear ticks/s':>16}{'grid ticks/s':>14}{'speedup':>9}")
+    for size in args.sizes:
+        layout = generate_maze(size, size, seed=args.seed)
+        # Start in cell (1, 1) at the world origin; ghosts on random free cells
+        start = time.perf_counter()
+        grid = MazeGrid(layout, origin=(-1, -1), start=(0, 0))
+        build = time.perf_counter() - start
+        rng = random.Random(args.seed)
+        ghosts = [grid.location(*rng.choice(grid.dot_cells)) for _ in range(args.ghosts)]
+
+        start = time.perf_counter()
+        grid_result = run_grid(layout, ghosts, args.ticks, args.seed)
+        grid_rate = args.ticks / (time.perf_counter() - start)
+        linear_rate = float("nan")
+        if size <= args.linear_max:
+            start = time.perf_counter()
+            linear_result = run_linear(grid, ghosts, args.ticks, args.seed)
+            linear_rate = args.ticks / (time.perf_counter() - start)
+            if linear_result != grid_result:
+                sys.exit(f"Grid and linear runs differ on the {size}x{size} maze: {grid_result} vs {linear_result}")
+        print(f"{f'{size}x{size}':>10}{int(grid.walls.sum()):>9}{len(grid.dot_cells):>9}{build:>10.3f}"
+              f"{linear_rate:>16.0f}{grid_rate:>14.0f}{grid_rate / linear_rate:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: per-tick ghost cost of flow-field navigation (pacman_nav, ghost_mode "chase")
+against the original greedy rule, for growing ghost counts and maze sizes.
+
+Pacman follows a scripted input (a random direction every --hold ticks) with unlimited
+lives, ghosts start on random free cells. For each run: microseconds per tick on a fresh
+game ("cold", flow fields built as pacman reaches new cells) and when the same game is
+played again with the fields cached (per tick and per ghost, pacman's own move included),
+how many times ghosts caught pacman, the share of ghost moves that stayed in place (greedy
+ghosts stuck behind a wall; chase ghosts only when pacman is out of reach), and the flow
+fields built. The navigator's distances are checked against a plain breadth-first search
+on random cell pairs first.
+
+    python bench_pacman_nav.py --sizes 21 101 401 --ghosts 1 4 16 64 --ticks 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pacman_grid import generate_maze
+from pacman_sim import PacmanSim, DIRECTIONS
+
+
+def bfs_distance(layout, source, target):
+    seen = {source: 0}
+    queue = deque([source])
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == target:
+            return seen[(x, y)]
+        for dx, dy in DIRECTIONS:
+            cell = (x + dx, y + dy)
+            if cell not in seen and layout[cell[1]][cell[0]] != "#":
+                seen[cell] = seen[(x, y)] + 1
+                queue.append(cell)
+    return -1
+
+
+def check_distances(layout, pairs, seed):
+    sim = PacmanSim(layout, origin=(-1, -1), ghosts_start=[])
+    free = [(x, y) for y, row in enumerate(layout) for x, c in enumerate(row) if c != "#"]
+    rng = random.Random(seed)
+    for _ in range(pairs):
+        source, target = rng.choice(free), rng.choice(free)
+        if sim.navigator.distance(source, target) != bfs_distance(layout, source, target):
+            sys.exit(f"Navigator distance {source} -> {target} differs from the BFS")
+
+
+def drive(sim, ticks, hold, seed, stuck=None):
+    # Scripted input; with a `stuck` list, step one tick at a time and count the ghosts that did not move
+    # (a catch resets every position, that tick is not counted)
+    rng = random.Random(seed)
+    done = 0
+    while done < ticks:
+        sim.direction = rng.choice(DIRECTIONS)
+        if stuck is None:
+            done += sim.step(hold)
+        else:
+            for _ in range(hold):
+                before, lives = list(sim.ghosts), sim.lives
+                done += sim.step(1)
+                if sim.lives == lives:
+                    stuck[0] += sum(a == b for a, b in zip(before, sim.ghosts))
+        if sim.game_over:
+            sim.reset()
+
+
+def run(layout, ghosts, mode, ticks, hold, seed):
+    sim = PacmanSim(layout, origin=(-1, -1), ghosts_start=ghosts, lives=10**9, ghost_mode=mode)
+    start = time.perf_counter()
+    drive(sim, ticks, hold, seed)
+    cold = time.perf_counter() - start
+    catches = 10**9 - sim.lives
+    fields = sim.navigator.fields_built if sim.navigator else 0
+    # Same game again: the flow fields of every cell pacman visits are cached now
+    sim.reset()
+    start = time.perf_counter()
+    drive(sim, ticks, hold, seed)
+    warm = time.perf_counter() - start
+    sim.reset()
+    stuck = [0]
+    drive(sim, ticks, hold, seed, stuck)
+    return cold, warm, catches, stuck[0], fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[21, 101, 401])
+    parser.add_argument("--ghosts", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ticks", type=int, default=20000)
+    parser.add_argument("--hold", type=int, default=8, help="Ticks per scripted input")
+    parser.add_argument("--check-pairs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'maze':>9}{'ghosts':>8}{'mode':>8}{'cold us/tick':>14}{'us/tick':>10}{'us/ghost':>10}{'catches':>9}"
+          f"{'stuck':>8}{'fields':>8}")
+    for size in args.sizes:
+        layout = generate_maze(size, size, seed=args.seed)
+        check_distances(layout, args.check_pairs, args.seed)
+        free = [(x - 1, y - 1, 0) for y, row in enumerate(layout) for x, c in enumerate(row)
+                if c != "#" and abs(x - 1) + abs(y - 1) > 4]
+        for n_ghosts in args.ghosts:
+            ghosts = random.Random(args.seed).sample(free, n_ghosts)
+            for mode in ("greedy", "chase"):
+                cold, warm, catches, stuck, fields = run(layout, ghosts, mode, args.ticks, args.hold, args.seed)
+                per_tick = warm / args.ticks * 1e6
+                print(f"{f'{size}x{size}':>9}{n_ghosts:>8}{mode:>8}{cold / args.ticks * 1e6:>14.2f}{per_tick:>10.2f}"
+                      f"{per_tick / n_ghosts:>10.2f}{catches:>9}{stuck / (args.ticks * n_ghosts):>8.1%}{fields:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: building the maze walls as one numpy-built mesh with shared materials
+(pacman_scene) against one cube operator call and one material per wall cell.
+
+Headless, for growing generated mazes it reports the time of wall_mesh_arrays(), the
+vertices and faces of the merged mesh against separate cubes (8 vertices, 6 faces each),
+and the objects and materials a scene needs either way (walls, dots, pacman, 3 ghosts). The
+merged mesh is checked to enclose exactly the wall volume with outward-facing quads
+(divergence theorem). Inside Blender it also times both builds and counts the datablocks:
+
+    python bench_pacman_scene.py --sizes 21 101 401 1001
+    blender --background --python bench_pacman_scene.py -- --sizes 21 41 101
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pacman_grid import MazeGrid, generate_maze
+from pacman_scene import MaterialRegistry, wall_mesh_arrays, create_wall_object
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+HALF_HEIGHT = 0.2
+COLORS = [(0, 0, 1, 1), (2, 2, 2, 1), (1, 1, 0, 1), (0, 0, 0, 1)] # walls, dots, pacman, ghosts
+
+
+def enclosed_volume(verts, quads):
+    # Sum over the two triangles of every quad of the signed tetrahedron volumes against the origin
+    v = verts.astype(np.float64)
+    total = 0.0
+    for a, b, c in ((0, 1, 2), (0, 2, 3)):
+        total += np.einsum("ij,ij->i", v[quads[:, a]], np.cross(v[quads[:, b]], v[quads[:, c]])).sum() / 6.0
+    return total
+
+
+def build_cubes(walls, origin):
+    # create_maze as it was: one cube operator call and one new material per wall cell
+    for y, x in zip(*np.nonzero(walls)):
+        bpy.ops.mesh.primitive_cube_add(location=(x + origin[0], y + origin[1], 0))
+        wall = bpy.context.active_object
+        wall.scale = (0.5, 0.5, 2 * HALF_HEIGHT)
+        mat = bpy.data.materials.new(name="Basic")
+        mat.use_nodes = False
+        mat.diffuse_color = COLORS[0]
+        wall.data.materials.append(mat)
+    bpy.context.view_layer.update()
+
+
+def build_merged(walls, origin):
+    registry = MaterialRegistry()
+    create_wall_object(walls, origin, registry.get(COLORS[0]), half_height=HALF_HEIGHT)
+    bpy.context.view_layer.update()
+
+
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for collection in (bpy.data.meshes, bpy.data.materials):
+        for block in list(collection):
+            collection.remove(block)
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[21, 101, 401, 1001])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    header = (f"{'maze':>11}{'walls':>9}{'build ms':>10}{'cube verts':>12}{'verts':>10}{'cube faces':>12}{'faces':>10}"
+              f"{'objects':>16}{'materials':>16}")
+    if bpy is not None:
+        header += f"{'cubes s':>10}{'merged s':>10}{'blender objs/mats':>20}"
+    print(header)
+    for size in args.sizes:
+        grid = MazeGrid(generate_maze(size, size, seed=args.seed), origin=(-1, -1))
+        walls = grid.walls
+        n_walls = int(walls.sum())
+        start = time.perf_counter()
+        verts, quads = wall_mesh_arrays(walls, grid.origin, half_height=HALF_HEIGHT)
+        build = time.perf_counter() - start
+        volume = enclosed_volume(verts, quads)
+        if not np.isclose(volume, n_walls * 2 * HALF_HEIGHT, rtol=1e-6):
+            sys.exit(f"{size}x{size}: merged walls enclose {volume}, expected {n_walls * 2 * HALF_HEIGHT}")
+        # Objects / materials: one per wall, dot, pacman and ghost before; walls, dots, pacman and 3 ghosts now,
+        # with one material per color
+        n_dots = len(grid.dot_cells)
+        before = n_walls + n_dots + 4
+        row = (f"{f'{size}x{size}':>11}{n_walls:>9}{build * 1e3:>10.2f}{8 * n_walls:>12}{len(verts):>10}"
+               f"{6 * n_walls:>12}{len(quads):>10}{f'{before} -> 6':>16}{f'{before} -> {len(COLORS)}':>16}")
+        if bpy is not None:
+            clear_scene()
+            start = time.perf_counter()
+            build_cubes(walls, grid.origin)
+            cubes = time.perf_counter() - start
+            clear_scene()
+            start = time.perf_counter()
+            build_merged(walls, grid.origin)
+            merged = time.perf_counter() - start
+            counts = f"{len(bpy.data.objects)}/{len(bpy.data.materials)}"
+            clear_scene()
+            row += f"{cubes:>10.3f}{merged:>10.3f}{counts:>20}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
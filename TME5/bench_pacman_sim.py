@@ -0,0 +1,164 @@
+"""
+Benchmark: headless ticks per second of pacman_sim.PacmanSim (greedy ghosts, the original
+rule), stepped many ticks per call.
+
+Pacman follows a scripted input (a random direction every --hold ticks, like arrow key
+presses) on the game's maze and on generated ones. Each run is checked against the
+rules as PacmanGame ran them before, tested directly on the layout characters (same score,
+lives, dots and positions), and replayed from a snapshot taken half-way to check that
+restore() gives the same end state. The reference keeps exact
+positions (fractions): with floats, 0.3 steps drift and a ghost exactly 0.8 from a wall
+comes out blocked or not depending on the rounding.
+
+    python bench_pacman_sim.py --ticks 200000 --sizes 101 401
+"""
+
+import argparse
+from fractions import Fraction
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pacman_grid import generate_maze
+from pacman_sim import PacmanSim, MAZE_LAYOUT, MAZE_ORIGIN, GHOSTS_START, DIRECTIONS
+
+
+def script(ticks, hold, seed):
+    rng = random.Random(seed)
+    return [rng.choice(DIRECTIONS) for _ in range(0, ticks, hold)]
+
+
+def run_sim(sim, inputs, hold):
+    for direction in inputs:
+        if sim.game_over:
+            break
+        sim.direction = direction
+        sim.step(hold)
+
+
+def run_reference(layout, origin, ghosts_start, inputs, hold, pacman_speed=Fraction(1, 2), ghosts_speed=Fraction(3, 10),
+                  lives=3):
+    # move_pacman / choose_direction / move_ghosts on exact positions, walls and dots read from the layout
+    reach2 = Fraction(4, 5) ** 2
+    dots = {}
+    for y, row in enumerate(layout):
+        for x, cell in enumerate(row):
+            if cell != "#" and (x + origin[0], y + origin[1]) != (0, 0):
+                dots[(x + origin[0], y + origin[1])] = len(dots)
+    alive = set(dots.values())
+
+    def near(x, y):
+        # Cells (world coordinates) whose centre is within the collision distance (< 1) of (x, y)
+        cx, cy = math.floor(x), math.floor(y)
+        return [(cx + i, cy + j) for j in range(2) for i in range(2)
+                if (x - cx - i) ** 2 + (y - cy - j) ** 2 < reach2]
+
+    def hits_wall(x, y):
+        for cx, cy in near(x, y):
+            lx, ly = cx - origin[0], cy - origin[1]
+            if 0 <= ly < len(layout) and 0 <= lx < len(layout[ly]) and layout[ly][lx] == "#":
+                return True
+        return False
+
+    pacman = (Fraction(0), Fraction(0))
+    ghosts = [tuple(map(Fraction, g[:2])) for g in ghosts_start]
+    score, game_over = 0, False
+    for direction in inputs:
+        for _ in range(hold):
+            if game_over:
+                break
+            x, y = pacman[0] + direction[0] * pacman_speed, pacman[1] + direction[1] * pacman_speed
+            if not hits_wall(x, y):
+                hit = [dots[cell] for cell in near(x, y) if dots.get(cell) in alive]
+                if hit:
+                    alive.remove(min(hit))
+                    score += 10
+                    game_over = not alive
+                pacman = (x, y)
+            if game_over:
+                break
+            for i, (gx, gy) in enumerate(ghosts):
+                best, min_dis = (0, 0), 30
+                for dx, dy in DIRECTIONS:
+                    nx, ny = gx + dx * ghosts_speed, gy + dy * ghosts_speed
+                    if not hits_wall(nx, ny):
+                        dis = math.sqrt((pacman[0] - nx) ** 2 + (pacman[1] - ny) ** 2)
+                        if dis < min_dis:
+                            min_dis, best = dis, (dx, dy)
+                ghosts[i] = (gx + best[0] * ghosts_speed, gy + best[1] * ghosts_speed)
+                if math.sqrt((ghosts[i][0] - pacman[0]) ** 2 + (ghosts[i][1] - pacman[1]) ** 2) < 0.8:
+                    lives -= 1
+                    game_over = lives == 0
+                    pacman = (Fraction(0), Fraction(0))
+                    direction = (0, 0)
+                    ghosts = [tuple(map(Fraction, g[:2])) for g in ghosts_start]
+                    break
+    return score, lives, len(alive), pacman, ghosts
+
+
+def same_state(sim, reference):
+    score, lives, dots_left, pacman, ghosts = reference
+    close = lambda a, b: all(abs(p - q) < 1e-6 for p, q in zip(a, b))
+    return ((sim.score, sim.lives, sim.dots_left) == (score, lives, dots_left)
+            and close(sim.pacman_location, pacman) and all(map(close, sim.ghost_locations, ghosts)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--hold", type=int, default=8, help="Ticks per scripted input (ticks per step() call)")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[101, 401], help="Generated maze sizes")
+    parser.add_argument("--check-ticks", type=int, default=20000, help="Ticks compared with the reference rules")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mazes = [("game maze", MAZE_LAYOUT, MAZE_ORIGIN, GHOSTS_START)]
+    for size in args.sizes:
+        layout = generate_maze(size, size, seed=args.seed)
+        rng = random.Random(args.seed)
+        free = [(x - 1, y - 1, 0) for y, row in enumerate(layout) for x, c in enumerate(row) if c != "#" and (x, y) != (1, 1)]
+        mazes.append((f"{size}x{size}", layout, (-1, -1), rng.sample(free, 3)))
+
+    print(f"{'maze':<12}{'ticks':>9}{'seconds':>10}{'ticks/s':>12}{'score':>8}{'lives':>7}{'exact rules':>13}{'replay':>8}")
+    for name, layout, origin, ghosts in mazes:
+        # Long run: game over ends it early, so the sim restarts until --ticks have been simulated
+        sim = PacmanSim(layout, origin=origin, ghosts_start=ghosts, ghost_mode="greedy")
+        inputs = script(args.ticks, args.hold, args.seed)
+        total, start = 0, time.perf_counter()
+        while total < args.ticks:
+            for direction in inputs:
+                sim.direction = direction
+                total += sim.step(min(args.hold, args.ticks - total))
+                if sim.game_over or total >= args.ticks:
+                    break
+            if sim.game_over:
+                sim.reset()
+        seconds = time.perf_counter() - start
+        sim.drain_events()
+
+        checked = script(args.check_ticks, args.hold, args.seed + 1)
+        sim = PacmanSim(layout, origin=origin, ghosts_start=ghosts, ghost_mode="greedy")
+        run_sim(sim, checked, args.hold)
+        agrees = same_state(sim, run_reference(layout, origin, ghosts, checked, args.hold))
+
+        half = len(checked) // 2
+        replay = PacmanSim(layout, origin=origin, ghosts_start=ghosts, ghost_mode="greedy")
+        run_sim(replay, checked[:half], args.hold)
+        saved = replay.snapshot()
+        run_sim(replay, checked[half:], args.hold)
+        first = replay.snapshot()
+        replay.restore(saved)
+        run_sim(replay, checked[half:], args.hold)
+        replayed = replay.snapshot() == first == sim.snapshot()
+
+        print(f"{name:<12}{total:>9}{seconds:>10.3f}{total / seconds:>12.0f}{sim.score:>8}{sim.lives:>7}"
+              f"{'same' if agrees else 'DIFFERENT':>13}{'same' if replayed else 'DIFFERENT':>8}")
+        if not (agrees and replayed):
+            sys.exit(f"{name}: the simulation does not match the reference rules or its replay")
+
+
+if __name__ == "__main__":
+    main()
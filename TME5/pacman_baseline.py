@@ -1,10 +1,8 @@
 import bpy
-import math
-from mathutils import Vector
-import random
 import aud
 import time
 import os
+import sys
 
 ### OPTIMIZATION
 # - Put checking ghost collision from move_pacman() to move_ghost()
@@ -17,19 +15,45 @@ import os
 # - Clear objects from memory
 ##      Whenever Pacman collecting an item, I delete this item from the scene.
 ##      Also, whenever I rerun the program, I delete all of the past objects using clear_scene()
+# - Grid-indexed collisions
+##      The maze layout is indexed once (pacman_grid.MazeGrid): a numpy bool grid of walls and a cell -> dot id grid.
+##      A collision test only looks at the (at most four) cells around the position instead of every
+##      wall and dot, and an eaten dot is found by its id instead of scanning bpy.data.objects.
+# - Headless simulation core
+##      The rules (moves, collisions, dots, score, lives) run in pacman_sim.PacmanSim without Blender. PacmanGame is
+##      only the view: on every timer tick it steps the simulation once and copies its positions to the objects.
+# - Ghost navigation by flow fields
+##      Ghosts follow shortest paths to pacman's cell (pacman_nav): BFS distances over the walkable cells, computed
+##      once per target cell and cached, so a ghost's move is one lookup and it no longer gets stuck behind walls.
+# - Instanced dots
+##      All dots are one point mesh whose vertices instance a single shared sphere and material (geometry nodes,
+##      pacman_dots). Eating a dot clears one element of a "visible" point attribute instead of deleting an object.
+# - Shared materials and merged walls
+##      create_basic_material() hands out one material per color (pacman_scene.MaterialRegistry) instead of a new one
+##      per object. The walls are one mesh built with numpy from the maze layout (hidden sides left out) and uploaded
+##      with bulk foreach_set calls, instead of one cube operator call per wall cell.
 
 
 # Getting the current directory of the program
 filepath = bpy.data.filepath
 dir_path = os.path.dirname(filepath)
 
+# The simulation core (pure Python / numpy, no Blender dependency) lives next to this script
+if dir_path not in sys.path:
+    sys.path.append(dir_path)
+from pacman_sim import PacmanSim, MAZE_LAYOUT, MAZE_ORIGIN, GHOSTS_START
+from pacman_dots import DotCloud
+from pacman_scene import MaterialRegistry, create_wall_object
+
 class PacmanGame:
     def __init__(self):
         self.score = 0
         self.lives = 3
         
-        self.wall_position = []
-        self.dot_position = []
+        self.sim = None # game rules and state, built in create_maze()
+        self.dots = None # instanced dot mesh, indexed by dot id
+        self.walls = None # merged wall mesh
+        self.materials = MaterialRegistry() # one material per color
         self.game_over = False
         
         self.pacman = bpy.context
@@ -38,7 +62,7 @@ class PacmanGame:
         self.pacman_speed = 0.5
         
         self.ghosts = []
-        self.ghosts_initial_location = [(5,5,0), (-4,4,0), (10,3,0)] # initial location of each ghost, store in a list
+        self.ghosts_initial_location = GHOSTS_START # initial location of each ghost, store in a list
         self.ghosts_speed = 0.3
 
         
@@ -95,12 +119,9 @@ class PacmanGame:
     # Optimization: Use simple colors instead of textures    
     def create_basic_material(self, color):
         """
-        A simple, efficient material color: tuple (R,G,B,A)
+        A simple, efficient material color: tuple (R,G,B,A), shared by every object of that color
         """
-        mat = bpy.data.materials.new(name="Basic")
-        mat.use_nodes = False  # Faster than node-based materials
-        mat.diffuse_color = color
-        return mat
+        return self.materials.get(color)
 
     def create_wall_material(self):
         """Create specific material for walls"""
@@ -108,36 +129,30 @@ class PacmanGame:
 
     def create_maze(self):
         
-        # This isn't even a maze, it's literally a box
-        # Change it to look more like a maze.
-        self.maze_layout = [
-            "####################",
-            "#         #        #",
-            "# # # ###   ## ##  #",
-            "# # # #   #  #     #",
-            "#   # # # ##   ### #",
-            "# # # #   #  # ### #",
-            "#       #   #      #",
-            "# ## ## ###   # # ##",
-            "#           ###   ##",
-            "####################",
-        ]
+        self.maze_layout = MAZE_LAYOUT
+        self.sim = PacmanSim(
+            self.maze_layout,
+            origin=MAZE_ORIGIN,
+            pacman_start=self.pacman_initial_location,
+            ghosts_start=self.ghosts_initial_location,
+            pacman_speed=self.pacman_speed,
+            ghosts_speed=self.ghosts_speed,
+            lives=self.lives
+        )
+        
+        # All walls in one mesh, flat like the former cubes scaled to (0.5, 0.5, 0.2)
+        self.walls = create_wall_object(
+            self.sim.grid.walls,
+            origin=MAZE_ORIGIN,
+            material=self.create_wall_material(),
+            half_height=0.2
+        )
         
-        for y, row in enumerate(self.maze_layout):
-            for x, cell in enumerate(row):
-                location=(x-5, y-3, 0)
-                if cell == '#':
-                    bpy.ops.mesh.primitive_cube_add(location=location)
-                    self.wall_position.append(location)
-                    wall = bpy.context.active_object
-                    wall.scale = (0.5, 0.5, 0.2)  # Flatter walls for performance
-                    wall.data.materials.append(self.create_wall_material())
-                elif location != self.pacman_initial_location: # Create dots at place not having walls and the initial place of pacman
-                    self.create_dots(
-                        location=location, 
-                        radius=0.1
-                    )
-                    self.dot_position.append(location)
+        # Dots at place not having walls and the initial place of pacman, in the dot id order of the simulation
+        self.dots = self.create_dots(
+            locations=self.sim.grid.dot_locations(),
+            radius=0.1
+        )
 
     def create_pacman(self, name="Pacman", location=(0,0,0), radius=0.5):
         bpy.ops.mesh.primitive_uv_sphere_add(
@@ -156,20 +171,19 @@ class PacmanGame:
         return pac
         
 
-    def create_dots(self, name="Dot", location=(0,0,0), radius=0.3):
-        bpy.ops.mesh.primitive_uv_sphere_add(
-            segments=32, 
-            ring_count=16, 
-            location=location, 
-            radius=radius
-        )
-        dot = bpy.context.active_object
-        dot.name = name
-        
-        # Create a material and assign a color
+    def create_dots(self, name="Dots", locations=((0,0,0),), radius=0.3):
+        # One material for every dot
         mat = self.create_basic_material((2, 2, 2,1))  # White color
         
-        dot.data.materials.append(mat)
+        dots = DotCloud(locations)
+        dots.create_object(
+            material=mat,
+            name=name,
+            radius=radius,
+            segments=32,
+            ring_count=16
+        )
+        return dots
 
     def create_ghosts(self,name="Ghost", location=(0,0,0), radius=0.5, color=(0,0,0,1)):
         bpy.ops.mesh.primitive_uv_sphere_add(
@@ -187,102 +201,29 @@ class PacmanGame:
         ghost.data.materials.append(mat)
         return ghost
 
-    def check_collision(self, pos1, pos2, threshold=0.8):
-        # calculate the distance between 2 object
-        distance = math.sqrt((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2 + ((pos1[2] - pos2[2]) ** 2))
-        return distance < threshold
-
-
-    def move_pacman(self, direction):
+    def update(self):
+        """One timer tick: step the simulation, then sync the scene from it"""
         if self.game_over:
             return
-        new_loc = self.pacman.location.copy()
-        new_loc.x += direction[0] * self.pacman_speed
-        new_loc.y += direction[1] * self.pacman_speed
-        
-        # Wall collision check
-        for pos in self.wall_position:
-            if(self.check_collision(new_loc, pos)):
-                return
-        
-        bpy.ops.object.select_all(action='DESELECT')
-        # Dot collection
-        for pos in self.dot_position:
-            if(self.check_collision(new_loc, pos)):
-                for obj in bpy.data.objects:
-                    # find the dot that pacman is eating from all object based on position
-                    if ((obj.location[0]-pos[0])**2 + (obj.location[1]-pos[1])**2 + (obj.location[2]-pos[2])**2) <= 0.1: 
-                        obj.select_set(True)
-                        self.dot_position.remove(pos)
-                        if not self.dot_position:
-                            self.game_over=True
-                        bpy.data.objects.remove(obj)
-                        bpy.ops.object.delete() # delete this dot from scene
-                        break
+        self.sim.direction = self.pacman_direction
+        self.sim.step(1)
+        for event, value in self.sim.drain_events():
+            if event == 'eat_dot':
+                self.dots.hide(value) # hide this dot
                 self.play_sound('eat_dot')
-                self.score += 10 # collecting dot score
-                break
-            
-        self.pacman.location = new_loc # update pacman location
-    
-    # Choose direction for ghost to move
-    def choose_direction(self, loc1, loc2):
-        directions = [
-            (1,0), (-1,0), (0,1), (0,-1)
-        ]
-
-        optimize_dir = (0,0)
-        min_dis = 30
-
-        # Checking wall collisions if ghost move in each direction
-        for dir in directions:
-            x = loc1.x + dir[0] * self.ghosts_speed
-            y = loc1.y + dir[1] * self.ghosts_speed
-            
-            # if in this direction ghost meets wall collision => check another direction
-            wall_col = False
-            for pos in self.wall_position:
-                if(self.check_collision((x,y,loc1.z), pos)):
-                    wall_col = True
-                    break
-                
-            if wall_col == False:
-                # Calculate the direction with the minimum distance => choose this direction
-                dis = math.sqrt((loc2[0] - x) ** 2 + (loc2[1] - y) ** 2)
-                if dis < min_dis:
-                    min_dis = dis
-                    optimize_dir = dir
-        return optimize_dir
-        
-    def move_ghosts(self):
-        if self.game_over:
-            return
-        pacman_loc = self.pacman.location
-        for ghost in self.ghosts:
-            loc = ghost.location.copy()
-            # choose direction for ghost to move
-            direction = self.choose_direction(loc, pacman_loc)
-            # Calculate new location
-            loc.x += direction[0] * self.ghosts_speed
-            loc.y += direction[1] * self.ghosts_speed
-            
-            ghost.location = loc
-            
-            # Check pacman ghost collision => Pacman dies
-            if(self.check_collision(loc, pacman_loc)):
-                self.lives -= 1
+            elif event == 'death':
                 self.play_sound('death')
                 time.sleep(2)
-                # if we have no more lives => End game
-                if(self.lives==0):
-                    print("Score:", self.score)
-                    self.game_over = True
-                # update pacman, ghost to initial location and initial direction(not moving)
-                self.pacman.location = self.pacman_initial_location
-                self.pacman_direction = (0,0)
-                for i, ghost in enumerate(self.ghosts):
-                    ghost.location = self.ghosts_initial_location[i]
-                return
+            elif event == 'game_over':
+                print("Score:", value)
+        # update pacman, ghost location (back to initial location and direction after a death)
+        self.pacman.location = self.sim.pacman_location
+        self.pacman_direction = self.sim.direction
+        for ghost, location in zip(self.ghosts, self.sim.ghost_locations):
+            ghost.location = location
+        self.score = self.sim.score
+        self.lives = self.sim.lives
+        self.game_over = self.sim.game_over
         
 
 class PacmanGameOperator(bpy.types.Operator):
@@ -313,8 +254,7 @@ class PacmanGameOperator(bpy.types.Operator):
         
         # Update pacman location and ghost location constantly
         if event.type == 'TIMER':
-            self.game_instance.move_pacman(self.game_instance.pacman_direction)
-            self.game_instance.move_ghosts()
+            self.game_instance.update()
         
         if self.game_instance.game_over: 
             return {'FINISHED'}
@@ -0,0 +1,97 @@
+"""
+Dots drawn as one instanced point mesh instead of one sphere object (and material) per dot.
+
+DotCloud keeps the dot locations, in dot id order (the ids of pacman_grid.MazeGrid and
+pacman_sim.PacmanSim), and a bool "visible" mask. In Blender, create_object() builds a
+single mesh with one vertex per dot, stores the mask as a point attribute, and adds a
+geometry nodes modifier that instances one shared UV sphere (with one material) on the
+visible vertices:
+
+    Group Input -> Instance on Points (Selection: Named Attribute "visible") -> Group Output
+                                    ^ Instance: UV Sphere -> Set Material
+
+Eating a dot is hide(dot id): one mask element is written, no object is removed. The
+bookkeeping works without Blender (no object); bpy is imported in the Blender-side
+functions only.
+"""
+
+import numpy as np
+
+MASK_ATTRIBUTE = "visible"
+
+
+class DotCloud:
+    def __init__(self, locations):
+        self.locations = np.asarray(locations, dtype=np.float32).reshape(-1, 3)
+        self.visible = np.ones(len(self.locations), dtype=bool)
+        self.obj = None
+
+    def __len__(self):
+        return len(self.locations)
+
+    def create_object(self, material, name="Dots", radius=0.1, segments=32, ring_count=16):
+        """The dot mesh, its mask attribute and the instancing modifier, linked to the scene."""
+        import bpy
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(len(self.locations))
+        mesh.vertices.foreach_set("co", self.locations.ravel())
+        mask = mesh.attributes.new(MASK_ATTRIBUTE, 'BOOLEAN', 'POINT')
+        mask.data.foreach_set("value", self.visible)
+        mesh.update()
+        self.obj = bpy.data.objects.new(name, mesh)
+        bpy.context.scene.collection.objects.link(self.obj)
+        modifier = self.obj.modifiers.new("DotInstances", 'NODES')
+        modifier.node_group = dot_instancer(material, radius, segments, ring_count, name=name + "Instancer")
+        return self.obj
+
+    def hide(self, dot):
+        """Eat dot `dot`: clear its mask element (and the mesh attribute, if the object exists)."""
+        self.visible[dot] = False
+        if self.obj is not None:
+            mesh = self.obj.data
+            mesh.attributes[MASK_ATTRIBUTE].data[dot].value = False
+            mesh.update()
+
+    def show_all(self):
+        self.visible[:] = True
+        if self.obj is not None:
+            mesh = self.obj.data
+            mesh.attributes[MASK_ATTRIBUTE].data.foreach_set("value", self.visible)
+            mesh.update()
+
+    def remaining(self):
+        return int(self.visible.sum())
+
+
+#####################################################################################################
+# Function: dot_instancer(material, radius, segments, ring_count, name)
+# Purpose: Geometry node group instancing a UV sphere with `material` on the points whose MASK_ATTRIBUTE is true.
+def dot_instancer(material, radius=0.1, segments=32, ring_count=16, name="DotInstancer"):
+    import bpy
+    group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+    if hasattr(group, "interface"): # Blender 4.0+
+        group.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        group.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    else:
+        group.inputs.new('NodeSocketGeometry', "Geometry")
+        group.outputs.new('NodeSocketGeometry', "Geometry")
+    nodes, links = group.nodes, group.links
+    group_in = nodes.new("NodeGroupInput")
+    group_out = nodes.new("NodeGroupOutput")
+    sphere = nodes.new("GeometryNodeMeshUVSphere")
+    sphere.inputs["Segments"].default_value = segments
+    sphere.inputs["Rings"].default_value = ring_count
+    sphere.inputs["Radius"].default_value = radius
+    set_material = nodes.new("GeometryNodeSetMaterial")
+    set_material.inputs["Material"].default_value = material
+    mask = nodes.new("GeometryNodeInputNamedAttribute")
+    mask.data_type = 'BOOLEAN'
+    mask.inputs["Name"].default_value = MASK_ATTRIBUTE
+    instance = nodes.new("GeometryNodeInstanceOnPoints")
+    links.new(sphere.outputs["Mesh"], set_material.inputs["Geometry"])
+    links.new(group_in.outputs[0], instance.inputs["Points"])
+    links.new(mask.outputs["Attribute"], instance.inputs["Selection"])
+    links.new(set_material.outputs["Geometry"], instance.inputs["Instance"])
+    links.new(instance.outputs["Instances"], group_out.inputs[0])
+    return group
+#####################################################################################################
@@ -0,0 +1,113 @@
+"""
+Grid index of the Pacman maze, built once from the character layout (no Blender needed).
+
+Walls are a numpy bool grid and dots a cell -> dot id grid, so a collision test only looks
+at the cells that can be within reach of a position instead of scanning every wall and dot.
+Positions are integers in 1/resolution of a cell, relative to cell (0, 0) of the layout
+(cell (x, y) sits at world origin + (x, y)): pacman_speed and ghosts_speed move objects
+between cell centres in whole units, and the collision distance is an exact test on
+squared distances. With a reach below one cell, at most two cells per axis (four in
+total) are tested. This is the only collision code; pacman_sim.PacmanSim caches its answers.
+"""
+
+import math
+import random
+import numpy as np
+
+
+class MazeGrid:
+    def __init__(self, layout, origin=(-5, -3), start=(0, 0), wall="#", threshold=0.8, resolution=10):
+        self.layout = layout
+        self.origin = (origin[0], origin[1])
+        self.resolution = resolution
+        self.reach2 = (threshold * resolution) ** 2
+        self.height = len(layout)
+        self.width = max(len(row) for row in layout)
+        self.walls = np.zeros((self.height, self.width), dtype=bool)
+        # Dot ids follow the row-major order of the layout (the order the game lays the dots out in)
+        self.dot_index = np.full((self.height, self.width), -1, dtype=np.int32)
+        self.dot_cells = []
+        for y, row in enumerate(layout):
+            for x, cell in enumerate(row):
+                if cell == wall:
+                    self.walls[y, x] = True
+                elif (x + self.origin[0], y + self.origin[1]) != (start[0], start[1]):
+                    self.dot_index[y, x] = len(self.dot_cells)
+                    self.dot_cells.append((x, y))
+        self._walls = self.walls.tolist()
+        self._dot_index = self.dot_index.tolist()
+
+    def location(self, x, y):
+        """World location of a cell centre."""
+        return (x + self.origin[0], y + self.origin[1], 0)
+
+    def wall_locations(self):
+        ys, xs = np.nonzero(self.walls)
+        return [self.location(int(x), int(y)) for x, y in zip(xs, ys)]
+
+    def dot_locations(self):
+        return [self.location(x, y) for x, y in self.dot_cells]
+
+    def units(self, value, name="value"):
+        """A length in cells as a whole number of units (ValueError if it is not one)."""
+        units = round(value * self.resolution)
+        if abs(units - value * self.resolution) > 1e-6:
+            raise ValueError(f"{name}={value} is not a multiple of 1/{self.resolution} cell")
+        return units
+
+    def to_units(self, location):
+        """World location -> integer position."""
+        return (self.units(location[0] - self.origin[0], "location"), self.units(location[1] - self.origin[1], "location"))
+
+    def to_world(self, position):
+        return (self.origin[0] + position[0] / self.resolution, self.origin[1] + position[1] / self.resolution, 0)
+
+    def cells_within(self, x, y):
+        """Cells whose centre is closer than the collision distance to position (x, y), clipped to the maze."""
+        res, reach2 = self.resolution, self.reach2
+        reach = math.sqrt(reach2)
+        x0, x1 = max(-int((reach - x) // res), 0), min(int((x + reach) // res), self.width - 1)
+        y0, y1 = max(-int((reach - y) // res), 0), min(int((y + reach) // res), self.height - 1)
+        return [(cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1)
+                if (cx * res - x) ** 2 + (cy * res - y) ** 2 < reach2]
+
+    def hits_wall(self, x, y):
+        """True if a wall centre is within the collision distance of position (x, y)."""
+        walls = self._walls
+        return any(walls[cy][cx] for cx, cy in self.cells_within(x, y))
+
+    def dots_within(self, x, y):
+        """Ids of the dots within the collision distance of position (x, y), in creation order."""
+        index = self._dot_index
+        return tuple(sorted(index[cy][cx] for cx, cy in self.cells_within(x, y) if index[cy][cx] >= 0))
+
+
+def generate_maze(width, height, seed=0, loops=0.1):
+    """
+    Random maze layout (list of strings) of odd size, carved by a depth-first backtracker from
+    cell (1, 1); a fraction `loops` of the remaining inner walls between two corridors is removed
+    so the maze has cycles like a Pacman level.
+    """
+    width |= 1
+    height |= 1
+    rng = random.Random(seed)
+    grid = [["#"] * width for _ in range(height)]
+    grid[1][1] = " "
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        neighbours = [(x + dx, y + dy, dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                      if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and grid[y + dy][x + dx] == "#"]
+        if not neighbours:
+            stack.pop()
+            continue
+        nx, ny, dx, dy = rng.choice(neighbours)
+        grid[y + dy // 2][x + dx // 2] = " "
+        grid[ny][nx] = " "
+        stack.append((nx, ny))
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            if grid[y][x] == "#" and rng.random() < loops:
+                if (grid[y][x - 1] == grid[y][x + 1] == " ") or (grid[y - 1][x] == grid[y + 1][x] == " "):
+                    grid[y][x] = " "
+    return ["".join(row) for row in grid]
@@ -0,0 +1,113 @@
+"""
+Ghost navigation over the walkable cells of the maze (no Blender needed).
+
+The free cells of a MazeGrid are numbered once, with a (cells, 4) neighbour table in the
+order of pacman_sim.DIRECTIONS. Towards a target cell, a FlowField holds the BFS distance
+of every cell and the first step of a shortest path from it (the first direction, in
+DIRECTIONS order, to a neighbour one step closer). Each tick a ghost's move is then a
+lookup of its cell in the field of pacman's cell.
+
+Fields are incremental: when pacman reaches a new cell, its field is only expanded (one
+vectorized BFS level at a time) until the cells asked for are reached, and expanded further
+when a farther cell is asked for later. The fields of the last `cache_size` targets are
+kept, so going back to a cell costs nothing; with a cache as large as the maze this is
+the all-pairs next-hop table, filled on demand.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+NO_MOVE = -1
+
+
+class FlowField:
+    def __init__(self, neighbours, target):
+        self.neighbours = neighbours
+        self.target = target
+        self.dist = np.full(len(neighbours), -1, dtype=np.int32)
+        self.dist[target] = 0
+        self.frontier = np.array([target], dtype=np.int32)
+        self.level = 0
+        self.hops = {target: NO_MOVE}
+
+    def expand(self):
+        # One BFS level: the unvisited neighbours of the frontier
+        reached = self.neighbours[self.frontier].ravel()
+        reached = np.unique(reached[reached >= 0])
+        reached = reached[self.dist[reached] < 0]
+        self.level += 1
+        self.dist[reached] = self.level
+        self.frontier = reached
+
+    def complete(self):
+        while self.frontier.size:
+            self.expand()
+        return self.dist
+
+    def distance(self, cell):
+        """BFS distance from cell to the target (-1 if unreachable)."""
+        while self.dist[cell] < 0 and self.frontier.size:
+            self.expand()
+        return int(self.dist[cell])
+
+    def next_hop(self, cell):
+        """Index in DIRECTIONS of the first step of a shortest path from cell, or NO_MOVE."""
+        hop = self.hops.get(cell)
+        if hop is None:
+            d = self.distance(cell)
+            hop = NO_MOVE
+            if d > 0:
+                for k, neighbour in enumerate(self.neighbours[cell].tolist()):
+                    if neighbour >= 0 and self.dist[neighbour] == d - 1:
+                        hop = k
+                        break
+            self.hops[cell] = hop
+        return hop
+
+
+class MazeNavigator:
+    def __init__(self, walls, cache_size=256):
+        walls = np.asarray(walls, dtype=bool)
+        height, width = walls.shape
+        ys, xs = np.nonzero(~walls)
+        self.cells = np.stack([xs, ys], axis=1).astype(np.int32) # (x, y) of each walkable cell
+        cell_id = np.full((height + 2, width + 2), -1, dtype=np.int32) # one cell of padding around the maze
+        cell_id[ys + 1, xs + 1] = np.arange(len(xs), dtype=np.int32)
+        # Neighbours in DIRECTIONS order: +x, -x, +y, -y
+        self.neighbours = np.stack([cell_id[ys + 1, xs + 2], cell_id[ys + 1, xs],
+                                    cell_id[ys + 2, xs + 1], cell_id[ys, xs + 1]], axis=1)
+        self._cell_id = cell_id[1:-1, 1:-1].tolist()
+        self.cache_size = cache_size
+        self._fields = OrderedDict()
+        self.fields_built = 0
+
+    def cell_id(self, x, y):
+        if 0 <= y < len(self._cell_id) and 0 <= x < len(self._cell_id[0]):
+            return self._cell_id[y][x]
+        return -1
+
+    def field(self, target):
+        """Flow field towards a walkable cell id (built on first use, kept for the last cache_size targets)."""
+        field = self._fields.get(target)
+        if field is None:
+            field = self._fields[target] = FlowField(self.neighbours, target)
+            self.fields_built += 1
+            if len(self._fields) > self.cache_size:
+                self._fields.popitem(last=False)
+        else:
+            self._fields.move_to_end(target)
+        return field
+
+    def next_direction(self, cell, target):
+        """Index in DIRECTIONS of the next move from cell (x, y) towards cell (x, y), or NO_MOVE."""
+        source, goal = self.cell_id(*cell), self.cell_id(*target)
+        if source < 0 or goal < 0:
+            return NO_MOVE
+        return self.field(goal).next_hop(source)
+
+    def distance(self, cell, target):
+        source, goal = self.cell_id(*cell), self.cell_id(*target)
+        if source < 0 or goal < 0:
+            return -1
+        return self.field(goal).distance(source)
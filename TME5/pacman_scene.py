@@ -0,0 +1,111 @@
+"""
+Scene building blocks shared by the Pacman objects: one material per colour and the maze
+walls as a single mesh.
+
+MaterialRegistry hands out one simple (node-less) material per RGBA colour and reuses it,
+also across runs of the script: materials are named after their colour and looked up in
+bpy.data before a new one is made.
+
+wall_mesh_arrays() builds the walls of a bool wall grid with numpy only: every wall cell
+is a box (one cell wide, 2 * half_height high, like the former cubes scaled to
+(0.5, 0.5, 0.2)) on a shared lattice of corners, and the sides between two neighbouring
+walls are left out. create_wall_object() uploads it with one foreach_set per buffer, so
+the maze is one object whatever its size. bpy is imported in the Blender-side functions only.
+"""
+
+import numpy as np
+
+
+class MaterialRegistry:
+    def __init__(self, prefix="Basic"):
+        self.prefix = prefix
+        self.materials = {}
+
+    def name(self, color):
+        return self.prefix + " " + " ".join(f"{c:g}" for c in color)
+
+    def get(self, color):
+        """The material of this colour (R, G, B, A), made on first use."""
+        color = tuple(float(c) for c in color)
+        mat = self.materials.get(color)
+        if mat is None:
+            import bpy
+            name = self.name(color)
+            mat = bpy.data.materials.get(name)
+            if mat is None:
+                mat = bpy.data.materials.new(name=name)
+                mat.use_nodes = False  # Faster than node-based materials
+                mat.diffuse_color = color
+            self.materials[color] = mat
+        return mat
+
+    def __len__(self):
+        return len(self.materials)
+
+
+#####################################################################################################
+# Function: wall_mesh_arrays(walls, origin, half_height)
+# Purpose: Vertices (n, 3) float32 and outward-facing quads (q, 4) int32 of the walls of a bool grid indexed
+#          [y, x]; cell (x, y) is centred on origin + (x, y). Corners are shared, hidden sides are left out.
+def wall_mesh_arrays(walls, origin=(0, 0), half_height=0.2):
+    walls = np.asarray(walls, dtype=bool)
+    height, width = walls.shape
+    ys, xs = np.nonzero(walls)
+    padded = np.pad(walls, 1)
+    open_side = {
+        "+x": ~padded[ys + 1, xs + 2],
+        "-x": ~padded[ys + 1, xs],
+        "+y": ~padded[ys + 2, xs + 1],
+        "-y": ~padded[ys, xs + 1],
+    }
+
+    def corner(i, j, k):
+        # Lattice corner (row i, column j, level k) of the (height + 1) x (width + 1) x 2 lattice
+        return (k * (height + 1) + i) * (width + 1) + j
+
+    i, j = ys, xs
+    quads = [
+        np.stack([corner(i, j, 1), corner(i, j + 1, 1), corner(i + 1, j + 1, 1), corner(i + 1, j, 1)], axis=1),  # top
+        np.stack([corner(i, j, 0), corner(i + 1, j, 0), corner(i + 1, j + 1, 0), corner(i, j + 1, 0)], axis=1),  # bottom
+    ]
+    sides = {
+        "+x": (corner(i, j + 1, 0), corner(i + 1, j + 1, 0), corner(i + 1, j + 1, 1), corner(i, j + 1, 1)),
+        "-x": (corner(i, j, 0), corner(i, j, 1), corner(i + 1, j, 1), corner(i + 1, j, 0)),
+        "+y": (corner(i + 1, j, 0), corner(i + 1, j, 1), corner(i + 1, j + 1, 1), corner(i + 1, j + 1, 0)),
+        "-y": (corner(i, j, 0), corner(i, j + 1, 0), corner(i, j + 1, 1), corner(i, j, 1)),
+    }
+    for side, corners in sides.items():
+        quads.append(np.stack(corners, axis=1)[open_side[side]])
+    quads = np.concatenate(quads)
+
+    used, quads = np.unique(quads, return_inverse=True)
+    quads = quads.reshape(-1, 4).astype(np.int32)
+    k, rest = np.divmod(used, (height + 1) * (width + 1))
+    i, j = np.divmod(rest, width + 1)
+    verts = np.stack([origin[0] + j - 0.5, origin[1] + i - 0.5, np.where(k, half_height, -half_height)], axis=1)
+    return verts.astype(np.float32), quads
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: create_wall_object(walls, origin, material, name, half_height)
+# Purpose: The walls of a bool grid as one mesh object with `material`, uploaded with bulk foreach_set calls.
+def create_wall_object(walls, origin, material, name="Walls", half_height=0.2):
+    import bpy
+    verts, quads = wall_mesh_arrays(walls, origin, half_height)
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.loops.add(quads.size)
+    mesh.polygons.add(len(quads))
+    mesh.vertices.foreach_set("co", verts.ravel())
+    mesh.loops.foreach_set("vertex_index", quads.ravel())
+    mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0):
+        # loop_total is derived from loop_start (and read-only) from Blender 4.0 on
+        mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.materials.append(material)
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+#####################################################################################################
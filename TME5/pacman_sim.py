@@ -0,0 +1,225 @@
+"""
+Headless Pacman simulation: the rules of PacmanGame without Blender.
+
+PacmanSim owns the positions, the dots, score, lives and game_over, and advances any
+number of ticks per step() call (one tick = one timer event of PacmanGameOperator:
+pacman moves, then every ghost). Blender only draws it: PacmanGame sets the input
+direction, calls step(1) and syncs the object transforms and the eaten dots from
+pacman_location, ghost_locations and the events of the tick.
+
+Positions are integers in 1/resolution of a cell (tenths by default, so pacman_speed 0.5
+and ghosts_speed 0.3 are 5 and 3 units): moves are exact, the 0.8 collision distance is
+an integer test on squared distances, and whether a position touches a wall, which dots
+it reaches and which moves a ghost has from it are computed once per position and kept.
+A run is deterministic, so a game is replayed from its start and its input directions.
+
+Ghosts either chase pacman along shortest paths (ghost_mode "chase", pacman_nav): from a
+cell centre a ghost heads for the next cell of the path to pacman's cell, and turns there
+without losing speed; or take the free move closest to pacman in a straight line ("greedy",
+the original rule, which gets them stuck behind walls).
+"""
+
+from pacman_grid import MazeGrid
+from pacman_nav import MazeNavigator, NO_MOVE
+
+MAZE_LAYOUT = [
+    "####################",
+    "#         #        #",
+    "# # # ###   ## ##  #",
+    "# # # #   #  #     #",
+    "#   # # # ##   ### #",
+    "# # # #   #  # ### #",
+    "#       #   #      #",
+    "# ## ## ###   # # ##",
+    "#           ###   ##",
+    "####################",
+]
+MAZE_ORIGIN = (-5, -3) # world location of cell (0, 0) of the layout
+GHOSTS_START = [(5, 5, 0), (-4, 4, 0), (10, 3, 0)]
+DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)] # order in which ghosts try them (first wins a tie)
+
+
+class PacmanSim:
+    def __init__(self, layout=MAZE_LAYOUT, origin=MAZE_ORIGIN, pacman_start=(0, 0, 0), ghosts_start=GHOSTS_START,
+                 pacman_speed=0.5, ghosts_speed=0.3, lives=3, threshold=0.8, dot_score=10, resolution=10,
+                 ghost_mode="chase", nav_cache=256):
+        if ghost_mode not in ("chase", "greedy"):
+            raise ValueError(f"Unknown ghost_mode {ghost_mode!r} (expected 'chase' or 'greedy')")
+        self.grid = MazeGrid(layout, origin=origin, start=pacman_start, threshold=threshold, resolution=resolution)
+        self.resolution = resolution
+        self.pacman_speed = self.grid.units(pacman_speed, "pacman_speed")
+        self.ghosts_speed = self.grid.units(ghosts_speed, "ghosts_speed")
+        self.pacman_start = self.grid.to_units(pacman_start)
+        self.ghosts_start = [self.grid.to_units(location) for location in ghosts_start]
+        self.ghost_mode = ghost_mode
+        self.navigator = MazeNavigator(self.grid.walls, cache_size=nav_cache) if ghost_mode == "chase" else None
+        self.initial_lives = lives
+        self.dot_score = dot_score
+        self.reach2 = self.grid.reach2
+        self.chase_limit2 = (30 * resolution) ** 2 # ghosts ignore moves 30 cells or more away from pacman
+        self.events = [] # (name, value) since the last drain_events(): ('eat_dot', dot id), ('death', lives left),
+                         # ('game_over', score)
+        self._blocked = {}
+        self._dot_reach = {}
+        self._ghost_moves = {}
+        self.reset()
+
+    def reset(self):
+        self.score = 0
+        self.lives = self.initial_lives
+        self.game_over = False
+        self.ticks = 0
+        self.direction = (0, 0)
+        self.pacman = self.pacman_start
+        self.ghosts = list(self.ghosts_start)
+        self.ghost_goals = [None] * len(self.ghosts) # chase: cell centre a ghost is heading to
+        self.dot_alive = bytearray(b"\x01") * len(self.grid.dot_cells)
+        self.dots_left = len(self.dot_alive)
+        self.events.clear()
+
+    ###################################################################################################
+    # Per-position tables over the MazeGrid collision tests, filled on first use
+    def blocked(self, x, y):
+        """True if a wall is within the collision distance of position (x, y) (in units)."""
+        key = (x, y)
+        hit = self._blocked.get(key)
+        if hit is None:
+            hit = self._blocked[key] = self.grid.hits_wall(x, y)
+        return hit
+
+    def _dots_near(self, x, y):
+        # Ids of the dots within reach of (x, y), in creation order
+        key = (x, y)
+        dots = self._dot_reach.get(key)
+        if dots is None:
+            dots = self._dot_reach[key] = self.grid.dots_within(x, y)
+        return dots
+
+    def _moves(self, key):
+        # Positions a ghost at `key` can move to, in DIRECTIONS order
+        step = self.ghosts_speed
+        moves = self._ghost_moves[key] = tuple(
+            (key[0] + dx * step, key[1] + dy * step) for dx, dy in DIRECTIONS
+            if not self.blocked(key[0] + dx * step, key[1] + dy * step))
+        return moves
+    ###################################################################################################
+
+    def can_move(self, direction):
+        """True if pacman can move in this direction from where it is now."""
+        step = self.pacman_speed
+        return not self.blocked(self.pacman[0] + direction[0] * step, self.pacman[1] + direction[1] * step)
+
+    def step(self, n=1):
+        """Advance n ticks with the current direction (fewer if the game ends). Returns the ticks run."""
+        px, py = self.pacman
+        ghosts = self.ghosts
+        n_ghosts = len(ghosts)
+        alive = self.dot_alive
+        events = self.events
+        blocked, dots_near = self.blocked, self._dots_near
+        ghost_moves, moves_from = self._ghost_moves, self._moves
+        reach2, limit2, pace = self.reach2, self.chase_limit2, self.pacman_speed
+        dx, dy = self.direction
+        chase, navigator, res = self.navigator is not None, self.navigator, self.resolution
+        half = res // 2
+        done = 0
+        while done < n and not self.game_over:
+            done += 1
+            # Pacman: stops at walls, eats the first dot within reach
+            nx, ny = px + dx * pace, py + dy * pace
+            if not blocked(nx, ny):
+                for dot in dots_near(nx, ny):
+                    if alive[dot]:
+                        alive[dot] = 0
+                        self.dots_left -= 1
+                        self.score += self.dot_score
+                        events.append(("eat_dot", dot))
+                        if not self.dots_left:
+                            self.game_over = True
+                            events.append(("game_over", self.score))
+                        break
+                px, py = nx, ny
+            if self.game_over:
+                break
+            # Ghosts move; touching pacman costs a life and resets the positions
+            if chase:
+                # Flow field towards pacman's cell (a position half-way between two cells counts for the next one)
+                target = navigator.cell_id((px + half) // res, (py + half) // res)
+                field = navigator.field(target) if target >= 0 else None
+            for i in range(n_ghosts):
+                if chase:
+                    best = ghosts[i] if field is None else self._chase(i, field)
+                else:
+                    key = ghosts[i]
+                    moves = ghost_moves.get(key)
+                    if moves is None:
+                        moves = moves_from(key)
+                    best, best_d2 = key, limit2
+                    for move in moves:
+                        d2 = (px - move[0]) ** 2 + (py - move[1]) ** 2
+                        if d2 < best_d2:
+                            best, best_d2 = move, d2
+                    ghosts[i] = best
+                if (px - best[0]) ** 2 + (py - best[1]) ** 2 < reach2:
+                    self.lives -= 1
+                    events.append(("death", self.lives))
+                    if self.lives == 0:
+                        self.game_over = True
+                        events.append(("game_over", self.score))
+                    px, py = self.pacman_start
+                    dx, dy = self.direction = (0, 0)
+                    ghosts[:] = self.ghosts_start
+                    self.ghost_goals = [None] * n_ghosts
+                    break
+        self.pacman = (px, py)
+        self.ticks += done
+        return done
+
+    def _chase(self, i, field):
+        # Move ghost i by ghosts_speed along the flow field: to the centre it is heading to, then on to the next one
+        x, y = self.ghosts[i]
+        goal = self.ghost_goals[i]
+        res = self.resolution
+        budget = self.ghosts_speed
+        while budget:
+            if goal is None:
+                hop = field.next_hop(self.navigator.cell_id(x // res, y // res))
+                if hop == NO_MOVE:
+                    break
+                dx, dy = DIRECTIONS[hop]
+                goal = (x + dx * res, y + dy * res)
+            run = min(budget, abs(goal[0] - x) + abs(goal[1] - y))
+            x += run * ((goal[0] > x) - (goal[0] < x))
+            y += run * ((goal[1] > y) - (goal[1] < y))
+            budget -= run
+            if (x, y) == goal:
+                goal = None
+        self.ghost_goals[i] = goal
+        self.ghosts[i] = (x, y)
+        return x, y
+
+    def drain_events(self):
+        events = self.events[:]
+        self.events.clear()
+        return events
+
+    @property
+    def pacman_location(self):
+        return self.grid.to_world(self.pacman)
+
+    @property
+    def ghost_locations(self):
+        return [self.grid.to_world(ghost) for ghost in self.ghosts]
+
+    def snapshot(self):
+        """Everything step() changes, for restore() (search / rollouts from a given state)."""
+        return (self.pacman, self.direction, tuple(self.ghosts), tuple(self.ghost_goals), bytes(self.dot_alive),
+                self.dots_left, self.score, self.lives, self.game_over, self.ticks)
+
+    def restore(self, state):
+        (self.pacman, self.direction, ghosts, goals, alive, self.dots_left,
+         self.score, self.lives, self.game_over, self.ticks) = state
+        self.ghosts = list(ghosts)
+        self.ghost_goals = list(goals)
+        self.dot_alive = bytearray(alive)
+        self.events.clear()
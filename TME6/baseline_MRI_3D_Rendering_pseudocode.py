@@ -30,81 +30,57 @@ from mathutils import Vector
 import math
 import sys
 import time
-import scipy
+import hashlib
 
 filepath = bpy.data.filepath
 dir_path = os.path.dirname(filepath)
-# Clear the scene
-bpy.ops.object.select_all(action='SELECT')
-bpy.ops.object.delete()
+# Headless runs (blender --background --python ...) have no .blend file: use the script's folder instead
+if not dir_path and "__file__" in globals():
+    dir_path = os.path.dirname(os.path.abspath(__file__))
 
 
-# The following allows you to install packages directly
-def install_package(package_name):
-    """Install a package using pip if it's not already installed"""
-    try:
-        __import__(package_name)
-        print(f"{package_name} is already installed")
-    except ImportError:
-        print(f"{package_name} not found, attempting to install...")
-        python_exe = sys.executable
-        import subprocess
-        subprocess.check_call([python_exe, "-m", "pip", "install", package_name])
-        print(f"Installed {package_name}")
-
-# Using the above to install tifffile and scikit-image
-try:
-    install_package("tifffile")
-    import tifffile
-except Exception as e:
-    print(f"Error installing tifffile: {e}")
-    print("You may need to manually install tifffile.")
-
-try:
-    install_package("scikit-image")
-    from skimage import measure
-    has_skimage = True
-except Exception as e:
-    print(f"Error installing scikit-image: {e}")
-    has_skimage = False
+#####################################################################################################
+# Function: clear_scene()
+# Purpose: Delete every object of the scene. Called when the script runs, not when it is imported.
+def clear_scene():
+    bpy.ops.object.select_all(action='SELECT')
+    bpy.ops.object.delete()
+#####################################################################################################
+
+
+# Helper modules (pure numpy, no Blender dependency) live next to this script. They import scipy, scikit-image
+# and tifffile inside the stages that use them, so importing this script has no cost beyond numpy and no side
+# effect; missing packages are checked (and installed) under __main__ below.
+if dir_path not in sys.path:
+    sys.path.append(dir_path)
+from mri_io import load_tiff_volume
+from mri_surface import filter_volume, close_mask, isolate_components, marching_cubes_mesh
+from mri_cache import VolumeCache, cached_mask, cached_volume
+from mri_mesh import mesh_buffers, apply_modifier_stack, smooth_mesh, SMOOTHING_METHODS
+from mri_lod import build_lod, export_lod_levels, select_lod
+from mri_sparse import sparse_close_mask
+from mri_decimate import decimate_mesh
+from mri_export import load_mesh_npz
+from mri_volume import (TRANSFER_FUNCTIONS, write_vdb, create_volume_object, create_transfer_material,
+                        set_transfer_function)
+from mri_profile import PROFILER, stage, profiled
+from mri_render_dispatch import dispatch_renders, print_render_report
+from mri_render_quality import configure_render_quality
+from mri_deps import ensure_dependencies
 
 #####################################################################################################
 # Function: import_t1_head(file_path, downsample)
 # Purpose: Load the T1 MRI head from a TIFF file into a normalized, downsampled 3D numpy array.
 def import_t1_head(file_path, downsample=4):
-    # TODO: Verify that file_path exists; if not, raise an error.
-    verify = os.path.exists(file_path)
-    if verify == False:
-        raise FileNotFoundError(f"Error: The file '{file_path}' does not exist.")
-    # TODO: Open the TIFF file using "with tifffile.TiffFile(file_path) as tif:".
-    with tifffile.TiffFile(file_path) as tif:
-    # TODO: Determine the number of slices (depth) and get the image dimensions from the first page.
-        depth = len(tif.pages)
-        first_page = tif.pages[0]
-        height, width = first_page.shape
-
-    # TODO: Loop over tif.pages, converting each page to a float32 array.
-        image = []
-        for page in tif.pages:
-            image.append(page.asarray().astype(np.float32))
-    # TODO: Optionally, print min/max values for the first and last slices for debugging.
-    # TODO: Stack all slices into a 3D numpy array.
-        image = np.array(image, np.float32)
-    # TODO: Normalize the entire volume using: (volume - min) / (max - min).
-        min_val = np.min(image)
-        max_val = np.max(image)
-        if max_val == min_val:
-            image = np.zeros_like(image, dtype=np.float32)  # Avoid division by zero
-        else:
-            image = (image  - min_val) / (max_val - min_val)
-    # TODO: If downsample > 1, apply slicing: volume[::downsample, ::downsample, ::downsample].
-        if downsample > 1:
-            image = image[::downsample, ::downsample, ::downsample]
+    # Verify the path, then read only every `downsample`-th page (memory-mapped when the TIFF
+    # is contiguous), decimating in-plane straight into one preallocated float32 volume that is
+    # normalized in place with (volume - min) / (max - min).
+    image, min_val, max_val = load_tiff_volume(file_path, downsample=downsample)
     # TODO: Print final volume shape and min/max values for verification.
-        print("Final volume shape:", image.shape)
-        print("Min values of volume:", min_val)
-        print("Max values of volume:", max_val)
-        return image
+    print("Final volume shape:", image.shape)
+    print("Min values of volume:", min_val)
+    print("Max values of volume:", max_val)
+    return image
     pass
 #####################################################################################################
 
@@ -135,30 +111,59 @@ def create_t1_material(name="T1_Material"):
 
 
 #####################################################################################################
-# Function: extract_skull_surface_improved(volume_data, threshold, name, smooth_iterations)
+# Function: extract_skull_surface_improved(volume_data, threshold, name, smooth_iterations, closed_data, mc_block_size, mc_workers,
+#                                          custom_normals, slab_depth, slab_workers, scratch_dir,
+#                                          keep_components, min_component_voxels, sparse_brick,
+#                                          mesh_smoothing, mesh_smoothing_iterations, target_faces, decimate_error)
 # Purpose: Extract the skull surface from the volume data using image processing and marching cubes.
-def extract_skull_surface_improved(volume_data, threshold=0.65, name="T1_Skull", smooth_iterations=3):
+#          A precomputed closed mask (e.g. from the preprocessing cache) can be passed as closed_data.
+#          mc_block_size/mc_workers run marching cubes in overlapping blocks across worker processes.
+#          custom_normals=True keeps the marching-cubes normals as custom split normals on the mesh.
+#          slab_depth streams the filter and closing over Z-slabs (slab_workers threads); with scratch_dir
+#          the filtered volume and mask are written to memory-mapped .npy files there.
+#          keep_components / min_component_voxels drop the small blobs of the mask (see isolate_components)
+#          and run marching cubes on the bounding box of what is kept.
+#          sparse_brick (e.g. 16) computes the mask and surface only on the bricks where they can change (see mri_sparse).
+#          mesh_smoothing ("laplacian", "taubin" or "hc") smooths the marching-cubes mesh in numpy (mri_mesh.smooth_mesh)
+#          before it reaches Blender, in place of the Smooth modifier.
+#          target_faces / decimate_error then reduce the mesh by quadric edge collapses (see mri_decimate).
+def extract_skull_surface_improved(volume_data, threshold=0.65, name="T1_Skull", smooth_iterations=3, closed_data=None,
+                                   mc_block_size=None, mc_workers=None, custom_normals=False,
+                                   slab_depth=None, slab_workers=None, scratch_dir=None,
+                                   keep_components=None, min_component_voxels=None, sparse_brick=None,
+                                   mesh_smoothing=None, mesh_smoothing_iterations=10,
+                                   target_faces=None, decimate_error=None):
     # TODO: Print a message indicating the start of skull extraction with the given threshold.
     print("Starting skull extraction with threshold", threshold, "...")
     # TODO: If scikit-image is unavailable, add a placeholder cube (using bpy.ops.mesh.primitive_cube_add) and return it.
     
-    # TODO: Invert the volume data with: inv_data = 1.0 - volume_data.
-    inv_data = 1.0 - volume_data
-    # TODO: Apply a Gaussian filter (e.g., scipy.ndimage.gaussian_filter with sigma=0.7) to inv_data.
-    filtered_data = scipy.ndimage.gaussian_filter(inv_data, sigma=0.7)
-    # TODO: Create a binary volume by thresholding the smoothed data: binary_data = smoothed_volume > threshold.
-    binary_data = filtered_data > threshold
-    
-    from skimage import morphology
-    # TODO: Use binary closing with a 3x3x3 structuring element to fill small holes in the binary data.
-    structuring_element = morphology.ball(1)
-    closed_data = morphology.binary_closing(binary_data, structuring_element)
+    mc_blocks = None
+    if closed_data is None and sparse_brick:
+        closed_data, sparse_info = sparse_close_mask(volume_data, threshold=threshold, sigma=0.7, ball_radius=1,
+                                                     brick=sparse_brick, workers=slab_workers)
+        mc_block_size, mc_blocks = sparse_brick, sparse_info["blocks"]
+    if closed_data is None:
+        filtered_out = mask_out = None
+        if slab_depth and scratch_dir:
+            os.makedirs(scratch_dir, exist_ok=True)
+            filtered_out = os.path.join(scratch_dir, name + "_filtered.npy")
+            mask_out = os.path.join(scratch_dir, name + "_mask.npy")
+        # Invert the volume data and apply a Gaussian filter (sigma=0.7)
+        filtered_data = filter_volume(volume_data, sigma=0.7, slab_depth=slab_depth, out=filtered_out, workers=slab_workers)
+        # Threshold, then use binary closing with a 3x3x3 structuring element to fill small holes
+        closed_data = close_mask(filtered_data, threshold=threshold, ball_radius=1,
+                                 slab_depth=slab_depth, out=mask_out, workers=slab_workers)
     
+    offset = None
+    if keep_components or min_component_voxels:
+        closed_data, offset = isolate_components(closed_data, keep_largest=keep_components, min_voxels=min_component_voxels)
+        mc_blocks = None  # the brick blocks refer to the uncropped mask
+
     # TODO: Run the marching cubes algorithm (measure.marching_cubes) on the processed volume.
     try:
-        verts, faces, normals, values = measure.marching_cubes(closed_data, level=0.5)
-        # Invert for the face being in the front
-        verts[:,2] = -verts[:,2]
+        # Z is inverted for the face being in the front
+        verts, faces, normals = marching_cubes_mesh(closed_data, level=0.5, block_size=mc_block_size, workers=mc_workers,
+                                                    offset=offset, blocks=mc_blocks)
     # TODO: If marching cubes fails, create and return a placeholder cube.
     except:
         bpy.ops.mesh.primitive_cube_add(size=2)
@@ -166,32 +171,202 @@ def extract_skull_surface_improved(volume_data, threshold=0.65, name="T1_Skull",
         return bpy.context.object
     # TODO: Otherwise, create a new Blender mesh from the vertices and faces obtained.
     print("Marching cube suceeds")
-    
+    if mesh_smoothing:
+        verts, normals = smooth_mesh(verts, faces, method=mesh_smoothing, iterations=mesh_smoothing_iterations,
+                                     normals=normals if custom_normals else None)
+        smooth_iterations = 0
+    if target_faces or decimate_error:
+        verts, faces, normals = decimate_mesh(verts, faces, target_faces=target_faces, max_error=decimate_error,
+                                              normals=normals if custom_normals else None)
+    return create_skull_object(verts, faces, name=name, smooth_iterations=smooth_iterations,
+                               normals=normals if custom_normals else None)
+    pass
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: build_mesh_bulk(name, verts, faces, normals)
+# Purpose: Create a Blender mesh from numpy arrays with the foreach_set buffer API (no Python lists, no
+#          per-polygon loop). Marching-cubes normals, if given, are applied as custom split normals.
+@profiled("mesh_upload")
+def build_mesh_bulk(name, verts, faces, normals=None):
+    buffers = mesh_buffers(verts, faces, normals)
+    mesh = mesh_from_buffers(name, buffers)
+    if "vertex_normals" in buffers:
+        if bpy.app.version < (4, 1, 0):
+            mesh.use_auto_smooth = True
+        mesh.normals_split_custom_set_from_vertices(buffers["vertex_normals"].reshape(-1, 3))
+    return mesh
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: mesh_from_buffers(name, buffers)
+# Purpose: Create a Blender mesh from flat foreach_set buffers (see mri_mesh.mesh_buffers); polygons may
+#          have any number of corners, so the quads of a baked Remesh round-trip as well.
+def mesh_from_buffers(name, buffers):
     mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(buffers["co"]) // 3)
+    mesh.loops.add(len(buffers["loop_vertex_index"]))
+    mesh.polygons.add(len(buffers["loop_start"]))
+    mesh.vertices.foreach_set("co", buffers["co"])
+    mesh.loops.foreach_set("vertex_index", buffers["loop_vertex_index"])
+    mesh.polygons.foreach_set("loop_start", buffers["loop_start"])
+    if bpy.app.version < (4, 0, 0):
+        # loop_total is derived from loop_start (and read-only) from Blender 4.0 on
+        mesh.polygons.foreach_set("loop_total", buffers["loop_total"])
+    mesh.polygons.foreach_set("use_smooth", buffers["use_smooth"])
+    mesh.update(calc_edges=True)
+    return mesh
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: mesh_to_buffers(mesh)
+# Purpose: Read a Blender mesh back into the flat buffers used by mesh_from_buffers (foreach_get, no Python loop).
+def mesh_to_buffers(mesh):
+    n_polygons = len(mesh.polygons)
+    buffers = {
+        "co": np.empty(3 * len(mesh.vertices), dtype=np.float32),
+        "loop_vertex_index": np.empty(len(mesh.loops), dtype=np.int32),
+        "loop_start": np.empty(n_polygons, dtype=np.int32),
+        "loop_total": np.empty(n_polygons, dtype=np.int32),
+        "use_smooth": np.empty(n_polygons, dtype=bool),
+    }
+    mesh.vertices.foreach_get("co", buffers["co"])
+    mesh.loops.foreach_get("vertex_index", buffers["loop_vertex_index"])
+    mesh.polygons.foreach_get("loop_start", buffers["loop_start"])
+    mesh.polygons.foreach_get("loop_total", buffers["loop_total"])
+    mesh.polygons.foreach_get("use_smooth", buffers["use_smooth"])
+    return buffers
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: create_skull_object(verts, faces, name, smooth_iterations, normals)
+# Purpose: Build the skull Blender object from marching-cubes vertices and faces.
+@profiled("create_skull_object")
+def create_skull_object(verts, faces, name="T1_Skull", smooth_iterations=3, normals=None):
+    # Convert vertices and faces to Blender format in bulk; polygons are already flagged smooth
+    mesh = build_mesh_bulk(name, verts, faces, normals=normals)
     obj = bpy.data.objects.new(name, mesh)
     col = bpy.data.collections["Collection"]
     col.objects.link(obj)
     bpy.context.view_layer.objects.active = obj
-
-    # Convert vertices and faces to Blender format
-    mesh.from_pydata(verts, [], faces)
-#    mesh.update()
     obj.select_set(True)
     # TODO: Set smooth shading on the mesh, assign the material from create_t1_material, and center the object (set origin to center of volume).
-    for poly in obj.data.polygons:
-            poly.use_smooth = True
     mat = create_t1_material()
     obj.data.materials.append(mat)
     bpy.ops.object.origin_set(type='ORIGIN_CENTER_OF_VOLUME',center='BOUNDS')
     obj.location= (0,0,0)
     
     # TODO: Optionally, add a Smooth modifier (with iterations=smooth_iterations) and a Solidify modifier.
-    mod = obj.modifiers.new(name="Smooth", type='SMOOTH')
-    mod.factor = 0.5
-    mod.iterations = smooth_iterations
+    if smooth_iterations:
+        mod = obj.modifiers.new(name="Smooth", type='SMOOTH')
+        mod.factor = 0.5
+        mod.iterations = smooth_iterations
     modifier_solidify = obj.modifiers.new(name="Solidify", type='SOLIDIFY')
     return obj
-    pass
+#####################################################################################################
+
+
+# Modifier settings that determine the baked geometry (and therefore its cache key)
+MODIFIER_PARAMS = {
+    "SMOOTH": ("factor", "iterations"),
+    "SOLIDIFY": ("thickness", "offset", "use_rim", "use_even_offset"),
+    "REMESH": ("mode", "octree_depth", "scale", "sharpness", "use_remove_disconnected", "threshold"),
+}
+
+
+def modifier_stack(obj):
+    """The object's modifiers as a list of plain dicts ({"type": ..., <setting>: ...}), in stack order."""
+    return [{"type": mod.type, **{p: getattr(mod, p) for p in MODIFIER_PARAMS.get(mod.type, ())}}
+            for mod in obj.modifiers]
+
+
+def replace_mesh(obj, mesh):
+    """Swap the object's data for a plain mesh that already contains the modifier results."""
+    old_mesh = obj.data
+    if not mesh.materials:
+        for mat in old_mesh.materials:
+            mesh.materials.append(mat)
+    obj.modifiers.clear()
+    obj.data = mesh
+    if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+
+
+#####################################################################################################
+# Function: bake_modifiers(obj, cache)
+# Purpose: Evaluate the modifier stack once and replace it by the resulting plain mesh, so every later
+#          render reuses the baked geometry instead of re-evaluating Smooth/Solidify/Remesh.
+#          With a VolumeCache, the baked buffers are stored as .npz keyed by the input mesh and the
+#          modifier settings, and a later run with the same mesh skips the evaluation entirely.
+@profiled("bake_modifiers")
+def bake_modifiers(obj, cache=None):
+    stack = modifier_stack(obj)
+    if not stack:
+        return obj
+    key = None
+    buffers = None
+    if cache is not None:
+        digest = hashlib.sha256()
+        for name, array in sorted(mesh_to_buffers(obj.data).items()):
+            digest.update(name.encode())
+            digest.update(array.tobytes())
+        key = cache.key("baked", digest.hexdigest(), stack)
+        buffers = cache.load_arrays(key)
+        print("Cache hit:" if buffers is not None else "Cache miss:", key)
+
+    if buffers is not None:
+        mesh = mesh_from_buffers(obj.name + "_baked", buffers)
+    else:
+        with stage("modifier_evaluation", modifiers=[m["type"] for m in stack]):
+            bpy.context.view_layer.update()
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            evaluated = obj.evaluated_get(depsgraph)
+            mesh = bpy.data.meshes.new_from_object(evaluated, preserve_all_data_layers=False, depsgraph=depsgraph)
+            mesh.name = obj.name + "_baked"
+        if key is not None:
+            cache.store_arrays(key, **mesh_to_buffers(mesh))
+    replace_mesh(obj, mesh)
+    print("Baked mesh:", len(mesh.vertices), "vertices,", len(mesh.polygons), "polygons")
+    return obj
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: apply_numpy_modifiers(obj)
+# Purpose: Replace the Smooth/Solidify modifiers by mri_mesh.apply_modifier_stack (Laplacian smoothing and
+#          shelling in numpy) and upload the result as a plain mesh. Remesh has no numpy counterpart and is dropped.
+def apply_numpy_modifiers(obj):
+    stack = modifier_stack(obj)
+    buffers = mesh_to_buffers(obj.data)
+    if np.any(buffers["loop_total"] != 3):
+        raise ValueError("numpy modifiers need a triangle mesh")
+    verts, faces = apply_modifier_stack(buffers["co"].reshape(-1, 3), buffers["loop_vertex_index"].reshape(-1, 3), stack)
+    replace_mesh(obj, build_mesh_bulk(obj.name + "_baked", verts, faces))
+    return obj
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: create_lod_object(closed_data, factors, triangle_budget, name, export_dir, export_formats)
+# Purpose: Build the skull object of the finest LOD level that fits the triangle budget (a preview); only
+#          that level is uploaded. Without export_dir only that level (and two coarse pilots) is extracted;
+#          with it every factor is extracted and written to export_dir as its own mesh file first.
+def create_lod_object(closed_data, factors=(8, 4, 2, 1), triangle_budget=None, name="T1_Skull", export_dir=None,
+                      export_formats=("npz",)):
+    if export_dir:
+        levels = export_lod_levels(closed_data, export_dir, factors=factors, formats=export_formats, level=0.5)
+        print(f"Exported {len(levels)} LOD levels to {export_dir}")
+        chosen = select_lod(levels, triangle_budget=triangle_budget)
+    else:
+        chosen = build_lod(closed_data, factors=factors, triangle_budget=triangle_budget, level=0.5)
+    skull = create_skull_object(chosen["verts"], chosen["faces"], name=f"{name}_LOD{chosen['factor']}")
+    print(f"Using LOD 1/{chosen['factor']} ({chosen['triangles']} triangles)")
+    bpy.context.view_layer.objects.active = skull
+    return skull
 #####################################################################################################
 
 
@@ -299,27 +474,122 @@ def setup_t1_head_cameras():
 
 
 #####################################################################################################
-# Function: process_t1_head(file_path, output_path, downsample, threshold, absolute_scale)
+# Function: process_t1_head(file_path, output_path, downsample, threshold, absolute_scale, cache_dir, cache_budget_gb,
+#                           mc_block_size, mc_workers, lod_factors, lod_triangle_budget, lod_export_dir,
+#                           lod_export_formats,
+#                           slab_depth, slab_workers, scratch_dir, trace_path, chrome_trace_path, numpy_modifiers,
+#                           render_workers, render_tiles, compare_sequential, render_quality, view_budget,
+#                           keep_components, min_component_voxels, sparse_brick, mesh_smoothing,
+#                           mesh_smoothing_iterations, target_faces, decimate_error, volume_render, transfers, vdb_tolerance)
 # Purpose: Process and visualize the T1 MRI head by loading data, extracting the skull, applying modifiers, and rendering images.
-def process_t1_head(file_path, output_path, downsample=4, threshold=0.65, absolute_scale=24.0):
-    # TODO: Print starting information: file path, output path, threshold, downsample factor, and absolute scale.
-    print("File path", file_path)
-    print("Output path", output_path)
-    print("Downsample", downsample)
-    print("Threshold", threshold)
-    print("Absolute scale", absolute_scale)
+#          With cache_dir set, the normalized volume, filtered volume and closed mask are reused across runs
+#          and only the stages downstream of a changed parameter are recomputed.
+#          With lod_factors (e.g. (8, 4, 2, 1)) only the finest level within lod_triangle_budget is
+#          extracted and rendered, so previews run on a coarse level; the final render leaves lod_factors
+#          unset and extracts the full-resolution surface. lod_export_dir also writes every factor as
+#          its own mesh (lod_<factor>.<format>, lod_export_formats npz/ply) for switching levels later.
+#          Stage timings are printed at the end and written to trace_path (JSON) / chrome_trace_path.
+#          The cache also keeps the baked modifier result; numpy_modifiers replaces the Blender stack, and
+#          render_workers / render_tiles / compare_sequential control the parallel render and
+#          render_quality / view_budget the Cycles settings (see render_skull).
+#          keep_components / min_component_voxels remove mask debris before marching cubes, and sparse_brick
+#          restricts filtering, closing and marching cubes to the active bricks of the volume.
+#          mesh_smoothing smooths the marching-cubes mesh in numpy and drops both Smooth modifiers;
+#          target_faces / decimate_error decimate it before it is uploaded.
+#          volume_render renders the normalized volume directly through each transfer function in `transfers`
+#          instead of extracting a surface (see render_volume).
+def process_t1_head(file_path, output_path, downsample=4, threshold=0.65, absolute_scale=24.0,
+                    cache_dir=None, cache_budget_gb=4.0, mc_block_size=None, mc_workers=None,
+                    lod_factors=None, lod_triangle_budget=None, lod_export_dir=None, lod_export_formats=("npz",),
+                    slab_depth=None, slab_workers=None, scratch_dir=None,
+                    trace_path=None, chrome_trace_path=None, numpy_modifiers=False,
+                    render_workers=1, render_tiles=1, compare_sequential=False, render_quality=None, view_budget=None,
+                    keep_components=None, min_component_voxels=None, sparse_brick=None,
+                    mesh_smoothing=None, mesh_smoothing_iterations=10, target_faces=None, decimate_error=None,
+                    volume_render=False, transfers=("skull",), vdb_tolerance=0.01):
+    PROFILER.reset()
+    with stage("process_t1_head", file_path=file_path, downsample=downsample, threshold=threshold):
+        # TODO: Print starting information: file path, output path, threshold, downsample factor, and absolute scale.
+        print("File path", file_path)
+        print("Output path", output_path)
+        print("Downsample", downsample)
+        print("Threshold", threshold)
+        print("Absolute scale", absolute_scale)
     
-    # TODO: Call import_t1_head() with file_path and downsample to load volume_data.
-    volume_data = import_t1_head(file_path, downsample=downsample)
-    # TODO: Call extract_skull_surface_improved(volume_data, threshold) to obtain the skull mesh object.
-    skull = extract_skull_surface_improved(volume_data, threshold=threshold, smooth_iterations=3) 
+        closed_data = None
+        volume_data = None
+        cache = None
+        if cache_dir:
+            cache = VolumeCache(cache_dir, max_bytes=int(cache_budget_gb * 1024**3))
+            if volume_render:
+                volume_data = cached_volume(cache, file_path, downsample=downsample)
+            else:
+                closed_data = cached_mask(cache, file_path, downsample=downsample, sigma=0.7, threshold=threshold,
+                                          ball_radius=1)
+        else:
+            # TODO: Call import_t1_head() with file_path and downsample to load volume_data.
+            volume_data = import_t1_head(file_path, downsample=downsample)
+
+        if volume_render:
+            render_volume(volume_data, output_path, absolute_scale=absolute_scale, transfers=transfers,
+                          tolerance=vdb_tolerance, render_quality=render_quality, view_budget=view_budget)
+        elif lod_factors:
+            if closed_data is None:
+                filtered_data = filter_volume(volume_data, sigma=0.7, slab_depth=slab_depth, workers=slab_workers)
+                closed_data = close_mask(filtered_data, threshold=threshold, ball_radius=1,
+                                         slab_depth=slab_depth, workers=slab_workers)
+            skull = create_lod_object(closed_data, factors=lod_factors, triangle_budget=lod_triangle_budget,
+                                      export_dir=lod_export_dir, export_formats=lod_export_formats)
+        else:
+            # TODO: Call extract_skull_surface_improved(volume_data, threshold) to obtain the skull mesh object.
+            skull = extract_skull_surface_improved(volume_data, threshold=threshold, smooth_iterations=3, closed_data=closed_data,
+                                                   mc_block_size=mc_block_size, mc_workers=mc_workers,
+                                                   slab_depth=slab_depth, slab_workers=slab_workers, scratch_dir=scratch_dir,
+                                                   keep_components=keep_components,
+                                                   min_component_voxels=min_component_voxels,
+                                                   sparse_brick=sparse_brick,
+                                                   mesh_smoothing=mesh_smoothing,
+                                                   mesh_smoothing_iterations=mesh_smoothing_iterations,
+                                                   target_faces=target_faces, decimate_error=decimate_error)
+        if not volume_render:
+            render_skull(skull, output_path, absolute_scale=absolute_scale, numpy_modifiers=numpy_modifiers,
+                         bake_cache=cache, render_workers=render_workers, render_tiles=render_tiles,
+                         compare_sequential=compare_sequential, render_quality=render_quality, view_budget=view_budget,
+                         smooth_iterations=0 if mesh_smoothing and not lod_factors else 5)
+    print(PROFILER.summary())
+    if trace_path:
+        PROFILER.write_json(trace_path)
+    if chrome_trace_path:
+        PROFILER.write_chrome_trace(chrome_trace_path)
+    pass
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: render_skull(skull, output_path, absolute_scale, numpy_modifiers, bake_cache,
+#                        render_workers, render_tiles, compare_sequential, render_quality, view_budget, smooth_iterations)
+# Purpose: Scale the skull, add the finishing modifiers, set up lighting and cameras, and render every view.
+#          The modifier stack is baked into a plain mesh once (bake_cache: optional VolumeCache for the
+#          baked mesh), so the four renders do not re-evaluate it. With numpy_modifiers, Smooth/Solidify
+#          are applied in numpy instead and the Remesh step is skipped.
+#          With render_workers > 1 the views are rendered by that many headless Blender processes
+#          (render_tiles > 1 also splits each view into bands); compare_sequential additionally times
+#          the in-process loop into output_path/sequential/ and prints the speed-up.
+#          render_quality picks a preset from mri_render_quality (draft, review, publication) or "auto",
+#          which calibrates on the perspective camera and fits view_budget seconds per view.
+#          smooth_iterations=0 leaves out the Smooth modifier (for meshes already smoothed in numpy).
+@profiled("render_skull")
+def render_skull(skull, output_path, absolute_scale=24.0, numpy_modifiers=False, bake_cache=None,
+                 render_workers=1, render_tiles=1, compare_sequential=False, render_quality=None, view_budget=None,
+                 smooth_iterations=5):
     # TODO: Set the skull object's scale to (absolute_scale, absolute_scale, absolute_scale).
     skull.select_set(True)
     skull.scale = (absolute_scale, absolute_scale, absolute_scale)
     # TODO: Add a Smooth modifier (e.g., factor 0.5 and iterations 3-5) to enhance surface quality.
-    modifier_smooth = skull.modifiers.new(name="Smooth", type='SMOOTH')
-    modifier_smooth.factor = 0.7
-    modifier_smooth.iterations = 5
+    if smooth_iterations:
+        modifier_smooth = skull.modifiers.new(name="Smooth", type='SMOOTH')
+        modifier_smooth.factor = 0.7
+        modifier_smooth.iterations = smooth_iterations
 
     print("Smooth shading, material assignment, and centering complete.")
     
@@ -332,42 +602,168 @@ def process_t1_head(file_path, output_path, downsample=4, threshold=0.65, absolu
     print("Solidify modifier")
     
     # TODO: Optionally, add a Remesh modifier for a more uniform mesh.
-    modifier_remesh = skull.modifiers.new(name="Remesh", type='REMESH')
-    modifier_remesh.mode = 'SHARP'
-    modifier_remesh.octree_depth = 8
-    modifier_remesh.scale = 0.7
-    print("Remesh")
-    
+    if numpy_modifiers:
+        apply_numpy_modifiers(skull)
+    else:
+        modifier_remesh = skull.modifiers.new(name="Remesh", type='REMESH')
+        modifier_remesh.mode = 'SHARP'
+        modifier_remesh.octree_depth = 8
+        modifier_remesh.scale = 0.7
+        print("Remesh")
+        # Evaluate the stack once and render every view from the baked mesh
+        bake_modifiers(skull, cache=bake_cache)
+
     # TODO: Call setup_medical_lighting() to configure the scene lighting.
     setup_medical_lighting()
     # TODO: Call setup_t1_head_cameras() to create and position the cameras.
     cameras = setup_t1_head_cameras()
+    if render_quality:
+        with stage("render_quality", quality=render_quality):
+            configure_render_quality(bpy.context.scene, render_quality, view_budget=view_budget, camera=cameras[-1])
     
     # TODO: Create the output directory if it does not exist.
     if os.path.exists(output_path)==False:
         os.makedirs(output_path)
+    if render_workers and render_workers > 1:
+        with stage("parallel_render", workers=render_workers, tiles=render_tiles):
+            report = dispatch_renders([camera.name for camera in cameras], output_path,
+                                      workers=render_workers, tiles=render_tiles)
+        sequential_seconds = None
+        if compare_sequential:
+            sequential_seconds = render_views(cameras, os.path.join(output_path, "sequential") + os.sep)
+        print_render_report(report, sequential_seconds)
+    else:
+        render_views(cameras, output_path)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: render_views(cameras, output_path)
+# Purpose: Render every camera in this process, one after the other; returns the seconds per view.
+def render_views(cameras, output_path):
+    os.makedirs(output_path, exist_ok=True)
     # TODO: Loop through each camera view:
     #         - Set the active camera.
     #         - Modify the render output filepath to include the view name.
     #         - Render the image and save it.
     camera_view_names = ["Sagittal_Cam", "Coronal_Cam","Axial_Cam", "Perspective_Cam"]
+    view_seconds = {}
     for i,camera in enumerate(cameras):
         bpy.context.scene.camera = camera
         bpy.context.scene.render.filepath = output_path + camera_view_names[i]
-        bpy.ops.render.render(write_still=True)
+        with stage("render", view=camera_view_names[i]) as record:
+            bpy.ops.render.render(write_still=True)
+        view_seconds[camera_view_names[i]] = record.wall
         print("Rendering camera ", camera_view_names[i])
-    pass
+    return view_seconds
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: render_volume(volume_data, output_path, absolute_scale, transfers, tolerance, render_quality, view_budget)
+# Purpose: Direct volume rendering: write the normalized volume once to a sparse VDB grid (voxels within `tolerance`
+#          of black are not stored), load it as a volume object scaled and centred like the skull mesh, and render
+#          every view once per transfer function into output_path/<transfer>/. Only the material's ramp changes
+#          between transfer functions; the grid is neither rewritten nor reloaded.
+@profiled("render_volume")
+def render_volume(volume_data, output_path, absolute_scale=24.0, transfers=("skull",), tolerance=0.01,
+                  render_quality=None, view_budget=None):
+    os.makedirs(output_path, exist_ok=True)
+    vdb_path = os.path.join(output_path, "t1_volume.vdb")
+    grid_info = write_vdb(volume_data, vdb_path, tolerance=tolerance)
+    print(f"VDB grid: {grid_info['active_voxels']} active voxels, {grid_info['memory_bytes'] / 1024**2:.1f} MB in memory, "
+          f"{grid_info['file_bytes'] / 1024**2:.1f} MB on disk")
+    volume = create_volume_object(vdb_path)
+    # Grid index bounds are [0, n0-1] x [0, n1-1] x [-(n2-1), 0] (see mri_volume.grid_array)
+    n0, n1, n2 = volume_data.shape
+    center = Vector(((n0 - 1) / 2, (n1 - 1) / 2, -(n2 - 1) / 2))
+    volume.scale = (absolute_scale, absolute_scale, absolute_scale)
+    volume.location = -center * absolute_scale
+    material = create_transfer_material(transfer=transfers[0])
+    volume.data.materials.append(material)
+
+    setup_medical_lighting()
+    cameras = setup_t1_head_cameras()
+    if render_quality:
+        with stage("render_quality", quality=render_quality):
+            configure_render_quality(bpy.context.scene, render_quality, view_budget=view_budget, camera=cameras[-1])
+    for transfer in transfers:
+        with stage("transfer_function", transfer=transfer):
+            set_transfer_function(material, transfer)
+        render_views(cameras, os.path.join(output_path, transfer) + os.sep)
+    return volume
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: render_mesh_file(mesh_path, output_path, absolute_scale, name, numpy_modifiers, cache_dir,
+#                            render_workers, render_tiles, render_quality, view_budget)
+# Purpose: Render a skull mesh saved as .npz by the batch runner or mri_export (any precision variant).
+def render_mesh_file(mesh_path, output_path, absolute_scale=24.0, name="T1_Skull", numpy_modifiers=False, cache_dir=None,
+                     render_workers=1, render_tiles=1, render_quality=None, view_budget=None):
+    verts, faces, _ = load_mesh_npz(mesh_path)
+    skull = create_skull_object(verts, faces, name=name, smooth_iterations=3)
+    cache = VolumeCache(cache_dir) if cache_dir else None
+    render_skull(skull, output_path, absolute_scale=absolute_scale, numpy_modifiers=numpy_modifiers, bake_cache=cache,
+                 render_workers=render_workers, render_tiles=render_tiles, render_quality=render_quality,
+                 view_budget=view_budget)
 #####################################################################################################
 
 
 #####################################################################################################
 # Execute
 if __name__ == "__main__":
+    # Arguments after "--" (blender --background --python <this file> -- ...) override the defaults below;
+    # the batch runner uses --mesh to render a surface that was extracted outside Blender.
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=None)
+    parser.add_argument("--mesh", default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--downsample", type=int, default=2)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--absolute-scale", type=float, default=1.0)
+    parser.add_argument("--numpy-modifiers", action="store_true", help="Smooth/Solidify in numpy, no Remesh")
+    parser.add_argument("--cache-dir", default=None, help="Cache for intermediate volumes and baked meshes")
+    parser.add_argument("--render-workers", type=int, default=1, help="Headless Blender processes for the views")
+    parser.add_argument("--render-tiles", type=int, default=1, help="Horizontal bands per view (parallel render)")
+    parser.add_argument("--compare-sequential", action="store_true", help="Also time the in-process render loop")
+    parser.add_argument("--quality", default=None, choices=["draft", "review", "publication", "auto"],
+                        help="Render quality preset (default: Blender's scene settings)")
+    parser.add_argument("--view-budget", type=float, default=None, help="Seconds per view (time limit; required for auto)")
+    parser.add_argument("--keep-components", type=int, default=None, help="Keep only the N largest mask components")
+    parser.add_argument("--min-component-voxels", type=int, default=None, help="Also keep components at least this large")
+    parser.add_argument("--sparse-brick", type=int, default=None, help="Brick size for sparse processing (e.g. 16)")
+    parser.add_argument("--smoothing", default=None, choices=SMOOTHING_METHODS,
+                        help="Smooth the marching-cubes mesh in numpy instead of with Smooth modifiers")
+    parser.add_argument("--smoothing-iterations", type=int, default=10)
+    parser.add_argument("--target-faces", type=int, default=None, help="Decimate the mesh to this many faces")
+    parser.add_argument("--decimate-error", type=float, default=None,
+                        help="Stop decimating at this quadric error (squared voxels)")
+    parser.add_argument("--lod-factors", type=int, nargs="+", default=None,
+                        help="Preview on a LOD level (pooling factors, e.g. 8 4 2 1) instead of the full surface")
+    parser.add_argument("--lod-triangle-budget", type=int, default=None, help="Finest LOD level within this many triangles")
+    parser.add_argument("--lod-export", default=None, help="Write every LOD level as its own mesh to this folder (default factors 8 4 2 1)")
+    parser.add_argument("--lod-export-formats", nargs="+", default=["npz"], choices=["npz", "ply"])
+    parser.add_argument("--volume-render", action="store_true", help="Render the volume directly instead of a surface")
+    parser.add_argument("--transfer", nargs="+", default=["skull"], choices=sorted(TRANSFER_FUNCTIONS),
+                        help="Transfer functions to render with --volume-render (one pass each, same grid)")
+    parser.add_argument("--vdb-tolerance", type=float, default=0.01, help="Values below this are not stored in the grid")
+    parser.add_argument("--no-install", action="store_true", help="Report missing packages instead of pip-installing them")
+    args = parser.parse_args(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
+
+    # The following installs tifffile and scikit-image into Blender's Python if they are missing
+    ensure_dependencies(install=not args.no_install)
+    # Clear the scene
+    clear_scene()
+
     # TODO: Set the file path to the provided T1 MRI file (e.g., "t1-head.tif")
     #       and the output path for saving the rendered images.
-    t1_file = dir_path + "/t1-head.tif"          # TODO: update with actual path
+    t1_file = args.input or dir_path + "/t1-head.tif"          # TODO: update with actual path
     print(t1_file)
-    output_path = dir_path + "/save/"   # TODO: update with actual path
+    output_path = args.output or dir_path + "/save/"   # TODO: update with actual path
+    if not output_path.endswith(os.sep):
+        output_path += os.sep
     
     # Print file and output information.
     # Call process_t1_head() with appropriate parameters:
@@ -376,11 +772,38 @@ if __name__ == "__main__":
     #   - absolute_scale for final object scaling (e.g., 24.0).
     # Make note of how the 3D model changes (e.g., your expectations with downsampling vs. what actually happens
     # or how changing threshold, scale can impact the final render). 
-    process_t1_head(
-        file_path=t1_file,
-        output_path=output_path,
-        downsample=2,
-        threshold=0.85,
-        absolute_scale=1.0
-    )
+    if args.mesh:
+        render_mesh_file(args.mesh, output_path, absolute_scale=args.absolute_scale,
+                         numpy_modifiers=args.numpy_modifiers, cache_dir=args.cache_dir,
+                         render_workers=args.render_workers, render_tiles=args.render_tiles,
+                         render_quality=args.quality, view_budget=args.view_budget)
+    else:
+        process_t1_head(
+            file_path=t1_file,
+            output_path=output_path,
+            downsample=args.downsample,
+            threshold=args.threshold,
+            absolute_scale=args.absolute_scale,
+            cache_dir=args.cache_dir,
+            numpy_modifiers=args.numpy_modifiers,
+            render_workers=args.render_workers,
+            render_tiles=args.render_tiles,
+            compare_sequential=args.compare_sequential,
+            render_quality=args.quality,
+            view_budget=args.view_budget,
+            keep_components=args.keep_components,
+            min_component_voxels=args.min_component_voxels,
+            sparse_brick=args.sparse_brick,
+            mesh_smoothing=args.smoothing,
+            mesh_smoothing_iterations=args.smoothing_iterations,
+            target_faces=args.target_faces,
+            decimate_error=args.decimate_error,
+            lod_factors=args.lod_factors or ((8, 4, 2, 1) if args.lod_export else None),
+            lod_triangle_budget=args.lod_triangle_budget,
+            lod_export_dir=args.lod_export,
+            lod_export_formats=args.lod_export_formats,
+            volume_render=args.volume_render,
+            transfers=args.transfer,
+            vdb_tolerance=args.vdb_tolerance
+        )
 #####################################################################################################
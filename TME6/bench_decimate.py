@@ -0,0 +1,132 @@
+"""
+Benchmark: quadric decimation of the full-resolution surface (mri_decimate) against the
+coarser voxel downsampling that was the only way to get a lighter mesh.
+
+For every target fraction it reports the faces, the decimation time, the size of the
+buffers uploaded to Blender (mesh_buffers), and the distance from the full-resolution
+surface to the reduced one (mean and 99th percentile, in full-resolution voxels). The
+same numbers are given for marching cubes on the volume loaded with --downsample 2 and 4.
+The reduced meshes are checked to keep the open boundary of the input and to have no
+degenerate faces. A synthetic closed surface of --large-faces triangles (a bumpy torus, 3
+million by default) is then decimated to the same fractions, with the numba kernel and,
+with --python, the pure-Python loop.
+
+    python bench_decimate.py --input t1-rendering.tif --fractions 0.5 0.25 0.1
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_io import load_tiff_volume
+from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+from mri_mesh import mesh_buffers, boundary_edges
+from mri_decimate import decimate_mesh, _numba_kernels
+
+
+def surface_points(verts, faces):
+    # Vertices, face centroids and edge midpoints: a dense enough sampling for a nearest-point distance
+    tri = verts[faces]
+    return np.concatenate([verts, tri.mean(axis=1), 0.5 * (tri[:, 0] + tri[:, 1]),
+                           0.5 * (tri[:, 1] + tri[:, 2]), 0.5 * (tri[:, 2] + tri[:, 0])])
+
+
+def distance(reference, verts, faces):
+    from scipy.spatial import cKDTree
+    d, _ = cKDTree(surface_points(verts, faces)).query(reference)
+    return d.mean(), np.percentile(d, 99)
+
+
+def bumpy_torus(n_faces):
+    # Closed grid surface of about n_faces triangles with bumps at a few scales, edges about one unit long
+    n_minor = max(int(np.sqrt(n_faces / 6)), 8)
+    n_major = 3 * n_minor
+    i, j = np.meshgrid(np.arange(n_major), np.arange(n_minor), indexing="ij")
+    theta, phi = 2 * np.pi * i / n_major, 2 * np.pi * j / n_minor
+    r = 1.0 + 0.05 * np.sin(7 * theta) * np.cos(5 * phi) + 0.02 * np.sin(23 * theta + 11 * phi)
+    ring = 3.0 + r * np.cos(phi)
+    verts = np.stack([ring * np.cos(theta), ring * np.sin(theta), r * np.sin(phi)], axis=-1).reshape(-1, 3)
+    verts *= n_minor / (2 * np.pi)
+    a = i * n_minor + j
+    b = (i + 1) % n_major * n_minor + j
+    c = (i + 1) % n_major * n_minor + (j + 1) % n_minor
+    d = i * n_minor + (j + 1) % n_minor
+    faces = np.concatenate([np.stack([a, b, c], axis=-1), np.stack([a, c, d], axis=-1)]).reshape(-1, 3)
+    return verts.astype(np.float32), faces.astype(np.int32)
+
+
+def decimate_checked(name, verts, faces, fraction, reference, open_edges, use_numba):
+    start = time.perf_counter()
+    d_verts, d_faces, _ = decimate_mesh(verts, faces, target_faces=int(fraction * len(faces)), use_numba=use_numba)
+    seconds = time.perf_counter() - start
+    degenerate = np.any((d_faces[:, 0] == d_faces[:, 1]) | (d_faces[:, 1] == d_faces[:, 2])
+                        | (d_faces[:, 2] == d_faces[:, 0]))
+    if degenerate or len(boundary_edges(d_faces)) != open_edges:
+        sys.exit(f"{name}: decimation to {fraction} broke the mesh")
+    if len(d_faces) > fraction * len(faces) * 1.05:
+        sys.exit(f"{name}: decimation to {fraction} stopped at {len(d_faces)} faces")
+    row(f"{name} {fraction:g}", d_verts, d_faces, seconds, reference)
+
+
+def surface(volume, threshold):
+    return marching_cubes_mesh(close_mask(filter_volume(volume), threshold=threshold), level=0.5)
+
+
+def row(name, verts, faces, seconds, reference):
+    mean, p99 = distance(reference, verts, faces)
+    upload = sum(b.nbytes for b in mesh_buffers(verts, faces).values()) / 1024**2
+    print(f"{name:<22}{len(faces):>10}{seconds:>10.2f}{upload:>12.1f}{mean:>10.3f}{p99:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "t1-rendering.tif"))
+    parser.add_argument("--threshold", type=float, default=0.65)
+    parser.add_argument("--fractions", type=float, nargs="+", default=[0.5, 0.25, 0.1])
+    parser.add_argument("--coarse", type=int, nargs="*", default=[2, 4], help="Voxel downsampling factors to compare")
+    parser.add_argument("--large-faces", type=int, default=3_000_000, help="Synthetic surface size (0: skip)")
+    parser.add_argument("--python", action="store_true", help="Also time the pure-Python loop")
+    args = parser.parse_args()
+    # use_numba values to time: the kernel when numba is installed, the Python loop with --python or without numba
+    methods = []
+    if _numba_kernels() is not None:
+        # Compile outside the timings
+        decimate_mesh(*bumpy_torus(1000), target_faces=500, use_numba=True)
+        methods.append(True)
+    if args.python or not methods:
+        methods.append(False)
+
+    volume, _, _ = load_tiff_volume(args.input, downsample=1)
+    verts, faces, _ = surface(volume, args.threshold)
+    reference = surface_points(verts, faces)
+    open_edges = len(boundary_edges(faces))
+
+    print(f"{'mesh':<22}{'faces':>10}{'seconds':>10}{'upload MB':>12}{'mean d':>10}{'p99 d':>10}")
+    row("full resolution", verts, faces, 0.0, reference)
+    for use_numba in methods:
+        name = "numba" if use_numba else "python"
+        for fraction in args.fractions:
+            decimate_checked(name, verts, faces, fraction, reference, open_edges, use_numba)
+    for factor in args.coarse:
+        start = time.perf_counter()
+        coarse, _, _ = load_tiff_volume(args.input, downsample=factor)
+        c_verts, c_faces, _ = surface(coarse, args.threshold)
+        seconds = time.perf_counter() - start
+        row(f"downsample {factor}", c_verts * factor, c_faces, seconds, reference)
+
+    if args.large_faces:
+        verts, faces = bumpy_torus(args.large_faces)
+        # Distances to the dense grid vertices: its surface points alone would not fit a k-d tree comfortably
+        print(f"\nbumpy torus, closed ({len(verts)} vertices)")
+        row("full resolution", verts, faces, 0.0, verts)
+        for use_numba in methods:
+            name = "numba" if use_numba else "python"
+            for fraction in args.fractions:
+                decimate_checked(name, verts, faces, fraction, verts, 0, use_numba)
+
+
+if __name__ == "__main__":
+    main()
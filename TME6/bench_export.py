@@ -0,0 +1,180 @@
+"""
+Benchmark: headless mesh export (mri_export) in every format and vertex encoding, with the
+files read back and checked.
+
+Extracts the skull of a T1 stack (or a synthetic sphere without --input), writes it as PLY,
+GLB and NPZ with float32, float16 (NPZ only) and 16-bit quantized positions, and reports
+size and write time. Every GLB is checked against the glTF 2.0 layout rules the Khronos
+validator enforces (chunk lengths, 4-byte aligned vertex attribute elements and strides,
+accessors inside their buffer views, min/max matching the data, indices in range,
+KHR_mesh_quantization declared) and decoded through its node transform back to the input
+vertices; NPZ files are reloaded with load_mesh_npz.
+
+    python bench_export.py --input t1-rendering.tif --downsample 1
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_export import export_mesh, load_mesh_npz
+
+COMPONENTS = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+TYPE_SIZES = {"SCALAR": 1, "VEC3": 3, "VEC4": 4}
+
+
+def sphere_mesh(n=64):
+    from skimage import measure
+    z, y, x = np.mgrid[:n, :n, :n] - n / 2 + 0.3
+    verts, faces, normals, _ = measure.marching_cubes((x * x + y * y + z * z) < (n / 3) ** 2, level=0.5)
+    return verts, faces, normals
+
+
+def read_glb(path):
+    """Parse a GLB and return (gltf, accessor arrays); raise ValueError on a layout rule violation."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, total = struct.unpack_from("<4sII", data, 0)
+    if magic != b"glTF" or version != 2 or total != len(data):
+        raise ValueError(f"bad GLB header {magic} v{version} length {total} (file {len(data)})")
+    json_length, json_type = struct.unpack_from("<I4s", data, 12)
+    if json_type != b"JSON" or json_length % 4:
+        raise ValueError("JSON chunk missing or not 4-byte padded")
+    gltf = json.loads(data[20:20 + json_length])
+    bin_at = 20 + json_length
+    bin_length, bin_type = struct.unpack_from("<I4s", data, bin_at)
+    if bin_type != b"BIN\0" or bin_length % 4 or bin_at + 8 + bin_length != len(data):
+        raise ValueError("BIN chunk missing, not 4-byte padded or not at the end")
+    if gltf["buffers"][0]["byteLength"] > bin_length:
+        raise ValueError("buffer longer than the BIN chunk")
+    binary = data[bin_at + 8:bin_at + 8 + bin_length]
+
+    for i, view in enumerate(gltf["bufferViews"]):
+        if view.get("byteOffset", 0) + view["byteLength"] > gltf["buffers"][0]["byteLength"]:
+            raise ValueError(f"bufferView {i} runs past its buffer")
+        stride = view.get("byteStride")
+        if stride is not None and (stride % 4 or not 4 <= stride <= 252):
+            raise ValueError(f"bufferView {i}: byteStride {stride} is not a multiple of 4 in [4, 252]")
+        if stride is not None and view.get("target") == 34963:
+            raise ValueError(f"bufferView {i}: index views must not have a byteStride")
+
+    arrays = []
+    for i, accessor in enumerate(gltf["accessors"]):
+        view = gltf["bufferViews"][accessor["bufferView"]]
+        dtype = np.dtype(COMPONENTS[accessor["componentType"]])
+        width = TYPE_SIZES[accessor["type"]]
+        element = dtype.itemsize * width
+        offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+        stride = view.get("byteStride", element)
+        if offset % dtype.itemsize:
+            raise ValueError(f"accessor {i}: offset {offset} not aligned to its component size")
+        if view.get("target") == 34962 and (offset % 4 or stride % 4):
+            raise ValueError(f"accessor {i}: vertex attribute elements of {element} bytes every {stride} bytes "
+                             f"at offset {offset} are not 4-byte aligned")
+        if stride < element:
+            raise ValueError(f"accessor {i}: byteStride {stride} smaller than its {element}-byte elements")
+        count = accessor["count"]
+        if accessor.get("byteOffset", 0) + stride * (count - 1) + element > view["byteLength"]:
+            raise ValueError(f"accessor {i} runs past its bufferView")
+        rows = np.frombuffer(binary, dtype=np.uint8, count=stride * (count - 1) + element, offset=offset)
+        rows = np.lib.stride_tricks.as_strided(rows, shape=(count, element), strides=(stride, 1))
+        values = np.ascontiguousarray(rows).view(dtype).reshape(count, width)
+        for bound, actual in (("min", values.min(axis=0)), ("max", values.max(axis=0))):
+            if bound in accessor and not np.allclose(accessor[bound], actual, rtol=0, atol=1e-6):
+                raise ValueError(f"accessor {i}: {bound} {accessor[bound]} does not match the data {actual.tolist()}")
+        if accessor.get("normalized"):
+            values = np.maximum(values.astype(np.float32) / np.iinfo(dtype).max, -1.0)
+        arrays.append(values)
+
+    primitive = gltf["meshes"][0]["primitives"][0]
+    n_verts = gltf["accessors"][primitive["attributes"]["POSITION"]]["count"]
+    if arrays[primitive["indices"]].max() >= n_verts:
+        raise ValueError("index out of range")
+    position_type = gltf["accessors"][primitive["attributes"]["POSITION"]]["componentType"]
+    if position_type != 5126 and "KHR_mesh_quantization" not in gltf.get("extensionsRequired", []):
+        raise ValueError("non-float positions without KHR_mesh_quantization in extensionsRequired")
+    return gltf, arrays
+
+
+def check_glb(path, verts, faces, normals, tolerance):
+    gltf, arrays = read_glb(path)
+    primitive = gltf["meshes"][0]["primitives"][0]
+    node = gltf["nodes"][0]
+    positions = arrays[primitive["attributes"]["POSITION"]].astype(np.float64)
+    # Node TRS: scale, then rotation (-90 degrees about X, Z-up to Y-up), then translation; compare in the input
+    # frame, where the translation is the un-rotated offset
+    tx, ty, tz = node.get("translation", [0.0, 0.0, 0.0])
+    positions = positions * node.get("scale", [1.0, 1.0, 1.0]) + [tx, -tz, ty]
+    if np.abs(positions - verts).max() > tolerance:
+        raise ValueError(f"positions differ by {np.abs(positions - verts).max():.3g} (tolerance {tolerance:.3g})")
+    if not np.array_equal(arrays[primitive["indices"]].reshape(-1, 3), faces):
+        raise ValueError("faces differ")
+    if normals is not None:
+        decoded = arrays[primitive["attributes"]["NORMAL"]]
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        unit = normals / np.where(length > 0, length, 1.0)
+        if np.abs(decoded - unit).max() > 1.5 / 127:
+            raise ValueError("normals differ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=None, help="T1 TIFF stack (default: synthetic sphere)")
+    parser.add_argument("--downsample", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    args = parser.parse_args()
+
+    if args.input:
+        from mri_io import load_tiff_volume
+        from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+        volume, _, _ = load_tiff_volume(args.input, downsample=args.downsample)
+        verts, faces, normals = marching_cubes_mesh(close_mask(filter_volume(volume), threshold=args.threshold), level=0.5)
+        name = os.path.basename(args.input)
+    else:
+        verts, faces, normals = sphere_mesh()
+        name = "sphere"
+    verts = np.asarray(verts, dtype=np.float32)
+    extent = float((verts.max(axis=0) - verts.min(axis=0)).max())
+    print(f"{name}: {len(verts)} vertices, {len(faces)} triangles")
+
+    variants = [(".ply", {}), (".ply", {"quantize_bits": 16}), (".ply", {"quantize_bits": 8}),
+                (".glb", {}), (".glb", {"quantize_bits": 16}),
+                (".npz", {}), (".npz", {"float16": True}), (".npz", {"quantize_bits": 16})]
+    failed = []
+    print(f"{'format':<8}{'vertices':<12}{'MB':>8}{'write s':>10}  check")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (ext, options) in enumerate(variants):
+            path = os.path.join(tmp, f"skull{i}{ext}")
+            start = time.perf_counter()
+            export_mesh(path, verts, faces, normals, **options)
+            seconds = time.perf_counter() - start
+            # Quantization error is half a step of the bounding box; float16 keeps 11 significant bits
+            bits = options.get("quantize_bits")
+            tolerance = extent / ((1 << bits) - 1) if bits else (extent * 2.0 ** -10 if options.get("float16") else 1e-4)
+            check = "-"
+            try:
+                if ext == ".glb":
+                    check_glb(path, verts, faces, normals, tolerance)
+                    check = "valid glTF, round trip ok"
+                elif ext == ".npz":
+                    loaded, loaded_faces, _ = load_mesh_npz(path)
+                    if np.abs(loaded - verts).max() > tolerance or not np.array_equal(loaded_faces, faces):
+                        raise ValueError("reloaded mesh differs")
+                    check = "round trip ok"
+            except ValueError as e:
+                check = f"FAILED: {e}"
+                failed.append(f"{ext} {options}")
+            encoding = f"{bits}-bit" if bits else ("float16" if options.get("float16") else "float32")
+            print(f"{ext[1:]:<8}{encoding:<12}{os.path.getsize(path) / 1024**2:>8.2f}{seconds:>10.3f}  {check}")
+    if failed:
+        sys.exit(f"Exports failed their check: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
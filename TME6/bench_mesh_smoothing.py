@@ -0,0 +1,129 @@
+"""
+Benchmark: numpy mesh smoothing (mri_mesh.smooth_mesh) against Blender's Smooth modifier.
+
+The test surface is a noisy sphere triangulated as a latitude/longitude grid, so any
+vertex count can be generated without a huge volume. Outside Blender this times the
+adjacency build and the Laplacian (scipy and, if installed, numba), Taubin and HC
+variants; run inside Blender to also time the Smooth modifier evaluated on the same mesh
+with the same number of Laplacian steps:
+
+    python bench_mesh_smoothing.py --verts 100000 1000000 5000000 --iterations 10
+    blender --background --python bench_mesh_smoothing.py -- --verts 100000 1000000 5000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_mesh import vertex_adjacency, laplacian_smooth, taubin_smooth, hc_smooth, _numba_kernels, mesh_buffers
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def noisy_sphere(n_verts, radius=50.0, noise=0.5, seed=0):
+    # Closed grid: n_lat rings of n_lon vertices plus the two poles
+    n_lon = max(int(np.sqrt(2 * n_verts)), 8)
+    n_lat = max((n_verts - 2) // n_lon, 2)
+    lat = np.linspace(0, np.pi, n_lat + 2)[1:-1]
+    lon = np.linspace(0, 2 * np.pi, n_lon, endpoint=False)
+    lat, lon = np.meshgrid(lat, lon, indexing="ij")
+    ring = np.stack([np.sin(lat) * np.cos(lon), np.sin(lat) * np.sin(lon), np.cos(lat)], axis=-1).reshape(-1, 3)
+    unit = np.concatenate([ring, [[0, 0, 1], [0, 0, -1]]])
+    rng = np.random.default_rng(seed)
+    verts = unit * (radius + rng.normal(0, noise, len(unit)))[:, None]
+
+    idx = np.arange(n_lat * n_lon).reshape(n_lat, n_lon)
+    nxt = np.roll(idx, -1, axis=1)
+    a, b, c, d = idx[:-1], nxt[:-1], idx[1:], nxt[1:]
+    quads = np.concatenate([np.stack([a, c, b], -1).reshape(-1, 3), np.stack([b, c, d], -1).reshape(-1, 3)])
+    north, south = n_lat * n_lon, n_lat * n_lon + 1
+    caps = np.concatenate([np.stack([np.full(n_lon, north), idx[0], nxt[0]], -1),
+                           np.stack([np.full(n_lon, south), nxt[-1], idx[-1]], -1)])
+    return verts.astype(np.float32), np.concatenate([quads, caps]).astype(np.int32), radius
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def blender_smooth(verts, faces, factor, steps):
+    buffers = mesh_buffers(verts, faces)
+    mesh = bpy.data.meshes.new("bench_smooth")
+    mesh.vertices.add(len(verts))
+    mesh.loops.add(3 * len(faces))
+    mesh.polygons.add(len(faces))
+    mesh.vertices.foreach_set("co", buffers["co"])
+    mesh.loops.foreach_set("vertex_index", buffers["loop_vertex_index"])
+    mesh.polygons.foreach_set("loop_start", buffers["loop_start"])
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", buffers["loop_total"])
+    mesh.update(calc_edges=True)
+    obj = bpy.data.objects.new("bench_smooth", mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    modifier = obj.modifiers.new(name="Smooth", type='SMOOTH')
+    modifier.factor = factor
+    modifier.iterations = steps
+
+    def evaluate():
+        # Same work as the render-time evaluation: depsgraph update plus a mesh copy of the result
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        depsgraph.update()
+        return bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), depsgraph=depsgraph)
+
+    seconds, result = time_it(evaluate)
+    bpy.data.meshes.remove(result)
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+    return seconds
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--verts", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    numba_step = _numba_kernels()
+    if numba_step is not None:
+        # Compile outside the timings
+        laplacian_smooth(*noisy_sphere(100)[:2], iterations=1, use_numba=True)
+
+    header = f"{'verts':>10}{'adjacency':>11}{'laplace':>10}"
+    header += f"{'numba':>10}" if numba_step is not None else ""
+    header += f"{'taubin':>10}{'hc':>10}"
+    header += f"{'modifier':>10}" if bpy is not None else ""
+    print(f"{args.iterations} iterations (Taubin: {2 * args.iterations} steps), seconds; "
+          f"radial std of the noise before -> after")
+    print(header + "   laplace / taubin / hc radius std")
+    for n in args.verts:
+        verts, faces, radius = noisy_sphere(n)
+        t_adj, adjacency = time_it(lambda: vertex_adjacency(faces, len(verts)))
+        t_lap, lap = time_it(lambda: laplacian_smooth(verts, faces, 0.5, args.iterations, adjacency))
+        row = f"{len(verts):>10}{t_adj:>11.3f}{t_lap:>10.3f}"
+        if numba_step is not None:
+            t_numba, _ = time_it(lambda: laplacian_smooth(verts, faces, 0.5, args.iterations, adjacency, use_numba=True))
+            row += f"{t_numba:>10.3f}"
+        t_taubin, taubin = time_it(lambda: taubin_smooth(verts, faces, iterations=args.iterations, adjacency=adjacency,
+                                                         use_numba=False))
+        t_hc, hc = time_it(lambda: hc_smooth(verts, faces, iterations=args.iterations, adjacency=adjacency))
+        row += f"{t_taubin:>10.3f}{t_hc:>10.3f}"
+        if bpy is not None:
+            row += f"{blender_smooth(verts, faces, 0.5, args.iterations):>10.3f}"
+        spread = [np.linalg.norm(v, axis=1).std() for v in (verts, lap, taubin, hc)]
+        mean = [np.linalg.norm(v, axis=1).mean() - radius for v in (lap, taubin, hc)]
+        print(row + f"   {spread[0]:.3f} -> {spread[1]:.3f} / {spread[2]:.3f} / {spread[3]:.3f}"
+                    f"   (radius change {mean[0]:+.3f} / {mean[1]:+.3f} / {mean[2]:+.3f})")
+        del verts, faces, adjacency, lap, taubin, hc
+
+
+if __name__ == "__main__":
+    main()
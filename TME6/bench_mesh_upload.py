@@ -0,0 +1,134 @@
+"""
+Benchmark: bulk mesh buffers (mri_mesh.mesh_buffers + foreach_set) against the
+from_pydata path with a per-polygon use_smooth loop.
+
+Outside Blender this times the pure-numpy buffer construction against the Python-list
+conversion that from_pydata performs. Run inside Blender to also time the real uploads.
+The buffers are checked to describe exactly the input mesh (polygon loop ranges tiling
+the loops, faces rebuilt from them, the dtypes foreach_set expects) and the normals to stay
+finite, zero-length ones included.
+
+    python bench_mesh_upload.py --triangles 100000 1000000 4000000
+    blender --background --python bench_mesh_upload.py -- --triangles 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_mesh import mesh_buffers
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def synthetic_mesh(n_triangles, seed=0):
+    rng = np.random.default_rng(seed)
+    n_verts = n_triangles // 2 + 3
+    verts = rng.random((n_verts, 3), dtype=np.float32) * 100
+    faces = rng.integers(0, n_verts, size=(n_triangles, 3), dtype=np.int64)
+    normals = rng.normal(size=(n_verts, 3)).astype(np.float32)
+    normals[::97] = 0.0  # degenerate vertices of real meshes have zero-length normals
+    return verts, faces, normals
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def check_buffers(verts, faces, normals, buffers):
+    # Error message, or None if the buffers describe exactly (verts, faces, normals)
+    expected = {"co": np.float32, "loop_vertex_index": np.int32, "loop_start": np.int32, "loop_total": np.int32,
+                "use_smooth": np.bool_, "vertex_normals": np.float32}
+    for key, array in buffers.items():
+        if array.dtype != expected[key] or array.ndim != 1 or not array.flags.c_contiguous:
+            return f"{key} is not a contiguous 1D {np.dtype(expected[key])} buffer"
+    if not np.array_equal(buffers["co"].reshape(-1, 3), verts):
+        return "co does not match the vertices"
+    start, total, loops = buffers["loop_start"], buffers["loop_total"], buffers["loop_vertex_index"]
+    if len(start) != len(faces) or np.any(total != 3) or len(buffers["use_smooth"]) != len(faces):
+        return "one triangle polygon per face expected"
+    # Polygon loop ranges must tile loop_vertex_index in order, without gaps or overlaps
+    ends = start.astype(np.int64) + total
+    if len(faces) and (start[0] != 0 or ends[-1] != len(loops) or np.any(start[1:] != ends[:-1])):
+        return "loop_start/loop_total do not tile loop_vertex_index"
+    if not np.array_equal(loops[start[:, None] + np.arange(3)], faces):
+        return "faces rebuilt from the loops differ"
+    unit = buffers["vertex_normals"].reshape(-1, 3)
+    length = np.linalg.norm(normals, axis=1)
+    if not np.all(np.isfinite(unit)):
+        return "non-finite vertex normals"
+    if np.any(unit[length == 0] != 0) or not np.allclose(np.linalg.norm(unit[length > 0], axis=1), 1.0, atol=1e-5):
+        return "vertex normals are not unit length (zero for zero-length input)"
+    return None
+
+
+def list_conversion(verts, faces):
+    # What from_pydata has to walk through before touching the mesh
+    vert_list = [tuple(v) for v in verts.tolist()]
+    face_list = [tuple(f) for f in faces.tolist()]
+    smooth = [True for _ in face_list]
+    return vert_list, face_list, smooth
+
+
+def blender_from_pydata(verts, faces):
+    mesh = bpy.data.meshes.new("bench_from_pydata")
+    mesh.from_pydata(verts, [], faces)
+    for poly in mesh.polygons:
+        poly.use_smooth = True
+    return mesh
+
+
+def blender_bulk(verts, faces, normals):
+    buffers = mesh_buffers(verts, faces, normals)
+    mesh = bpy.data.meshes.new("bench_bulk")
+    mesh.vertices.add(len(verts))
+    mesh.loops.add(3 * len(faces))
+    mesh.polygons.add(len(faces))
+    mesh.vertices.foreach_set("co", buffers["co"])
+    mesh.loops.foreach_set("vertex_index", buffers["loop_vertex_index"])
+    mesh.polygons.foreach_set("loop_start", buffers["loop_start"])
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", buffers["loop_total"])
+    mesh.polygons.foreach_set("use_smooth", buffers["use_smooth"])
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--triangles", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    header = f"{'triangles':>12}{'lists [s]':>12}{'buffers [s]':>13}"
+    if bpy is not None:
+        header += f"{'from_pydata [s]':>17}{'bulk [s]':>10}"
+    print(header)
+    for n in args.triangles:
+        verts, faces, normals = synthetic_mesh(n)
+        t_lists, _ = time_it(lambda: list_conversion(verts, faces))
+        t_buffers, buffers = time_it(lambda: mesh_buffers(verts, faces, normals))
+        error = check_buffers(verts, faces, normals, buffers)
+        if error:
+            sys.exit(f"mesh_buffers, {n} triangles: {error}")
+        row = f"{n:>12}{t_lists:>12.3f}{t_buffers:>13.3f}"
+        if bpy is not None:
+            t_pydata, mesh = time_it(lambda: blender_from_pydata(verts, faces))
+            bpy.data.meshes.remove(mesh)
+            t_bulk, mesh = time_it(lambda: blender_bulk(verts, faces, normals))
+            bpy.data.meshes.remove(mesh)
+            row += f"{t_pydata:>17.3f}{t_bulk:>10.3f}"
+        print(row)
+        del buffers
+
+
+if __name__ == "__main__":
+    main()
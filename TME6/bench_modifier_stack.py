@@ -0,0 +1,87 @@
+"""
+Benchmark and sanity check of the numpy modifier stack (mri_mesh.apply_modifier_stack),
+the Blender-free replacement for the skull's Smooth/Solidify modifiers.
+
+On a sphere surface from marching cubes it checks that smoothing shrinks the radial
+spread, that the shell stays closed (no boundary edges) with the inner sheet one
+thickness inside, and on an open patch that the rim closes the boundary. On the lab
+volume it times the full stack used by render_skull.
+
+    python bench_modifier_stack.py --input t1-rendering.tif --downsample 1
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from skimage import measure
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_mesh import laplacian_smooth, shell_mesh, boundary_edges, apply_modifier_stack
+
+# Same settings as create_skull_object + render_skull (Remesh has no numpy counterpart)
+SKULL_STACK = [
+    {"type": "SMOOTH", "factor": 0.5, "iterations": 3},
+    {"type": "SOLIDIFY", "thickness": 0.01, "offset": -1.0, "use_rim": True},
+    {"type": "SMOOTH", "factor": 0.7, "iterations": 5},
+    {"type": "SOLIDIFY", "thickness": 0.8, "offset": -1.0, "use_rim": True},
+]
+
+
+def sphere_mesh(n=64, radius=24.0):
+    z, y, x = np.mgrid[:n, :n, :n] - (n - 1) / 2.0
+    verts, faces, _, _ = measure.marching_cubes((x * x + y * y + z * z < radius**2).astype(np.float32), 0.5)
+    # skimage winds these faces inwards; reverse them so the winding normals point out of the sphere
+    return verts, np.ascontiguousarray(faces[:, ::-1])
+
+
+def check_sphere():
+    verts, faces = sphere_mesh()
+    center = verts.mean(axis=0)
+    spread = np.linalg.norm(verts - center, axis=1).std()
+    smoothed = laplacian_smooth(verts, faces, factor=0.5, iterations=3)
+    smoothed_spread = np.linalg.norm(smoothed - center, axis=1).std()
+    print(f"smoothing: radial std {spread:.3f} -> {smoothed_spread:.3f}")
+    assert smoothed_spread < spread
+
+    thickness = 2.0
+    shell_verts, shell_faces = shell_mesh(smoothed, faces, thickness=thickness, offset=-1.0)
+    n = len(smoothed)
+    gap = np.linalg.norm(shell_verts[:n] - center, axis=1) - np.linalg.norm(shell_verts[n:] - center, axis=1)
+    print(f"shell: {len(shell_faces)} faces, open edges {len(boundary_edges(shell_faces))}, "
+          f"gap {gap.mean():.3f} (thickness {thickness})")
+    assert len(boundary_edges(shell_faces)) == 0
+    assert abs(gap.mean() - thickness) < 0.05 * thickness
+
+    # Upper half only: an open surface whose boundary loop must be closed by the rim
+    keep = np.all(verts[faces][:, :, 0] > center[0], axis=1)
+    open_faces = faces[keep]
+    _, rim_faces = shell_mesh(verts, open_faces, thickness=thickness, use_rim=True)
+    _, no_rim_faces = shell_mesh(verts, open_faces, thickness=thickness, use_rim=False)
+    print(f"rim: open edges {len(boundary_edges(no_rim_faces))} without rim, {len(boundary_edges(rim_faces))} with rim")
+    assert len(boundary_edges(rim_faces)) == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=None, help="TIFF volume to run the skull stack on")
+    parser.add_argument("--downsample", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    args = parser.parse_args()
+
+    check_sphere()
+    if args.input:
+        from mri_io import load_tiff_volume
+        from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+        volume, _, _ = load_tiff_volume(args.input, downsample=args.downsample)
+        closed = close_mask(filter_volume(volume), threshold=args.threshold)
+        verts, faces, _ = marching_cubes_mesh(closed, level=0.5)
+        start = time.perf_counter()
+        out_verts, out_faces = apply_modifier_stack(verts, faces, SKULL_STACK)
+        elapsed = time.perf_counter() - start
+        print(f"skull stack: {len(faces)} -> {len(out_faces)} triangles, {len(out_verts)} vertices in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
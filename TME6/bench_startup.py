@@ -0,0 +1,100 @@
+"""
+Benchmark: startup latency of the pipeline, from interpreter start to the end of the
+first stage (loading the TIFF volume), with the old eager imports and with the lazy ones.
+
+"before" reproduces the previous script header: every dependency checked with
+__import__ (which loads it) and scipy, scikit-image and tifffile imported up front.
+"after" imports the helper modules as they are now, checks the dependencies through
+importlib.metadata and lets the first stage import only what it needs (tifffile).
+Each case runs in a fresh interpreter, so nothing is already in sys.modules.
+
+    python bench_startup.py --input t1-rendering.tif --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The helper imports of baseline_MRI_3D_Rendering_pseudocode.py, as they run at startup
+HELPERS = """
+from mri_io import load_tiff_volume
+from mri_surface import filter_volume, close_mask, isolate_components, marching_cubes_mesh
+from mri_cache import VolumeCache, cached_mask, cached_volume
+from mri_mesh import mesh_buffers, apply_modifier_stack, smooth_mesh, SMOOTHING_METHODS
+from mri_lod import build_lod, export_lod_levels, select_lod
+from mri_sparse import sparse_close_mask
+from mri_decimate import decimate_mesh
+from mri_export import load_mesh_npz
+from mri_volume import (TRANSFER_FUNCTIONS, write_vdb, create_volume_object, create_transfer_material,
+                        set_transfer_function)
+from mri_profile import PROFILER, stage, profiled
+from mri_render_dispatch import dispatch_renders, print_render_report
+from mri_render_quality import configure_render_quality
+"""
+
+BEFORE = """
+for name in ("tifffile", "skimage", "scipy"):
+    __import__(name)
+import scipy
+import tifffile
+from skimage import measure
+import scipy.ndimage
+from skimage import morphology
+""" + HELPERS
+
+AFTER = """
+from mri_deps import ensure_dependencies
+ensure_dependencies(install=False)
+""" + HELPERS
+
+CASE = """
+import time
+start = time.perf_counter()
+import sys, json
+sys.path.insert(0, {here!r})
+{header}
+imported = time.perf_counter()
+volume, _, _ = load_tiff_volume({input!r}, downsample={downsample})
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "first_stage": done - start,
+                   "heavy": sorted(m for m in ("scipy", "skimage", "tifffile") if m in sys.modules)}}))
+"""
+
+
+def run_case(header, args):
+    code = CASE.format(here=HERE, header=header, input=args.input, downsample=args.downsample)
+    runs = []
+    for _ in range(args.repeat):
+        # Interpreter start-up is the same in both cases; the wall clock inside the child starts after it
+        out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "import": statistics.median(r["import"] for r in runs),
+        "first_stage": statistics.median(r["first_stage"] for r in runs),
+        "heavy": runs[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=os.path.join(HERE, "t1-rendering.tif"))
+    parser.add_argument("--downsample", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    before = run_case(BEFORE, args)
+    after = run_case(AFTER, args)
+    print(f"{'':<10}{'imports [s]':>14}{'first stage [s]':>18}   modules loaded at the end of the stage")
+    for name, r in (("before", before), ("after", after)):
+        print(f"{name:<10}{r['import']:>14.3f}{r['first_stage']:>18.3f}   {', '.join(r['heavy'])}")
+    print(f"imports {100 * (after['import'] / before['import'] - 1):+.1f}%, "
+          f"import-to-first-stage {100 * (after['first_stage'] / before['first_stage'] - 1):+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: streaming slice ingestion (mri_stream) against the dense pipeline run once the
+whole stack exists.
+
+Replays a TIFF stack `--batch` pages at a time, asking for a preview mesh every
+`--preview-every` slices, and reports the latency from the last slice to the final mesh
+next to the time of the dense path (load, filter, closing, marching cubes). The final mask
+and surface are checked against the dense ones.
+
+    python bench_stream.py --input t1-rendering.tif --batch 8 --preview-every 32
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_io import load_tiff_volume
+from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+from mri_stream import StreamingVolume, tiff_page_batches
+from bench_sparse import triangle_centers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "t1-rendering.tif"))
+    parser.add_argument("--downsample", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--preview-every", type=int, default=32)
+    args = parser.parse_args()
+
+    batches = list(tiff_page_batches(args.input, batch=args.batch))  # read up front: the scanner is not timed
+
+    start = time.perf_counter()
+    volume, _, _ = load_tiff_volume(args.input, downsample=args.downsample)
+    dense_mask = close_mask(filter_volume(volume), threshold=args.threshold)
+    dense_verts, dense_faces, _ = marching_cubes_mesh(dense_mask, level=0.5)
+    dense_seconds = time.perf_counter() - start
+
+    stream = StreamingVolume(downsample=args.downsample, threshold=args.threshold)
+    update_seconds = []
+    previews = 0
+    next_preview = args.preview_every
+    for pages in batches:
+        start = time.perf_counter()
+        stream.add_slices(pages)
+        update_seconds.append(time.perf_counter() - start)
+        if stream.depth >= next_preview:
+            stream.mesh()
+            previews += 1
+            next_preview = stream.depth + args.preview_every
+    start = time.perf_counter()
+    verts, faces, _ = stream.mesh()
+    final_seconds = update_seconds[-1] + time.perf_counter() - start
+
+    same_mask = np.array_equal(stream.mask, dense_mask)
+    mismatched = int(np.count_nonzero(stream.mask != dense_mask))
+    same_surface = len(faces) == len(dense_faces) and np.allclose(triangle_centers(verts, faces),
+                                                                  triangle_centers(dense_verts, dense_faces))
+    print(f"{len(batches)} updates of {args.batch} pages, {previews} previews, stats {stream.stats}")
+    print(f"dense pipeline after the last slice   {dense_seconds:8.3f}s  ({len(dense_faces)} triangles)")
+    print(f"streaming, last slice to final mesh   {final_seconds:8.3f}s  ({len(faces)} triangles, "
+          f"{100 * final_seconds / dense_seconds:.1f}% of dense)")
+    print(f"median update {np.median(update_seconds):.3f}s, total streaming work {sum(update_seconds):.3f}s")
+    print(f"mask equal: {same_mask} ({mismatched} voxels differ), surface equal: {same_surface}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: streaming TIFF loader (mri_io.load_tiff_volume) against the original
+import_t1_head path (list of float32 pages -> 3D array -> normalize -> slice).
+
+Writes a synthetic uint8 TIFF stack of the requested size, then runs each loader in a
+fresh Python process and reports wall time and peak RSS.
+
+    python bench_tiff_loader.py --size-gb 2 --downsample 4
+
+The original path holds several full-resolution float32 copies (about 8x the file size
+at peak), so pass --skip-legacy on machines without that much memory.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def write_synthetic_tiff(path, size_gb, height=1024, width=1024):
+    import numpy as np
+    import tifffile
+
+    depth = max(int(size_gb * 1024**3 // (height * width)), 1)
+    yy, xx = np.mgrid[0:height, 0:width]
+    rr = np.hypot(yy - height / 2, xx - width / 2)
+    with tifffile.TiffWriter(path, bigtiff=True) as tif:
+        for z in range(depth):
+            # A shrinking disc with a bit of texture, so min/max are not trivial
+            radius = (height / 2) * (1.0 - abs(z - depth / 2) / depth)
+            page = np.where(rr < radius, 200, 20).astype(np.uint8)
+            page[z % height, :] = 255 if z == depth // 2 else 230
+            tif.write(page, contiguous=True)
+    return depth, height, width
+
+
+def legacy_import(file_path, downsample):
+    import numpy as np
+    import tifffile
+
+    with tifffile.TiffFile(file_path) as tif:
+        image = []
+        for page in tif.pages:
+            image.append(page.asarray().astype(np.float32))
+        image = np.array(image, np.float32)
+        min_val = np.min(image)
+        max_val = np.max(image)
+        if max_val == min_val:
+            image = np.zeros_like(image, dtype=np.float32)
+        else:
+            image = (image - min_val) / (max_val - min_val)
+        if downsample > 1:
+            image = image[::downsample, ::downsample, ::downsample]
+        return image
+
+
+def run_child(mode, path, downsample):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import numpy as np  # import cost is part of the baseline RSS
+    import tifffile
+    from mri_io import load_tiff_volume
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == "legacy":
+        volume = legacy_import(path, downsample)
+    elif mode == "stream":
+        volume, _, _ = load_tiff_volume(path, downsample=downsample)
+    elif mode == "stream-kept":
+        volume, _, _ = load_tiff_volume(path, downsample=downsample, exact_range=False)
+    else:
+        volume, _, _ = load_tiff_volume(path, downsample=downsample, use_memmap=False)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "mode": mode,
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss / 1024.0,
+        "delta_rss_mb": (peak_rss - base_rss) / 1024.0,
+        "output_mb": volume.nbytes / 1024.0**2,
+        "shape": list(volume.shape),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--downsample", type=int, default=4)
+    parser.add_argument("--path", default=None, help="Reuse an existing TIFF instead of writing one")
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "PATH", "DOWNSAMPLE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], int(args.child[2]))
+        return
+
+    tmp_dir = None
+    path = args.path
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "synthetic_t1.tif")
+        start = time.perf_counter()
+        shape = write_synthetic_tiff(path, args.size_gb)
+        print(f"Wrote {path} {shape} ({os.path.getsize(path) / 1024**3:.2f} GB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    modes = ["stream", "stream-kept", "stream-decode"]
+    if not args.skip_legacy:
+        modes.append("legacy")
+
+    print(f"{'mode':<14}{'wall [s]':>10}{'peak RSS [MB]':>16}{'delta RSS [MB]':>16}{'output [MB]':>14}")
+    for mode in modes:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, path, str(args.downsample)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{mode:<14} failed (exit {proc.returncode}): {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{mode:<14}{r['seconds']:>10.2f}{r['peak_rss_mb']:>16.1f}{r['delta_rss_mb']:>16.1f}{r['output_mb']:>14.1f}")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
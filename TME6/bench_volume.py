@@ -0,0 +1,82 @@
+"""
+Benchmark: preparing the scan for direct volume rendering (one sparse VDB grid, mri_volume)
+against the marching-cubes path (filter, closing, marching cubes and mesh buffers).
+
+Reports time and peak memory (tracemalloc, numpy allocations) of both, the grid's active
+voxels and memory, and what a change of visible tissue costs: a new threshold and
+extraction for surfaces, a transfer-function edit (no geometry) for the volume. Without an
+openvdb module (it ships with Blender) the grid is not written and its memory is estimated
+from the active 8^3 leaves instead:
+
+    python bench_volume.py --input t1-rendering.tif --thresholds 0.5 0.65 0.8
+    blender --background --python bench_volume.py -- --input t1-rendering.tif
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mri_io import load_tiff_volume
+from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+from mri_mesh import mesh_buffers
+from mri_volume import write_vdb, grid_array, sparse_footprint
+
+
+def measured(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def surface_path(volume, threshold):
+    verts, faces, normals = marching_cubes_mesh(close_mask(filter_volume(volume), threshold=threshold), level=0.5)
+    buffers = mesh_buffers(verts, faces, normals)
+    return len(faces), sum(b.nbytes for b in buffers.values())
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--input", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "t1-rendering.tif"))
+    parser.add_argument("--downsample", type=int, default=1)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.65, 0.8],
+                        help="Tissue changes to time on the surface path")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    volume, _, _ = load_tiff_volume(args.input, downsample=args.downsample)
+    print(f"Volume {volume.shape}, {volume.nbytes / 1024**2:.1f} MB dense float32")
+
+    surface_path(volume, args.thresholds[0])  # imports scipy/skimage outside the timings
+    print(f"{'':<34}{'seconds':>10}{'peak MB':>10}{'result':>28}")
+    for threshold in args.thresholds:
+        seconds, peak, (n_faces, upload) = measured(lambda: surface_path(volume, threshold))
+        print(f"{'marching cubes, threshold ' + format(threshold, 'g'):<34}{seconds:>10.3f}{peak / 1024**2:>10.1f}"
+              f"{f'{n_faces} faces, {upload / 1024**2:.1f} MB':>28}")
+
+    with tempfile.TemporaryDirectory(prefix="mri_vdb_") as tmp_dir:
+        try:
+            seconds, peak, info = measured(lambda: write_vdb(volume, os.path.join(tmp_dir, "t1.vdb"),
+                                                             tolerance=args.tolerance))
+            result = f"{info['active_voxels']} voxels, {info['memory_bytes'] / 1024**2:.1f} MB"
+            label = "VDB grid write"
+        except ImportError as e:
+            print(f"({e}; grid memory estimated)")
+            seconds, peak, _ = measured(lambda: grid_array(volume))
+            info = sparse_footprint(volume, tolerance=args.tolerance)
+            result = f"{info['active_voxels']} voxels, ~{info['estimated_bytes'] / 1024**2:.1f} MB"
+            label = "grid array (no openvdb)"
+    print(f"{label:<34}{seconds:>10.3f}{peak / 1024**2:>10.1f}{result:>28}")
+    print(f"{'volume, tissue change':<34}{0.0:>10.3f}{0.0:>10.1f}{'transfer function edit':>28}")
+
+
+if __name__ == "__main__":
+    main()
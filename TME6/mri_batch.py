@@ -0,0 +1,346 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Batch Runner
+======================================================================
+
+Processes many subjects from a manifest. The numpy stages (load, filter, closing,
+marching cubes) run in a process pool, and each extracted mesh is handed to one of a fixed
+number of headless Blender workers, which render it with the main script's --mesh mode.
+
+Manifest: CSV with a header, or JSON (a list of objects). Columns / keys:
+    subject (optional, defaults to the file name; a plain folder name), file_path (required),
+    downsample, threshold, absolute_scale, sigma (optional, defaults below)
+
+With --export ply glb (and --blender-workers 0 for mesh-only consumers) every subject also gets
+skull.ply / skull.glb written by mri_export, without Blender.
+
+Every subject gets <out_dir>/<subject>/result.json with its parameters, status and stage
+timings. The record is rewritten after each phase, so a restarted run skips subjects that
+are done and only re-renders subjects whose mesh already exists. Changing a subject's
+extraction parameters (downsample, threshold, sigma) in the manifest invalidates its record;
+changing its absolute_scale, or --quality / --view-budget, only re-renders the mesh it already
+has, and a new --export format is written from that mesh.
+
+    python mri_batch.py manifest.csv --out results --workers 8 --blender-workers 2 --blender /opt/blender/blender
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+
+
+DEFAULTS = {"downsample": 4, "threshold": 0.65, "absolute_scale": 24.0, "sigma": 0.7}
+EXTRACT_PARAMS = ("file_path", "downsample", "threshold", "sigma") # the mesh depends on these
+RENDER_PARAMS = ("absolute_scale",) # only the renders depend on these (with --quality and --view-budget)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RENDER_SCRIPT = os.path.join(SCRIPT_DIR, "baseline_MRI_3D_Rendering_pseudocode.py")
+
+
+#####################################################################################################
+# Function: _parse_value(value, default, where)
+# Purpose: Convert a manifest value to the type of its default; integers may be written as "2.0".
+def _parse_value(value, default, where):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: {value!r} is not a number") from None
+    if isinstance(default, int):
+        if not number.is_integer():
+            raise ValueError(f"{where}: {value!r} is not a whole number")
+        return int(number)
+    return number
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: read_manifest(manifest_path)
+# Purpose: Read a CSV or JSON manifest into a list of job dicts with defaults filled in.
+#          Errors name the manifest line (CSV) or entry (JSON) of the bad row.
+def read_manifest(manifest_path):
+    if manifest_path.lower().endswith(".json"):
+        with open(manifest_path) as f:
+            rows = json.load(f)
+        places = [f"{manifest_path} entry {i}" for i in range(len(rows))]
+    else:
+        with open(manifest_path, newline="") as f:
+            reader = csv.DictReader(f)
+            rows, places = [], []
+            for row in reader:
+                rows.append(row)
+                places.append(f"{manifest_path} line {reader.line_num}")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    seen = set()
+    for row, place in zip(rows, places):
+        if not row.get("file_path"):
+            raise ValueError(f"{place}: manifest row without file_path: {row}")
+        file_path = row["file_path"]
+        if not os.path.isabs(file_path):
+            file_path = os.path.join(base_dir, file_path)
+        subject = row.get("subject") or os.path.splitext(os.path.basename(file_path))[0]
+        # The subject names its folder under out_dir: no separators or '..' that would leave it
+        if any(sep in subject for sep in ("/", "\\", os.sep)) or subject in (".", "..") or ".." in subject:
+            raise ValueError(f"{place}: subject {subject!r} must be a plain folder name (no path separators or '..')")
+        if subject in seen:
+            raise ValueError(f"{place}: duplicate subject in manifest: {subject}")
+        seen.add(subject)
+        job = {"subject": subject, "file_path": file_path}
+        for key, default in DEFAULTS.items():
+            value = row.get(key)
+            job[key] = _parse_value(value, default, f"{place}, {key}") if value not in (None, "") else default
+        jobs.append(job)
+    return jobs
+#####################################################################################################
+
+
+def _record_path(out_dir, subject):
+    return os.path.join(out_dir, subject, "result.json")
+
+
+def read_record(out_dir, subject):
+    path = _record_path(out_dir, subject)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    # Write through a temporary file unique to this call (as VolumeCache does), then rename over `path`
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_record(out_dir, record):
+    path = _record_path(out_dir, record["subject"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, lambda f: f.write(json.dumps(record, indent=2).encode()))
+
+
+#####################################################################################################
+# Function: extract_subject(job, out_dir, export_formats)
+# Purpose: Worker-process entry: run the numpy stages for one subject and save the mesh as .npz
+#          (plus skull.<format> for every export format).
+def extract_subject(job, out_dir, export_formats=()):
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    from mri_io import load_tiff_volume
+    from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+    from mri_profile import PROFILER, stage
+    from mri_export import export_mesh
+
+    subject_dir = os.path.join(out_dir, job["subject"])
+    os.makedirs(subject_dir, exist_ok=True)
+    PROFILER.reset()
+
+    volume_data, _, _ = load_tiff_volume(job["file_path"], downsample=job["downsample"])
+    filtered_data = filter_volume(volume_data, sigma=job["sigma"])
+    del volume_data
+    closed_data = close_mask(filtered_data, threshold=job["threshold"], ball_radius=1)
+    del filtered_data
+    verts, faces, normals = marching_cubes_mesh(closed_data, level=0.5)
+
+    with stage("save_mesh"):
+        mesh_path = os.path.join(subject_dir, "mesh.npz")
+        _write_atomic(mesh_path, lambda f: np.savez(f, verts=verts, faces=faces, normals=normals))
+    exports = []
+    for fmt in export_formats:
+        with stage("export", format=fmt):
+            exports.append(export_mesh(os.path.join(subject_dir, "skull." + fmt), verts, faces, normals))
+    PROFILER.write_json(os.path.join(subject_dir, "trace.json"))
+    stages = PROFILER.durations()
+    return {"mesh_path": mesh_path, "triangles": int(len(faces)), "exports": exports, "stages": stages}
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: export_subject(job, mesh_path, out_dir, export_formats)
+# Purpose: Worker-process entry: write skull.<format> for every format from an already extracted mesh.
+def export_subject(job, mesh_path, out_dir, export_formats):
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    from mri_export import export_mesh, load_mesh_npz
+
+    verts, faces, normals = load_mesh_npz(mesh_path)
+    return [export_mesh(os.path.join(out_dir, job["subject"], "skull." + fmt), verts, faces, normals)
+            for fmt in export_formats]
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: render_subject(job, record, out_dir, blender, timeout, quality, view_budget)
+# Purpose: Render one extracted mesh in a headless Blender process.
+def render_subject(job, record, out_dir, blender="blender", timeout=None, quality=None, view_budget=None):
+    render_dir = os.path.join(out_dir, job["subject"], "renders") + os.sep
+    log_path = os.path.join(out_dir, job["subject"], "blender.log")
+    # --python-exit-code makes a Python exception in the script fail the process instead of exiting 0
+    command = [blender, "--background", "--python-exit-code", "1", "--python", RENDER_SCRIPT, "--",
+               "--mesh", record["mesh_path"], "--output", render_dir,
+               "--absolute-scale", str(job["absolute_scale"])]
+    if quality:
+        command += ["--quality", quality]
+    if view_budget:
+        command += ["--view-budget", str(view_budget)]
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, cwd=SCRIPT_DIR, timeout=timeout)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Blender exited with {proc.returncode}, see {log_path}")
+    return render_dir, elapsed
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: run_batch(manifest_path, out_dir, workers, blender_workers, blender, render_timeout, quality, view_budget,
+#                     export_formats)
+# Purpose: Run every manifest subject through extraction, export and rendering, re-running only the stages
+#          whose inputs changed since the recorded run.
+def run_batch(manifest_path, out_dir, workers=None, blender_workers=1, blender="blender", render_timeout=None,
+              quality=None, view_budget=None, export_formats=()):
+    jobs = read_manifest(manifest_path)
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    render_enabled = blender_workers > 0
+
+    records = {}
+    render_params = {}
+    to_extract = []
+    to_export = []
+    to_render = []
+    for job in jobs:
+        record = read_record(out_dir, job["subject"])
+        params = {k: job[k] for k in EXTRACT_PARAMS}
+        render_params[job["subject"]] = dict({k: job[k] for k in RENDER_PARAMS}, quality=quality,
+                                             view_budget=view_budget)
+        if record is None or record.get("params") != params:
+            record = {"subject": job["subject"], "params": params, "status": "pending", "stages": {}}
+        records[job["subject"]] = record
+        extracted = record["status"] in ("extracted", "rendered", "render_failed")
+        missing_exports = [fmt for fmt in export_formats if fmt not in record.get("export_formats", [])]
+        # A render is current only if it succeeded with the same scale and render settings
+        stale_render = render_enabled and (record["status"] != "rendered"
+                                           or record.get("render_params") != render_params[job["subject"]])
+        if extracted and not missing_exports and not stale_render:
+            print(f"[{job['subject']}] already {record['status']}, skipping")
+        elif not (extracted and os.path.exists(record.get("mesh_path", ""))):
+            to_extract.append(job)
+        else:
+            if missing_exports:
+                to_export.append((job, missing_exports))
+            if stale_render:
+                to_render.append(job)
+
+    batch_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(blender_workers, 1)) as render_pool:
+        render_futures = {}
+
+        def submit_render(job):
+            if render_enabled:
+                future = render_pool.submit(render_subject, job, records[job["subject"]], out_dir, blender, render_timeout,
+                                             quality, view_budget)
+                render_futures[future] = job
+
+        for job in to_render:
+            submit_render(job)
+
+        with ProcessPoolExecutor(max_workers=workers) as extract_pool:
+            export_futures = {extract_pool.submit(export_subject, job, records[job["subject"]]["mesh_path"], out_dir,
+                                                  tuple(formats)): (job, formats)
+                              for job, formats in to_export}
+            futures = {extract_pool.submit(extract_subject, job, out_dir, tuple(export_formats)): job
+                       for job in to_extract}
+            for future in as_completed(export_futures):
+                job, formats = export_futures[future]
+                record = records[job["subject"]]
+                try:
+                    paths = future.result()
+                except Exception:
+                    # The extraction and renders stay valid; a restart retries the missing formats
+                    record["error"] = traceback.format_exc()
+                    write_record(out_dir, record)
+                    print(f"[{job['subject']}] export of {', '.join(formats)} failed")
+                    continue
+                record["exports"] = [p for p in record.get("exports", []) if not p.endswith(
+                    tuple("." + fmt for fmt in formats))] + paths
+                record["export_formats"] = sorted(set(record.get("export_formats", [])) | set(formats))
+                write_record(out_dir, record)
+                print(f"[{job['subject']}] exported {', '.join(formats)}")
+            for future in as_completed(futures):
+                job = futures[future]
+                record = records[job["subject"]]
+                try:
+                    result = future.result()
+                except Exception:
+                    record["status"] = "failed"
+                    record["error"] = traceback.format_exc()
+                    write_record(out_dir, record)
+                    print(f"[{job['subject']}] extraction failed")
+                    continue
+                record.update(status="extracted", mesh_path=result["mesh_path"], triangles=result["triangles"],
+                              exports=result["exports"], export_formats=sorted(export_formats), error=None)
+                record["stages"].update(result["stages"])
+                write_record(out_dir, record)
+                print(f"[{job['subject']}] extracted {result['triangles']} triangles")
+                submit_render(job)
+
+        for future in as_completed(list(render_futures)):
+            job = render_futures[future]
+            record = records[job["subject"]]
+            try:
+                render_dir, elapsed = future.result()
+            except Exception:
+                # The mesh is kept, so a restart only retries the render
+                record["status"] = "render_failed"
+                record["error"] = traceback.format_exc()
+                write_record(out_dir, record)
+                print(f"[{job['subject']}] render failed")
+                continue
+            record.update(status="rendered", render_dir=render_dir, render_params=render_params[job["subject"]],
+                          error=None)
+            record["stages"]["blender"] = elapsed
+            write_record(out_dir, record)
+            print(f"[{job['subject']}] rendered in {elapsed:.1f}s")
+
+    failed = [s for s, r in records.items() if r["status"] in ("failed", "render_failed")]
+    print(f"Batch finished in {time.perf_counter() - batch_start:.1f}s: "
+          f"{len(records) - len(failed)} ok, {len(failed)} failed")
+    return records
+#####################################################################################################
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch T1 MRI skull extraction and rendering")
+    parser.add_argument("manifest", help="CSV or JSON manifest of subjects")
+    parser.add_argument("--out", required=True, help="Output directory (one sub-folder per subject)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the numpy stages")
+    parser.add_argument("--blender-workers", type=int, default=1, help="Concurrent headless Blender renders (0: mesh only)")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument("--render-timeout", type=float, default=None, help="Seconds before a render is abandoned")
+    parser.add_argument("--quality", default=None, choices=["draft", "review", "publication", "auto"],
+                        help="Render quality preset passed to every render")
+    parser.add_argument("--view-budget", type=float, default=None, help="Seconds per view (required for auto)")
+    parser.add_argument("--export", nargs="*", default=[], choices=["ply", "glb", "npz"],
+                        help="Also write the skull mesh in these formats")
+    args = parser.parse_args()
+    run_batch(args.manifest, args.out, workers=args.workers, blender_workers=args.blender_workers,
+              blender=args.blender, render_timeout=args.render_timeout, quality=args.quality, view_budget=args.view_budget,
+              export_formats=args.export)
@@ -0,0 +1,196 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Preprocessing Cache
+======================================================================
+
+Content-addressed on-disk cache for the intermediate arrays of the skull pipeline.
+
+Each stage key is the hash of its upstream key plus the parameters of that stage:
+
+    volume   <- file hash, downsample (normalized by the full-resolution range)
+    filtered <- volume key, sigma
+    mask     <- filtered key, threshold, ball radius
+
+so changing the threshold only re-runs the closing, changing sigma re-runs the filter
+and the closing, and so on. Entries are plain .npy files opened with mmap_mode='r' (or .npz bundles for
+results made of several arrays, such as baked meshes); the least recently used ones are
+evicted once the cache exceeds its disk budget.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+from mri_io import load_tiff_volume
+from mri_surface import filter_volume, close_mask
+
+
+class VolumeCache:
+    def __init__(self, cache_dir, max_bytes=4 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_index_path = os.path.join(cache_dir, "file_hashes.json")
+
+    def file_hash(self, file_path, chunk_size=16 * 1024**2):
+        """SHA-256 of the file contents, remembered per (path, size, mtime) so it is computed once."""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        index = {}
+        if os.path.exists(self._hash_index_path):
+            try:
+                with open(self._hash_index_path) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+        entry = index.get(file_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        index[file_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        self._write(self._hash_index_path, lambda f: f.write(json.dumps(index).encode()))
+        return index[file_path]["sha256"]
+
+    def _write(self, path, write):
+        # Write through a temporary file unique to this call, then rename: concurrent writers never share
+        # a temporary file and readers only ever see complete files
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _touch(path):
+        # Mark as recently used; an entry evicted meanwhile by another process stays valid once loaded
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def key(stage, *parts):
+        return stage + "-" + hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+    def path(self, key, ext=".npy"):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def load(self, key, mmap=True):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            array = np.load(path, mmap_mode='r' if mmap else None)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return array
+
+    def store(self, key, array):
+        self._write(self.path(key), lambda f: np.save(f, np.ascontiguousarray(array)))
+        self.evict()
+
+    def load_arrays(self, key):
+        """Load a bundle stored with store_arrays as a dict of arrays, or None."""
+        path = self.path(key, ".npz")
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return arrays
+
+    def store_arrays(self, key, **arrays):
+        self._write(self.path(key, ".npz"), lambda f: np.savez(f, **arrays))
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        array = self.load(key)
+        if array is not None:
+            print("Cache hit:", key)
+            return array
+        print("Cache miss:", key)
+        array = compute()
+        self.store(key, array)
+        return array
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".npy", ".npz")) and ".tmp" not in name:
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue  # evicted by another process since the listing
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass  # another process evicted it first
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(name)
+            total -= size
+
+    def clear(self):
+        for _, _, name in self.entries():
+            self._remove(name)
+
+
+#####################################################################################################
+# Functions: cached_volume / cached_filtered / cached_mask
+# Purpose: Run a pipeline stage through the cache; upstream stages are only computed (or loaded) on a miss.
+def volume_key(cache, file_path, downsample):
+    return cache.key("volume", cache.file_hash(file_path), int(downsample), "exact_range")
+
+
+def filtered_key(cache, file_path, downsample, sigma):
+    return cache.key("filtered", volume_key(cache, file_path, downsample), float(sigma))
+
+
+def mask_key(cache, file_path, downsample, sigma, threshold, ball_radius):
+    return cache.key("mask", filtered_key(cache, file_path, downsample, sigma), float(threshold), int(ball_radius))
+
+
+def cached_volume(cache, file_path, downsample=4):
+    return cache.get_or_compute(
+        volume_key(cache, file_path, downsample),
+        lambda: load_tiff_volume(file_path, downsample=downsample)[0],
+    )
+
+
+def cached_filtered(cache, file_path, downsample=4, sigma=0.7):
+    return cache.get_or_compute(
+        filtered_key(cache, file_path, downsample, sigma),
+        lambda: filter_volume(cached_volume(cache, file_path, downsample), sigma=sigma),
+    )
+
+
+def cached_mask(cache, file_path, downsample=4, sigma=0.7, threshold=0.65, ball_radius=1):
+    return cache.get_or_compute(
+        mask_key(cache, file_path, downsample, sigma, threshold, ball_radius),
+        lambda: close_mask(cached_filtered(cache, file_path, downsample, sigma),
+                           threshold=threshold, ball_radius=ball_radius),
+    )
+#####################################################################################################
@@ -0,0 +1,285 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Decimation Kernels
+======================================================================
+
+numba kernels of mri_decimate: the collapse loop of decimate_mesh() with its heap, link and
+flip tests and quadric solves, on the same array-backed half-edges. Imported lazily by
+mri_decimate._numba_kernels(), only when numba is installed.
+
+The helpers are module globals rather than closures so that numba's on-disk cache is hit
+in later processes instead of compiling for several seconds on every run.
+"""
+
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def _fan(v, vert_he, twin, out):
+    # Outgoing half-edges of v in rotation order into `out`; their count, or -1 if the fan is not closed
+    start = vert_he[v]
+    out[0] = start
+    n = 1
+    h = twin[start - start % 3 + (start + 2) % 3]
+    while h != start:
+        if h < 0 or n > 64:
+            return -1
+        out[n] = h
+        n += 1
+        h = twin[h - h % 3 + (h + 2) % 3]
+    return n
+
+
+@numba.njit(cache=True)
+def _quadric_cost(q, x, y, z):
+    h = (x, y, z, 1.0)
+    total = 0.0
+    for i in range(4):
+        for j in range(4):
+            total += h[i] * q[i, j] * h[j]
+    return total
+
+
+@numba.njit(cache=True)
+def _edge_target(quadrics, pos, u, v, q, out):
+    # Scalar mri_decimate.collapse_targets(): merged position into `out`, returns the cost; `q` is scratch space
+    for i in range(4):
+        for j in range(4):
+            q[i, j] = quadrics[u, i, j] + quadrics[v, i, j]
+    ax, ay, az = pos[u, 0], pos[u, 1], pos[u, 2]
+    bx, by, bz = pos[v, 0], pos[v, 1], pos[v, 2]
+    mx, my, mz = 0.5 * (ax + bx), 0.5 * (ay + by), 0.5 * (az + bz)
+    m00, m01, m02 = q[0, 0], q[0, 1], q[0, 2]
+    m10, m11, m12 = q[1, 0], q[1, 1], q[1, 2]
+    m20, m21, m22 = q[2, 0], q[2, 1], q[2, 2]
+    r0, r1, r2 = -q[0, 3], -q[1, 3], -q[2, 3]
+    c0, c1, c2 = m11 * m22 - m12 * m21, m10 * m22 - m12 * m20, m10 * m21 - m11 * m20
+    det = m00 * c0 - m01 * c1 + m02 * c2
+    scale = max(m00 + m11 + m22, 1e-30)
+    solvable = abs(det) > 1e-6 * scale ** 3
+    x, y, z = mx, my, mz
+    if solvable:
+        x = (r0 * c0 - m01 * (r1 * m22 - m12 * r2) + m02 * (r1 * m21 - m11 * r2)) / det
+        y = (m00 * (r1 * m22 - m12 * r2) - r0 * c1 + m02 * (m10 * r2 - r1 * m20)) / det
+        z = (m00 * (m11 * r2 - r1 * m21) - m01 * (m10 * r2 - r1 * m20) + r0 * c2) / det
+    length = np.sqrt((bx - ax) ** 2 + (by - ay) ** 2 + (bz - az) ** 2)
+    far = not solvable or np.sqrt((x - mx) ** 2 + (y - my) ** 2 + (z - mz) ** 2) > length
+    best = _quadric_cost(q, x, y, z)
+    if far:
+        # Best of the two endpoints and the midpoint, the first one on ties like np.argmin
+        x, y, z = ax, ay, az
+        best = _quadric_cost(q, ax, ay, az)
+        cost = _quadric_cost(q, bx, by, bz)
+        if cost < best:
+            x, y, z, best = bx, by, bz, cost
+        cost = _quadric_cost(q, mx, my, mz)
+        if cost < best:
+            x, y, z, best = mx, my, mz, cost
+    out[0], out[1], out[2] = x, y, z
+    return max(best, 0.0)
+
+
+@numba.njit(cache=True)
+def _flips(ring, n, f0, f1, moved, px, py, pz, org, pos):
+    # Would moving `moved` to (px, py, pz) turn any face of its fan (except f0, f1) over?
+    for k in range(n):
+        f = ring[k] - ring[k] % 3
+        if f // 3 == f0 or f // 3 == f1:
+            continue
+        i0, i1, i2 = org[f], org[f + 1], org[f + 2]
+        ax, ay, az = pos[i0, 0], pos[i0, 1], pos[i0, 2]
+        bx, by, bz = pos[i1, 0], pos[i1, 1], pos[i1, 2]
+        cx, cy, cz = pos[i2, 0], pos[i2, 1], pos[i2, 2]
+        ux, uy, uz, vx, vy, vz = bx - ax, by - ay, bz - az, cx - ax, cy - ay, cz - az
+        ox, oy, oz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+        if i0 == moved:
+            ax, ay, az = px, py, pz
+        elif i1 == moved:
+            bx, by, bz = px, py, pz
+        else:
+            cx, cy, cz = px, py, pz
+        ux, uy, uz, vx, vy, vz = bx - ax, by - ay, bz - az, cx - ax, cy - ay, cz - az
+        nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+        if ox * nx + oy * ny + oz * nz <= 0.0:
+            return True
+    return False
+
+
+# Binary heap of (cost, half-edge) keys, in the order of the Python loop's tuples, over slot ids: the rest of an
+# entry lives in its slot (ids[slot] = u, v, stamp of u, stamp of v; merged[slot] = position). Sifting moves a
+# hole instead of swapping rows, and slots are reused through a free list, so memory follows the heap size.
+@numba.njit(cache=True)
+def _sift_up(cost, edge, slot, i):
+    c, e, s = cost[i], edge[i], slot[i]
+    while i > 0:
+        parent = (i - 1) >> 1
+        if cost[parent] < c or (cost[parent] == c and edge[parent] <= e):
+            break
+        cost[i], edge[i], slot[i] = cost[parent], edge[parent], slot[parent]
+        i = parent
+    cost[i], edge[i], slot[i] = c, e, s
+
+
+@numba.njit(cache=True)
+def _sift_down(cost, edge, slot, size):
+    # Re-insert the entry at index `size` (just past the shrunk heap) from the root
+    c, e, s = cost[size], edge[size], slot[size]
+    i = 0
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and (cost[child + 1] < cost[child]
+                                 or (cost[child + 1] == cost[child] and edge[child + 1] < edge[child])):
+            child += 1
+        if c < cost[child] or (c == cost[child] and e <= edge[child]):
+            break
+        cost[i], edge[i], slot[i] = cost[child], edge[child], slot[child]
+        i = child
+    cost[i], edge[i], slot[i] = c, e, s
+
+
+@numba.njit(cache=True)
+def _grow(cost, edge, slot, ids, merged, free, n_free):
+    # Double the capacity; the new slots go on the free list
+    n = len(cost)
+    new_cost, new_edge, new_slot = np.empty(2 * n), np.empty(2 * n, dtype=np.int64), np.empty(2 * n, dtype=np.int64)
+    new_ids, new_merged = np.empty((2 * n, 4), dtype=np.int64), np.empty((2 * n, 3))
+    new_free = np.empty(2 * n, dtype=np.int64)
+    new_cost[:n], new_edge[:n], new_slot[:n] = cost, edge, slot
+    new_ids[:n], new_merged[:n] = ids, merged
+    new_free[:n_free] = free[:n_free]
+    for k in range(n):
+        new_free[n_free + k] = n + k
+    return new_cost, new_edge, new_slot, new_ids, new_merged, new_free, n_free + n
+
+
+@numba.njit(cache=True)
+def _push(cost, edge, slot, ids, merged, free, n_free, size, c, h, p, u, v, su, sv):
+    # Fill a free slot and sift its key up; the caller keeps at least one slot free
+    n_free -= 1
+    k = free[n_free]
+    ids[k, 0], ids[k, 1], ids[k, 2], ids[k, 3] = u, v, su, sv
+    merged[k, 0], merged[k, 1], merged[k, 2] = p[0], p[1], p[2]
+    cost[size], edge[size], slot[size] = c, h, k
+    _sift_up(cost, edge, slot, size)
+    return n_free, size + 1
+
+
+#####################################################################################################
+# Function: collapse(pos, quadrics, org, twin, locked, face_alive, target, limit)
+# Purpose: The collapse loop of mri_decimate._collapse_edges() on arrays. Moves the surviving vertices in `pos` and
+#          updates `org`, `twin`, `locked` and `face_alive` in place; returns the number of collapses.
+@numba.njit(cache=True)
+def collapse(pos, quadrics, org, twin, locked, face_alive, target, limit):
+    n_verts, n_half = len(pos), len(org)
+    vert_he = np.full(n_verts, -1, dtype=np.int64)
+    degree = np.zeros(n_verts, dtype=np.int64)
+    for h in range(n_half):
+        vert_he[org[h]] = h
+        degree[org[h]] += 1
+    vert_alive = np.ones(n_verts, dtype=np.bool_)
+    stamp = np.zeros(n_verts, dtype=np.int64)
+    ring_u = np.empty(66, dtype=np.int64)
+    ring_v = np.empty(66, dtype=np.int64)
+    p = np.empty(3)
+    q = np.empty((4, 4))
+
+    # Bowtie vertices: their fan from one half-edge does not reach all their faces
+    for v in range(n_verts):
+        if not locked[v] and vert_he[v] >= 0:
+            n = _fan(v, vert_he, twin, ring_u)
+            if n < 0 or n != degree[v]:
+                locked[v] = True
+
+    capacity = n_half // 2 + 16
+    heap_cost = np.empty(capacity)
+    heap_edge, heap_slot = np.empty(capacity, dtype=np.int64), np.empty(capacity, dtype=np.int64)
+    ids, merged = np.empty((capacity, 4), dtype=np.int64), np.empty((capacity, 3))
+    free = np.arange(capacity)[::-1].copy()
+    n_free, size = capacity, 0
+    for h in range(n_half):
+        u, v = org[h], org[h - h % 3 + (h + 1) % 3]
+        if twin[h] >= 0 and u < v and not locked[u] and not locked[v]:
+            if n_free == 0:
+                heap_cost, heap_edge, heap_slot, ids, merged, free, n_free = _grow(heap_cost, heap_edge, heap_slot,
+                                                                                   ids, merged, free, n_free)
+            cost = _edge_target(quadrics, pos, u, v, q, p)
+            n_free, size = _push(heap_cost, heap_edge, heap_slot, ids, merged, free, n_free, size, cost, h, p,
+                                 u, v, 0, 0)
+
+    alive_faces = len(face_alive)
+    collapses = 0
+    while size > 0 and alive_faces > target:
+        cost, h, k = heap_cost[0], heap_edge[0], heap_slot[0]
+        size -= 1
+        if size > 0:
+            _sift_down(heap_cost, heap_edge, heap_slot, size)
+        free[n_free] = k
+        n_free += 1
+        u, v, su, sv = ids[k, 0], ids[k, 1], ids[k, 2], ids[k, 3]
+        px, py, pz = merged[k, 0], merged[k, 1], merged[k, 2]
+        if cost > limit:
+            break
+        if not (vert_alive[u] and vert_alive[v]) or stamp[u] != su or stamp[v] != sv:
+            continue
+        n0, p0 = h - h % 3 + (h + 1) % 3, h - h % 3 + (h + 2) % 3
+        if not face_alive[h // 3] or org[h] != u or org[n0] != v:
+            continue
+        t = twin[h]
+        n1, p1 = t - t % 3 + (t + 1) % 3, t - t % 3 + (t + 2) % 3
+        nu = _fan(u, vert_he, twin, ring_u)
+        nv = _fan(v, vert_he, twin, ring_v)
+        if nu < 0 or nv < 0 or nu + nv - 4 < 3:
+            continue
+        w, x = org[p0], org[p1]
+        # Link condition: the only common neighbours of u and v are w and x
+        seen_w = seen_x = False
+        link = True
+        for i in range(nu):
+            a = ring_u[i]
+            a = org[a - a % 3 + (a + 1) % 3]
+            for j in range(nv):
+                b = ring_v[j]
+                if org[b - b % 3 + (b + 1) % 3] == a:
+                    if a == w:
+                        seen_w = True
+                    elif a == x:
+                        seen_x = True
+                    else:
+                        link = False
+        if not (link and seen_w and seen_x):
+            continue
+        f0, f1 = h // 3, t // 3
+        if _flips(ring_u, nu, f0, f1, u, px, py, pz, org, pos) or _flips(ring_v, nv, f0, f1, v, px, py, pz, org, pos):
+            continue
+
+        # Collapse v into u: re-label v's half-edges, stitch the twins across the two removed faces
+        for i in range(nv):
+            org[ring_v[i]] = u
+        a, b = twin[n0], twin[p0]
+        twin[a], twin[b] = b, a
+        c, d = twin[n1], twin[p1]
+        twin[c], twin[d] = d, c
+        face_alive[f0] = face_alive[f1] = False
+        alive_faces -= 2
+        vert_he[u], vert_he[w], vert_he[x] = b, a, c
+        vert_alive[v] = False
+        pos[u, 0], pos[u, 1], pos[u, 2] = px, py, pz
+        quadrics[u] += quadrics[v]
+        stamp[u] += 1
+        collapses += 1
+        nu = _fan(u, vert_he, twin, ring_u)
+        for i in range(nu):
+            g = ring_u[i]
+            b = org[g - g % 3 + (g + 1) % 3]
+            if not locked[b]:
+                if n_free == 0:
+                    heap_cost, heap_edge, heap_slot, ids, merged, free, n_free = _grow(heap_cost, heap_edge, heap_slot,
+                                                                                       ids, merged, free, n_free)
+                cost = _edge_target(quadrics, pos, u, b, q, p)
+                n_free, size = _push(heap_cost, heap_edge, heap_slot, ids, merged, free, n_free, size, cost, g, p,
+                                     u, b, stamp[u], stamp[b])
+    return collapses
+#####################################################################################################
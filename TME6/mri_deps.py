@@ -0,0 +1,77 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Dependency Checks
+======================================================================
+
+Checks for the third-party packages of the pipeline without importing them. Installed
+distributions are looked up in the package metadata (importlib.metadata), which reads a
+few dist-info files instead of loading scipy or scikit-image, and never spawns a process.
+pip is only run when something is actually missing and installation was asked for.
+
+    missing = missing_dependencies()            # ["scikit-image"] if skimage is absent
+    ensure_dependencies(install=True)           # pip install only the missing ones
+"""
+
+import sys
+from importlib import metadata
+
+# Distribution name -> import name of the packages the helper modules import lazily
+REQUIRED = {
+    "numpy": "numpy",
+    "scipy": "scipy",
+    "scikit-image": "skimage",
+    "tifffile": "tifffile",
+}
+
+
+#####################################################################################################
+# Function: installed_version(distribution)
+# Purpose: Version string of an installed distribution, or None. Metadata lookup only, nothing is imported.
+def installed_version(distribution):
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: missing_dependencies(required)
+# Purpose: Distributions of `required` that are not installed.
+def missing_dependencies(required=REQUIRED):
+    return [name for name in required if installed_version(name) is None]
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: install_package(package_name)
+# Purpose: Install a package with the pip of the running interpreter (Blender's bundled Python inside Blender).
+def install_package(package_name):
+    import subprocess
+    print(f"{package_name} not found, attempting to install...")
+    subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
+    print(f"Installed {package_name}")
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: ensure_dependencies(required, install)
+# Purpose: Report the missing dependencies and, with install=True, pip-install them. Returns the ones still missing.
+def ensure_dependencies(required=REQUIRED, install=False):
+    missing = missing_dependencies(required)
+    if not missing:
+        return []
+    if install:
+        for name in missing:
+            try:
+                install_package(name)
+            except Exception as e:
+                print(f"Error installing {name}: {e}")
+        # A fresh install is visible to metadata once importlib's path caches are dropped
+        import importlib
+        importlib.invalidate_caches()
+        missing = missing_dependencies(required)
+    if missing:
+        print(f"Missing packages: {', '.join(missing)} (pip install {' '.join(missing)})")
+    return missing
+#####################################################################################################
@@ -0,0 +1,376 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Headless Mesh Export
+======================================================================
+
+Writes the marching-cubes surface (vertices, faces, normals) straight from numpy, for
+consumers that need the skull mesh but not a render. No Blender import: this runs on any
+worker with numpy.
+
+    binary PLY   little-endian, float32 or quantized uint16 positions
+    GLB          glTF 2.0 binary; quantized positions/normals use KHR_mesh_quantization
+    NPZ          compressed numpy archive (verts, faces, normals), optionally float16 or quantized
+
+Arrays are streamed to the file: GLB buffers are written from the arrays' own memory, PLY
+records are packed and written in fixed-size chunks. reorder_mesh() orders the triangles
+for a post-transform vertex cache (Tipsify) and renumbers the vertices in first-use order,
+like meshoptimizer's vertex-cache and vertex-fetch passes.
+
+    python mri_export.py t1-rendering.tif --out skull.glb --downsample 1 --quantize 16 --reorder
+"""
+
+import json
+import os
+import struct
+import numpy as np
+
+# Records per write when packing PLY data
+CHUNK_ROWS = 1 << 20
+
+
+#####################################################################################################
+# Function: tipsify_order(faces, n_verts, cache_size)
+# Purpose: Triangle order for a vertex cache of `cache_size` entries (Sander et al., "Fast triangle reordering
+#          for vertex locality and reduced overdraw", 2007): fan around the vertex most likely still cached.
+def tipsify_order(faces, n_verts, cache_size=16):
+    faces = np.asarray(faces)
+    flat = faces.ravel()
+    valence = np.bincount(flat, minlength=n_verts)
+    starts = np.concatenate([[0], np.cumsum(valence)]).tolist()
+    vert_tris = (np.argsort(flat, kind='stable') // 3).tolist()
+    face_list = faces.tolist()
+    live = valence.tolist()
+    cache_time = [0] * n_verts
+    emitted = bytearray(len(faces))
+    dead_end = []
+    order = []
+    stamp = cache_size + 1
+    cursor = 0
+    fan = 0
+    while fan >= 0:
+        candidates = []
+        for t in vert_tris[starts[fan]:starts[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = 1
+            order.append(t)
+            for v in face_list[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if stamp - cache_time[v] > cache_size:
+                    cache_time[v] = stamp
+                    stamp += 1
+        # Next fan: a candidate that will still be in the cache after its remaining triangles, oldest first
+        fan, best_priority = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                age = stamp - cache_time[v]
+                priority = age if age + 2 * live[v] <= cache_size else 0
+                if priority > best_priority:
+                    fan, best_priority = v, priority
+        if fan == -1:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fan = v
+                    break
+            else:
+                while cursor < n_verts and live[cursor] == 0:
+                    cursor += 1
+                fan = cursor if cursor < n_verts else -1
+    return np.array(order, dtype=np.int64)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: reorder_mesh(verts, faces, normals, cache_size)
+# Purpose: Cache-friendly ordering: triangles by tipsify_order, then vertices renumbered in order of first use
+#          in the index buffer (vertex-fetch locality). Returns the reordered (verts, faces, normals).
+def reorder_mesh(verts, faces, normals=None, cache_size=16):
+    faces = np.asarray(faces)
+    faces = faces[tipsify_order(faces, len(verts), cache_size)]
+    flat = faces.ravel()
+    _, first_use = np.unique(flat, return_index=True)
+    used = flat[np.sort(first_use)]
+    remap = np.empty(len(verts), dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    new_faces = remap[faces].astype(np.int32)
+    new_normals = None if normals is None else np.asarray(normals)[used]
+    return np.asarray(verts)[used], new_faces, new_normals
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: cache_miss_ratio(faces, cache_size)
+# Purpose: Average cache miss ratio (misses per triangle) of the index buffer with a FIFO vertex cache.
+def cache_miss_ratio(faces, cache_size=16):
+    from collections import deque
+    cache = deque(maxlen=cache_size)
+    members = set()
+    misses = 0
+    for index in np.asarray(faces).ravel().tolist():
+        if index not in members:
+            misses += 1
+            if len(cache) == cache_size:
+                members.discard(cache[0])
+            cache.append(index)
+            members.add(index)
+    return misses / max(len(faces), 1)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: quantize(verts, bits)
+# Purpose: Map positions to unsigned integers over their bounding box; verts ~= offset + q * scale.
+def quantize(verts, bits=16):
+    if bits not in (8, 16):
+        raise ValueError("bits must be 8 or 16")
+    lo = verts.min(axis=0).astype(np.float64)
+    scale = np.maximum(verts.max(axis=0) - lo, 1e-12) / ((1 << bits) - 1)
+    dtype = np.uint8 if bits == 8 else np.uint16
+    q = np.rint((verts - lo) / scale).astype(dtype)
+    return q, scale.astype(np.float32), lo.astype(np.float32)
+#####################################################################################################
+
+
+def _unit(normals):
+    normals = np.asarray(normals, dtype=np.float32)
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(length > 0, length, 1.0)
+
+
+def _snorm8(normals):
+    return np.rint(_unit(normals) * 127).astype(np.int8)
+
+
+#####################################################################################################
+# Function: write_ply(path, verts, faces, normals, quantize_bits)
+# Purpose: Binary little-endian PLY. With quantize_bits=16 positions are stored as ushort and the
+#          dequantization scale/offset are recorded as header comments.
+def write_ply(path, verts, faces, normals=None, quantize_bits=None):
+    verts = np.asarray(verts)
+    faces = np.asarray(faces)
+    header = ["ply", "format binary_little_endian 1.0"]
+    if quantize_bits:
+        positions, scale, offset = quantize(verts, quantize_bits)
+        ply_type, np_type = ("uchar", "u1") if quantize_bits == 8 else ("ushort", "<u2")
+        header.append("comment quantization scale {} {} {} offset {} {} {}".format(*scale, *offset))
+    else:
+        positions = verts.astype(np.float32, copy=False)
+        ply_type, np_type = "float", "<f4"
+    fields = [(axis, np_type) for axis in "xyz"]
+    header += [f"element vertex {len(verts)}"] + [f"property {ply_type} {axis}" for axis in "xyz"]
+    if normals is not None:
+        normals = _unit(normals)
+        fields += [(name, "<f4") for name in ("nx", "ny", "nz")]
+        header += [f"property float {name}" for name in ("nx", "ny", "nz")]
+    header += [f"element face {len(faces)}", "property list uchar int vertex_indices", "end_header"]
+    vertex_dtype = np.dtype(fields)
+    face_dtype = np.dtype([("n", "u1"), ("v", "<i4", (3,))])
+
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        for start in range(0, len(verts), CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, len(verts))
+            records = np.empty(stop - start, dtype=vertex_dtype)
+            for i, axis in enumerate("xyz"):
+                records[axis] = positions[start:stop, i]
+            if normals is not None:
+                for i, name in enumerate(("nx", "ny", "nz")):
+                    records[name] = normals[start:stop, i]
+            f.write(memoryview(records))
+        for start in range(0, len(faces), CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, len(faces))
+            records = np.empty(stop - start, dtype=face_dtype)
+            records["n"] = 3
+            records["v"] = faces[start:stop]
+            f.write(memoryview(records))
+    return path
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: write_glb(path, verts, faces, normals, quantize_bits)
+# Purpose: glTF 2.0 binary with one mesh. Positions are float32, or uint16 with KHR_mesh_quantization
+#          (the node carries the dequantization), in which case normals are stored as normalized int8.
+#          The node rotates the Z-up Blender frame to glTF's Y-up.
+def write_glb(path, verts, faces, normals=None, quantize_bits=None):
+    verts = np.asarray(verts)
+    indices = np.ascontiguousarray(faces, dtype=np.uint16 if len(verts) < 65536 else np.uint32).ravel()
+    node = {"mesh": 0, "rotation": [-0.7071067811865476, 0.0, 0.0, 0.7071067811865476]}
+    extensions = []
+    if quantize_bits:
+        if quantize_bits != 16:
+            raise ValueError("GLB quantization supports 16-bit positions")
+        quantized, scale, offset = quantize(verts, 16)
+        # uint16 rows padded to 8 bytes: vertex attribute elements must be 4-byte aligned
+        positions = np.zeros((len(verts), 4), dtype=np.uint16)
+        positions[:, :3] = quantized
+        # TRS applies scale first, then rotation, then translation: translate by the rotated offset
+        node["scale"] = [float(s) for s in scale]
+        node["translation"] = [float(offset[0]), float(offset[2]), float(-offset[1])]
+        position_accessor = {"componentType": 5123, "min": quantized.min(axis=0).tolist(),
+                             "max": quantized.max(axis=0).tolist(), "byteStride": 8}
+        extensions = ["KHR_mesh_quantization"]
+    else:
+        positions = np.ascontiguousarray(verts, dtype=np.float32)
+        position_accessor = {"componentType": 5126, "min": positions.min(axis=0).tolist(),
+                             "max": positions.max(axis=0).tolist()}
+
+    # (array, accessor fields, bufferView target)
+    parts = [(positions, dict(position_accessor, type="VEC3", count=len(positions)), 34962)]
+    attributes = {"POSITION": 0}
+    if normals is not None:
+        if quantize_bits:
+            # int8 rows padded to 4 bytes as the spec requires for vertex attributes
+            packed = np.zeros((len(verts), 4), dtype=np.int8)
+            packed[:, :3] = _snorm8(normals)
+            parts.append((packed, {"componentType": 5120, "normalized": True, "type": "VEC3", "count": len(verts),
+                                   "byteStride": 4}, 34962))
+        else:
+            parts.append((np.ascontiguousarray(_unit(normals)), {"componentType": 5126, "type": "VEC3",
+                                                                  "count": len(verts)}, 34962))
+        attributes["NORMAL"] = 1
+    parts.append((indices, {"componentType": 5125 if indices.dtype == np.uint32 else 5123, "type": "SCALAR",
+                            "count": len(indices)}, 34963))
+
+    buffer_views, accessors, offset_bytes = [], [], 0
+    for i, (array, accessor, target) in enumerate(parts):
+        view = {"buffer": 0, "byteOffset": offset_bytes, "byteLength": array.nbytes, "target": target}
+        stride = accessor.pop("byteStride", None)
+        if stride:
+            view["byteStride"] = stride
+        buffer_views.append(view)
+        accessors.append(dict(accessor, bufferView=i))
+        offset_bytes += array.nbytes + (-array.nbytes % 4)
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "mri_export"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [node],
+        "meshes": [{"name": "T1_Skull", "primitives": [{"attributes": attributes, "indices": len(parts) - 1}]}],
+        "buffers": [{"byteLength": offset_bytes}],
+        "bufferViews": buffer_views,
+        "accessors": accessors,
+    }
+    if extensions:
+        gltf["extensionsUsed"] = extensions
+        gltf["extensionsRequired"] = extensions
+    json_bytes = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    total = 12 + 8 + len(json_bytes) + 8 + offset_bytes
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, total))
+        f.write(struct.pack("<I4s", len(json_bytes), b"JSON"))
+        f.write(json_bytes)
+        f.write(struct.pack("<I4s", offset_bytes, b"BIN\0"))
+        for array, _, _ in parts:
+            f.write(memoryview(array).cast("B"))
+            f.write(b"\0" * (-array.nbytes % 4))
+    return path
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: write_npz(path, verts, faces, normals, float16, quantize_bits)
+# Purpose: Compressed .npz with the keys the batch runner and render_mesh_file use (verts, faces, normals).
+#          float16 halves the vertex size; quantize_bits stores verts_q + scale/offset instead (see load_mesh_npz).
+def write_npz(path, verts, faces, normals=None, float16=False, quantize_bits=None):
+    arrays = {"faces": np.asarray(faces, dtype=np.int32)}
+    if quantize_bits:
+        arrays["verts_q"], arrays["scale"], arrays["offset"] = quantize(np.asarray(verts), quantize_bits)
+    else:
+        arrays["verts"] = np.asarray(verts, dtype=np.float16 if float16 else np.float32)
+    if normals is not None:
+        arrays["normals"] = _snorm8(normals) if quantize_bits else _unit(normals).astype(np.float16 if float16 else np.float32)
+    np.savez_compressed(path, **arrays)
+    return path
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: load_mesh_npz(path)
+# Purpose: Read a mesh .npz written by write_npz (any variant) or the batch runner as float32 (verts, faces, normals).
+def load_mesh_npz(path):
+    with np.load(path) as data:
+        if "verts_q" in data:
+            verts = data["offset"] + data["verts_q"].astype(np.float32) * data["scale"]
+        else:
+            verts = data["verts"].astype(np.float32)
+        faces = data["faces"]
+        normals = data["normals"] if "normals" in data else None
+    if normals is not None:
+        normals = _unit(normals.astype(np.float32))
+    return verts, faces, normals
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: check_export_options(path, float16, quantize_bits)
+# Purpose: Raise ValueError if the format of `path` cannot be written with these options, before any work is done.
+def check_export_options(path, float16=False, quantize_bits=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".ply", ".glb", ".npz"):
+        raise ValueError(f"Unsupported mesh format {ext!r} ({path}), expected .ply, .glb or .npz")
+    if float16 and ext != ".npz":
+        raise ValueError(f"{path}: float16 vertices are only supported for .npz (PLY and glTF have no half-float type)")
+    if quantize_bits not in (None, 8, 16):
+        raise ValueError(f"{path}: quantize_bits must be 8 or 16")
+    if quantize_bits == 8 and ext == ".glb":
+        raise ValueError(f"{path}: GLB quantization supports 16-bit positions only")
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: export_mesh(path, verts, faces, normals, reorder, float16, quantize_bits)
+# Purpose: Write the mesh in the format given by the file extension (.ply, .glb, .npz).
+def export_mesh(path, verts, faces, normals=None, reorder=False, float16=False, quantize_bits=None):
+    check_export_options(path, float16=float16, quantize_bits=quantize_bits)
+    if reorder:
+        verts, faces, normals = reorder_mesh(verts, faces, normals)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".ply":
+        return write_ply(path, verts, faces, normals, quantize_bits=quantize_bits)
+    if ext == ".glb":
+        return write_glb(path, verts, faces, normals, quantize_bits=quantize_bits)
+    return write_npz(path, verts, faces, normals, float16=float16, quantize_bits=quantize_bits)
+#####################################################################################################
+
+
+if __name__ == "__main__":
+    # Headless extraction + export: the numpy stages of the pipeline without Blender
+    import argparse
+    import time
+    from mri_io import load_tiff_volume
+    from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+
+    parser = argparse.ArgumentParser(description="Extract the T1 skull surface and export it without Blender")
+    parser.add_argument("input", help="T1 TIFF volume")
+    parser.add_argument("--out", required=True, nargs="+", help="Output file(s): .ply, .glb and/or .npz")
+    parser.add_argument("--downsample", type=int, default=4)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    parser.add_argument("--sigma", type=float, default=0.7)
+    parser.add_argument("--reorder", action="store_true", help="Cache-friendly triangle and vertex order")
+    parser.add_argument("--float16", action="store_true", help="Half-float vertices (.npz only)")
+    parser.add_argument("--quantize", type=int, default=None, choices=[8, 16], help="Quantized positions")
+    args = parser.parse_args()
+    # Reject unsupported format / option pairs (e.g. --quantize 8 with a .glb) before the pipeline runs
+    for out_path in args.out:
+        try:
+            check_export_options(out_path, float16=args.float16, quantize_bits=args.quantize)
+        except ValueError as e:
+            parser.error(str(e))
+
+    volume, _, _ = load_tiff_volume(args.input, downsample=args.downsample)
+    closed = close_mask(filter_volume(volume, sigma=args.sigma), threshold=args.threshold)
+    verts, faces, normals = marching_cubes_mesh(closed, level=0.5)
+    if args.reorder:
+        verts, faces, normals = reorder_mesh(verts, faces, normals)
+    for out_path in args.out:
+        start = time.perf_counter()
+        export_mesh(out_path, verts, faces, normals, float16=args.float16, quantize_bits=args.quantize)
+        print(f"{out_path}: {len(faces)} triangles, {os.path.getsize(out_path) / 1024**2:.2f} MB "
+              f"in {time.perf_counter() - start:.2f}s")
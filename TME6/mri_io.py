@@ -0,0 +1,118 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Volume I/O
+======================================================================
+
+Loading helpers for the T1 MRI pipeline that do not depend on Blender.
+
+The TIFF loader reads only the pages it keeps and decimates every page
+in-plane while reading, so peak memory follows the downsampled volume
+rather than the raw stack.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+
+from mri_profile import profiled
+
+
+#####################################################################################################
+# Function: _page_view(tif, page, file_map)
+# Purpose: Return a zero-copy view of an uncompressed, contiguous TIFF page, or None if the page has to be decoded.
+def _page_view(tif, page, file_map):
+    if file_map is None or not page.is_contiguous or len(page.shape) != 2:
+        return None
+    offset = page.dataoffsets[0]
+    dtype = np.dtype(page.dtype).newbyteorder(tif.byteorder)
+    return np.ndarray(page.shape, dtype=dtype, buffer=file_map, offset=offset)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: load_tiff_volume(file_path, downsample, exact_range, use_memmap)
+# Purpose: Load every `downsample`-th page of a TIFF stack into one preallocated float32 array,
+#          decimating in-plane as pages are read and normalizing to [0, 1] with a streaming min/max.
+@profiled("load_tiff_volume")
+def load_tiff_volume(file_path, downsample=1, exact_range=True, use_memmap=True):
+    """
+    Returns (volume, min_val, max_val).
+
+    By default the min/max also scan the skipped samples (one page at a time), so
+    the normalization, and what a threshold means, is the full-resolution one at
+    any downsample. exact_range=False takes them over the kept samples only and
+    never reads skipped pages: faster, but the range then depends on downsample.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Error: The file '{file_path}' does not exist.")
+    step = max(int(downsample), 1)
+
+    import tifffile
+    with tifffile.TiffFile(file_path) as tif:
+        pages = tif.pages
+        depth = len(pages)
+        height, width = pages[0].shape[:2]
+
+        file_map = None
+        if use_memmap:
+            try:
+                file_map = np.memmap(file_path, dtype=np.uint8, mode='r')
+            except (OSError, ValueError):
+                file_map = None
+
+        kept = range(0, depth, step)
+        volume = np.empty((len(kept), -(-height // step), -(-width // step)), dtype=np.float32)
+        min_val = np.inf
+        max_val = -np.inf
+
+        for z in range(depth):
+            keep = z % step == 0
+            if not keep and not exact_range:
+                continue
+            page = pages[z]
+            data = _page_view(tif, page, file_map)
+            if data is None:
+                data = page.asarray()
+            if exact_range:
+                min_val = min(min_val, data.min())
+                max_val = max(max_val, data.max())
+            if keep:
+                out = volume[z // step]
+                out[...] = data[::step, ::step]
+                if not exact_range:
+                    min_val = min(min_val, out.min())
+                    max_val = max(max_val, out.max())
+            del data
+        del file_map
+
+    min_val = np.float32(min_val)
+    max_val = np.float32(max_val)
+    # Normalize in place so no second full-size copy is created
+    if max_val == min_val:
+        volume.fill(0.0)  # Avoid division by zero
+    else:
+        volume -= min_val
+        volume /= (max_val - min_val)
+    return volume, min_val, max_val
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: npy_backed(array, prefix)
+# Purpose: Context manager yielding the path of an .npy file holding `array`, so worker processes can
+#          open it with mmap_mode='r' instead of receiving a pickled copy. Arrays that already map a whole
+#          .npy file (e.g. preprocessing cache entries) are reused by path; anything else is written once
+#          to a temporary file that is removed on exit.
+@contextmanager
+def npy_backed(array, prefix="mri_"):
+    if isinstance(array, np.memmap) and str(array.filename or "").endswith(".npy"):
+        on_disk = np.load(array.filename, mmap_mode='r')
+        if on_disk.shape == array.shape and on_disk.dtype == array.dtype and array.flags.c_contiguous:
+            yield str(array.filename)
+            return
+    with tempfile.TemporaryDirectory(prefix=prefix) as tmp_dir:
+        path = os.path.join(tmp_dir, "array.npy")
+        np.save(path, np.ascontiguousarray(array))
+        yield path
+#####################################################################################################
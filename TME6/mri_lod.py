@@ -0,0 +1,147 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Surface LOD Pyramid
+======================================================================
+
+Picks a skull surface level (e.g. 1/8, 1/4, 1/2 or full resolution) from one closed mask
+by a triangle budget, and extracts only that level plus two cheap coarse pilots instead of
+the whole pyramid. export_lod_levels builds the whole pyramid instead and writes every level
+as its own mesh file, so a viewer (or the main script's --mesh mode) switches levels
+without re-extracting.
+
+Coarse levels are extracted from a mean-pooled copy of the mask, which gives a smooth
+fractional occupancy field for marching cubes. Vertices of every level are expressed in
+full-resolution voxel units, so all levels line up and share the same object scale.
+"""
+
+import os
+import time
+import numpy as np
+
+from mri_surface import marching_cubes_mesh
+from mri_export import write_npz, write_ply
+
+LOD_WRITERS = {"npz": write_npz, "ply": write_ply}
+
+
+#####################################################################################################
+# Function: pool_mask(closed_data, factor)
+# Purpose: Mean-pool a binary mask by `factor` along every axis into a float32 occupancy volume.
+def pool_mask(closed_data, factor):
+    if factor == 1:
+        return closed_data
+    pad = [(0, -n % factor) for n in closed_data.shape]
+    data = np.pad(closed_data, pad, mode='edge') if any(p for _, p in pad) else closed_data
+    nz, ny, nx = (n // factor for n in data.shape)
+    return data.reshape(nz, factor, ny, factor, nx, factor).mean(axis=(1, 3, 5), dtype=np.float32)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: extract_lod(closed_data, factor, level)
+# Purpose: Extract the surface of the mask pooled by `factor`, in full-resolution voxel units; returns a level
+#          dict, or None if the pooled mask has no surface.
+def extract_lod(closed_data, factor, level=0.5):
+    start = time.perf_counter()
+    pooled = pool_mask(closed_data, factor)
+    try:
+        verts, faces, normals = marching_cubes_mesh(pooled, level=level)
+    except (ValueError, RuntimeError):
+        print(f"LOD 1/{factor}: no surface at level {level}")
+        return None
+    # Pooled voxel i covers full-resolution voxels [i*f, (i+1)*f); Z is already flipped
+    half = (factor - 1) / 2.0
+    verts *= factor
+    verts += np.array([half, half, -half], dtype=verts.dtype)
+    lod = {
+        "factor": factor,
+        "verts": verts,
+        "faces": faces,
+        "normals": normals,
+        "triangles": len(faces),
+        "seconds": time.perf_counter() - start,
+    }
+    print(f"LOD 1/{factor}: {len(faces)} triangles in {lod['seconds']:.2f}s")
+    return lod
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: build_lod(closed_data, factors, triangle_budget, level)
+# Purpose: Extract the finest level whose triangle count fits the budget (the coarsest if none does, the
+#          finest with no budget) without extracting the whole pyramid. The two coarsest levels are extracted
+#          as pilots; the growth of the triangle count between them predicts the finer levels, and only the
+#          finest level predicted to fit is extracted (then the next coarser one if it turns out too large).
+def build_lod(closed_data, factors=(8, 4, 2, 1), triangle_budget=None, level=0.5):
+    factors = sorted(set(int(f) for f in factors), reverse=True)
+    if triangle_budget is None:
+        factors = factors[-1:]
+    extracted = {}
+    for factor in factors[:2]:
+        lod = extract_lod(closed_data, factor, level=level)
+        if lod is not None:
+            extracted[factor] = lod
+    if not extracted:
+        raise ValueError(f"No surface at level {level} in the coarsest LOD levels {factors[:2]}")
+    pilots = sorted(extracted.values(), key=lambda l: -l["factor"])
+    finest = pilots[-1]
+    # Triangles grow by `growth` per halving of the factor: 4 for a smooth surface, more as detail appears
+    growth = 4.0
+    if len(pilots) == 2 and pilots[0]["triangles"]:
+        growth = max(pilots[1]["triangles"] / pilots[0]["triangles"], 1.0) ** (
+            1.0 / np.log2(pilots[0]["factor"] / pilots[1]["factor"]))
+
+    def predicted(factor):
+        return finest["triangles"] * growth ** np.log2(finest["factor"] / factor)
+
+    fits = [lod for lod in pilots if triangle_budget is None or lod["triangles"] <= triangle_budget]
+    chosen = fits[-1] if fits else pilots[0]
+    if len(fits) < len(pilots):
+        return chosen
+    for factor in reversed(factors[2:]):
+        if triangle_budget is not None and predicted(factor) > triangle_budget:
+            continue
+        lod = extract_lod(closed_data, factor, level=level)
+        if lod is not None and (triangle_budget is None or lod["triangles"] <= triangle_budget):
+            return lod
+    return chosen
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: select_lod(levels, triangle_budget)
+# Purpose: Pick the finest of already extracted levels whose triangle count fits the budget; falls back to the
+#          coarsest level if none does. With no budget the finest level is returned.
+def select_lod(levels, triangle_budget=None):
+    if not levels:
+        raise ValueError("No LOD levels to choose from")
+    ordered = sorted(levels, key=lambda l: l["triangles"])
+    chosen = ordered[0]
+    for lod in ordered:
+        if triangle_budget is None or lod["triangles"] <= triangle_budget:
+            chosen = lod
+    return chosen
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: export_lod_levels(closed_data, out_dir, factors, formats, level)
+# Purpose: Extract every requested factor and write each level as its own mesh file, out_dir/lod_<factor>.<format>
+#          (formats from LOD_WRITERS). Returns the level dicts, coarse to fine, with the written "paths".
+def export_lod_levels(closed_data, out_dir, factors=(8, 4, 2, 1), formats=("npz",), level=0.5):
+    unknown = sorted(set(formats) - set(LOD_WRITERS))
+    if unknown:
+        raise ValueError(f"Unsupported LOD export format(s) {unknown}, expected {sorted(LOD_WRITERS)}")
+    os.makedirs(out_dir, exist_ok=True)
+    levels = []
+    for factor in sorted(set(int(f) for f in factors), reverse=True):
+        lod = extract_lod(closed_data, factor, level=level)
+        if lod is None:
+            continue
+        lod["paths"] = [LOD_WRITERS[fmt](os.path.join(out_dir, f"lod_{factor}.{fmt}"), lod["verts"], lod["faces"],
+                                         lod["normals"]) for fmt in formats]
+        levels.append(lod)
+    if not levels:
+        raise ValueError(f"No surface at level {level} in any LOD level {sorted(factors)}")
+    return levels
+#####################################################################################################
@@ -0,0 +1,307 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Mesh Buffers
+======================================================================
+
+Pure-numpy helpers for triangle meshes coming out of marching cubes.
+
+mesh_buffers() flattens (verts, faces, normals) into the exact buffers Blender's
+foreach_set API expects, so a mesh can be uploaded without building Python lists
+and without a per-polygon loop.
+
+apply_modifier_stack() is the numpy counterpart of the skull's Smooth/Solidify modifiers
+(uniform Laplacian smoothing on a sparse adjacency, and shelling along vertex normals with
+rim faces), so the finishing geometry can be produced and checked without Blender.
+
+smooth_mesh() smooths the marching-cubes output itself (Laplacian, Taubin or HC) with one
+CSR adjacency and sparse products over all three coordinates at once; the Laplacian and
+Taubin steps use a numba kernel when numba is installed.
+"""
+
+import numpy as np
+
+from mri_profile import profiled
+
+
+#####################################################################################################
+# Function: mesh_buffers(verts, faces, normals)
+# Purpose: Flatten a triangle mesh into contiguous buffers for bpy foreach_set.
+@profiled("mesh_buffers")
+def mesh_buffers(verts, faces, normals=None):
+    """
+    Returns a dict of 1D contiguous arrays:
+        co                (3 * n_verts,)  float32   -> mesh.vertices "co"
+        loop_vertex_index (3 * n_faces,)  int32     -> mesh.loops "vertex_index"
+        loop_start        (n_faces,)      int32     -> mesh.polygons "loop_start"
+        loop_total        (n_faces,)      int32     -> mesh.polygons "loop_total"
+        use_smooth        (n_faces,)      bool      -> mesh.polygons "use_smooth"
+        vertex_normals    (3 * n_verts,)  float32   (only if normals are given)
+    """
+    verts = np.asarray(verts)
+    faces = np.asarray(faces)
+    if verts.ndim != 2 or verts.shape[1] != 3:
+        raise ValueError(f"verts must have shape (n, 3), got {verts.shape}")
+    if faces.ndim != 2 or faces.shape[1] != 3:
+        raise ValueError(f"faces must be triangles with shape (m, 3), got {faces.shape}")
+    n_faces = len(faces)
+
+    buffers = {
+        "co": np.ascontiguousarray(verts, dtype=np.float32).ravel(),
+        "loop_vertex_index": np.ascontiguousarray(faces, dtype=np.int32).ravel(),
+        "loop_start": np.arange(0, 3 * n_faces, 3, dtype=np.int32),
+        "loop_total": np.full(n_faces, 3, dtype=np.int32),
+        "use_smooth": np.ones(n_faces, dtype=bool),
+    }
+    if normals is not None:
+        normals = np.asarray(normals, dtype=np.float32)
+        if normals.shape != verts.shape:
+            raise ValueError(f"normals must match verts {verts.shape}, got {normals.shape}")
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        buffers["vertex_normals"] = np.ascontiguousarray(normals / np.where(length > 0, length, 1.0)).ravel()
+    return buffers
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: vertex_adjacency(faces, n_verts)
+# Purpose: Sparse (CSR) vertex-vertex adjacency of a triangle mesh, built once from the edges of `faces`.
+def vertex_adjacency(faces, n_verts):
+    import scipy.sparse
+    faces = np.asarray(faces)
+    rows = np.concatenate([faces[:, 0], faces[:, 1], faces[:, 2]])
+    cols = np.concatenate([faces[:, 1], faces[:, 2], faces[:, 0]])
+    adjacency = scipy.sparse.coo_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_verts, n_verts))
+    adjacency = (adjacency + adjacency.T).tocsr()
+    adjacency.data[:] = 1.0  # edges shared by two faces were summed twice
+    return adjacency
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: vertex_normals(verts, faces)
+# Purpose: Area-weighted unit vertex normals following the face winding.
+def vertex_normals(verts, faces):
+    verts = np.asarray(verts, dtype=np.float64)
+    tri = verts[faces]
+    face_normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normals = np.zeros_like(verts)
+    for corner in range(3):
+        np.add.at(normals, faces[:, corner], face_normals)
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    return normals / np.where(length > 0, length, 1.0)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: smoothing_operator(adjacency)
+# Purpose: Row-normalized adjacency W = D^-1 A (CSR), so W @ verts is the mean of every vertex's neighbours for all
+#          three coordinates in one sparse product. Isolated vertices get W[i, i] = 1 and never move.
+def smoothing_operator(adjacency):
+    import scipy.sparse
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    isolated = degree == 0
+    operator = scipy.sparse.diags(1.0 / np.where(isolated, 1.0, degree)) @ adjacency
+    if isolated.any():
+        operator = operator + scipy.sparse.diags(isolated.astype(np.float64))
+    return operator.tocsr()
+#####################################################################################################
+
+
+_NUMBA_STEP = None  # compiled on first use; False once numba was found missing
+
+
+def _numba_kernels():
+    """JIT-compiled CSR smoothing step, or None when numba is not installed."""
+    global _NUMBA_STEP
+    if _NUMBA_STEP is None:
+        try:
+            import numba
+        except ImportError:
+            _NUMBA_STEP = False
+            return None
+
+        @numba.njit(parallel=True, fastmath=True, cache=True)
+        def step(indptr, indices, verts, factor, out):
+            for i in numba.prange(len(indptr) - 1):
+                start, stop = indptr[i], indptr[i + 1]
+                if stop == start:
+                    out[i] = verts[i]
+                    continue
+                sx = sy = sz = 0.0
+                for k in range(start, stop):
+                    j = indices[k]
+                    sx += verts[j, 0]
+                    sy += verts[j, 1]
+                    sz += verts[j, 2]
+                n = stop - start
+                out[i, 0] = verts[i, 0] + factor * (sx / n - verts[i, 0])
+                out[i, 1] = verts[i, 1] + factor * (sy / n - verts[i, 1])
+                out[i, 2] = verts[i, 2] + factor * (sz / n - verts[i, 2])
+
+        _NUMBA_STEP = step
+    return _NUMBA_STEP or None
+
+
+#####################################################################################################
+# Function: _smoother(adjacency, use_numba)
+# Purpose: Function step(verts, factor) -> verts + factor * (mean of neighbours - verts), with scipy's CSR product or
+#          the numba kernel (use_numba=None: numba if installed).
+def _smoother(adjacency, use_numba=None):
+    kernel = _numba_kernels() if use_numba in (None, True) else None
+    if use_numba and kernel is None:
+        raise ImportError("use_numba=True needs the numba package")
+    if kernel is not None:
+        indptr = adjacency.indptr.astype(np.int64)
+        indices = adjacency.indices.astype(np.int64)
+
+        def step(verts, factor):
+            out = np.empty_like(verts)
+            kernel(indptr, indices, verts, factor, out)
+            return out
+        return step
+
+    operator = smoothing_operator(adjacency)
+
+    def step(verts, factor):
+        return verts + factor * (operator @ verts - verts)
+    return step
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: laplacian_smooth(verts, faces, factor, iterations, adjacency, use_numba)
+# Purpose: Uniform Laplacian smoothing, as Blender's Smooth modifier does it: every iteration moves each
+#          vertex by `factor` towards the mean of its edge neighbours.
+def laplacian_smooth(verts, faces, factor=0.5, iterations=1, adjacency=None, use_numba=False):
+    verts = np.array(verts, dtype=np.float64)
+    if adjacency is None:
+        adjacency = vertex_adjacency(faces, len(verts))
+    step = _smoother(adjacency, use_numba)
+    for _ in range(iterations):
+        verts = step(verts, factor)
+    return verts.astype(np.float32)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: taubin_smooth(verts, faces, lam, mu, iterations, adjacency, use_numba)
+# Purpose: Taubin lambda|mu smoothing: a Laplacian step with `lam` followed by an inflating one with `mu` < -lam,
+#          which removes the marching-cubes staircase without the shrinkage of plain Laplacian smoothing.
+def taubin_smooth(verts, faces, lam=0.5, mu=-0.53, iterations=10, adjacency=None, use_numba=None):
+    verts = np.array(verts, dtype=np.float64)
+    if adjacency is None:
+        adjacency = vertex_adjacency(faces, len(verts))
+    step = _smoother(adjacency, use_numba)
+    for _ in range(iterations):
+        verts = step(step(verts, lam), mu)
+    return verts.astype(np.float32)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: hc_smooth(verts, faces, alpha, beta, iterations, adjacency)
+# Purpose: Vollmer's HC ("humphrey's classes") smoothing: a Laplacian step whose displacement is pulled back
+#          towards the original (`alpha`) and the previous positions (`beta`), so the volume is kept.
+def hc_smooth(verts, faces, alpha=0.1, beta=0.5, iterations=10, adjacency=None):
+    original = np.array(verts, dtype=np.float64)
+    if adjacency is None:
+        adjacency = vertex_adjacency(faces, len(original))
+    operator = smoothing_operator(adjacency)
+    q = original
+    for _ in range(iterations):
+        p = operator @ q
+        b = p - (alpha * original + (1.0 - alpha) * q)
+        q = p - (beta * b + (1.0 - beta) * (operator @ b))
+    return q.astype(np.float32)
+#####################################################################################################
+
+
+SMOOTHING_METHODS = ("laplacian", "taubin", "hc")
+
+
+#####################################################################################################
+# Function: smooth_mesh(verts, faces, method, iterations, normals, use_numba)
+# Purpose: Smooth a marching-cubes mesh with one of SMOOTHING_METHODS before it goes to Blender. The adjacency
+#          is built once; with `normals` given, vertex normals are recomputed and oriented like them.
+#          Returns (verts, normals) (normals is None if none were given).
+@profiled("smooth_mesh")
+def smooth_mesh(verts, faces, method="taubin", iterations=10, normals=None, use_numba=None):
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f"Unknown smoothing method {method!r}, expected one of {SMOOTHING_METHODS}")
+    adjacency = vertex_adjacency(faces, len(verts))
+    if method == "laplacian":
+        smoothed = laplacian_smooth(verts, faces, factor=0.5, iterations=iterations, adjacency=adjacency,
+                                    use_numba=use_numba)
+    elif method == "taubin":
+        smoothed = taubin_smooth(verts, faces, iterations=iterations, adjacency=adjacency, use_numba=use_numba)
+    else:
+        smoothed = hc_smooth(verts, faces, iterations=iterations, adjacency=adjacency)
+    if normals is not None:
+        new_normals = vertex_normals(smoothed, faces)
+        # Winding and gradient normals may disagree (skimage winds inwards); keep the caller's orientation
+        if np.einsum("ij,ij->", new_normals, np.asarray(normals, dtype=np.float64)) < 0:
+            new_normals = -new_normals
+        normals = new_normals.astype(np.float32)
+    return smoothed, normals
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: boundary_edges(faces)
+# Purpose: Directed edges (a, b), in face winding order, that belong to exactly one face.
+def boundary_edges(faces):
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    keys = np.sort(edges, axis=1)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    return edges[counts[inverse.ravel()] == 1]
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: shell_mesh(verts, faces, thickness, offset, use_rim)
+# Purpose: Numpy equivalent of Blender's simple Solidify modifier: a second shell offset along the vertex
+#          normals (offset=-1 puts it inside), with reversed winding, and optional rim faces along open edges.
+def shell_mesh(verts, faces, thickness=0.01, offset=-1.0, use_rim=True):
+    verts = np.asarray(verts, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    n_verts = len(verts)
+    normals = vertex_normals(verts, faces)
+    outer = verts + normals * thickness * (offset + 1.0) / 2.0
+    inner = verts + normals * thickness * (offset - 1.0) / 2.0
+    new_verts = np.concatenate([outer, inner])
+    new_faces = [faces, faces[:, ::-1] + n_verts]
+    if use_rim:
+        edges = boundary_edges(faces)
+        if len(edges):
+            a, b = edges[:, 0], edges[:, 1]
+            new_faces.append(np.stack([b, a, a + n_verts], axis=1))
+            new_faces.append(np.stack([b, a + n_verts, b + n_verts], axis=1))
+    return new_verts.astype(np.float32), np.concatenate(new_faces).astype(np.int32)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: apply_modifier_stack(verts, faces, stack)
+# Purpose: Apply a list of modifier settings ({"type": "SMOOTH", "factor", "iterations"} or
+#          {"type": "SOLIDIFY", "thickness", "offset", "use_rim"}) with the numpy equivalents above.
+#          Other modifier types (e.g. REMESH) have no numpy equivalent and are skipped.
+@profiled("numpy_modifiers")
+def apply_modifier_stack(verts, faces, stack):
+    verts = np.asarray(verts)
+    faces = np.asarray(faces)
+    adjacency = None
+    for modifier in stack:
+        kind = modifier["type"]
+        if kind == "SMOOTH":
+            if adjacency is None:
+                adjacency = vertex_adjacency(faces, len(verts))
+            verts = laplacian_smooth(verts, faces, factor=modifier.get("factor", 0.5),
+                                     iterations=modifier.get("iterations", 1), adjacency=adjacency)
+        elif kind == "SOLIDIFY":
+            verts, faces = shell_mesh(verts, faces, thickness=modifier.get("thickness", 0.01),
+                                      offset=modifier.get("offset", -1.0), use_rim=modifier.get("use_rim", True))
+            adjacency = None
+        else:
+            print(f"No numpy equivalent for {kind} modifier, skipped")
+    return verts, faces
+#####################################################################################################
@@ -0,0 +1,174 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Stage Profiling
+======================================================================
+
+Lightweight instrumentation for the MRI pipeline. Every named stage records wall time,
+CPU time, the growth of the process peak RSS and the sizes of the arrays it produced:
+
+    with stage("filter", sigma=0.7) as s:
+        filtered = filter_volume(volume)
+        s.add_array("filtered", filtered)
+
+    @profiled("marching_cubes")
+    def marching_cubes_mesh(...): ...
+
+Stages nest. The trace can be written as structured JSON (write_json) or in the Chrome
+trace-event format (write_chrome_trace) for chrome://tracing or Perfetto.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None if the platform does not report it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageRecord:
+    def __init__(self, name, depth, info):
+        self.name = name
+        self.depth = depth
+        self.info = dict(info)
+        self.arrays = {}
+        self.start = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_delta = None
+        self.thread_id = threading.get_ident()
+
+    def add_array(self, label, array):
+        """Record shape, dtype and size of an array produced by this stage."""
+        self.arrays[label] = {
+            "shape": list(getattr(array, "shape", ())),
+            "dtype": str(getattr(array, "dtype", type(array).__name__)),
+            "nbytes": int(getattr(array, "nbytes", 0)),
+        }
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "start": self.start,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "peak_rss_delta": self.peak_rss_delta,
+            "arrays": self.arrays,
+            "info": self.info,
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.records = []
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, **info):
+        stack = self._stack()
+        record = StageRecord(name, len(stack), info)
+        self.records.append(record)
+        stack.append(record)
+        rss_before = peak_rss_bytes()
+        cpu_before = time.process_time()
+        start = time.perf_counter()
+        record.start = start - self.origin
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - start
+            record.cpu = time.process_time() - cpu_before
+            rss_after = peak_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                record.peak_rss_delta = rss_after - rss_before
+            stack.pop()
+
+    def durations(self):
+        """Total wall time per stage name."""
+        totals = {}
+        for record in self.records:
+            totals[record.name] = totals.get(record.name, 0.0) + record.wall
+        return totals
+
+    def summary(self):
+        lines = [f"{'stage':<36}{'wall [s]':>10}{'cpu [s]':>10}{'peak RSS +MB':>14}"]
+        for r in self.records:
+            rss = "" if r.peak_rss_delta is None else f"{r.peak_rss_delta / 1024**2:.1f}"
+            lines.append(f"{'  ' * r.depth + r.name:<36}{r.wall:>10.3f}{r.cpu:>10.3f}{rss:>14}")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        trace = {
+            "pid": os.getpid(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stages": [r.as_dict() for r in self.records],
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=2)
+
+    def write_chrome_trace(self, path):
+        pid = os.getpid()
+        events = []
+        for r in self.records:
+            events.append({
+                "name": r.name,
+                "ph": "X",
+                "ts": r.start * 1e6,
+                "dur": r.wall * 1e6,
+                "pid": pid,
+                "tid": r.thread_id,
+                "args": {"cpu": r.cpu, "peak_rss_delta": r.peak_rss_delta, "arrays": r.arrays, **r.info},
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# Process-wide profiler used by the pipeline modules
+PROFILER = Profiler()
+
+
+def stage(name, **info):
+    return PROFILER.stage(name, **info)
+
+
+def profiled(name=None):
+    """Decorator recording every call of the function as a stage of the process-wide profiler."""
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with PROFILER.stage(stage_name) as record:
+                result = fn(*args, **kwargs)
+                # Record the arrays the stage returned (a single array or a tuple of them)
+                outputs = result if isinstance(result, tuple) else (result,)
+                for i, output in enumerate(outputs):
+                    if getattr(output, "ndim", 0) > 0 and hasattr(output, "nbytes"):
+                        record.add_array(f"result[{i}]" if isinstance(result, tuple) else "result", output)
+                return result
+        return wrapper
+    return decorator
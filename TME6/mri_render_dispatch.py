@@ -0,0 +1,220 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Parallel Render Dispatcher
+======================================================================
+
+Renders the camera views of a prepared scene in several headless Blender processes
+instead of one after the other in the calling process.
+
+The scene is written once to a temporary .blend. Each worker opens it with a pinned
+thread count and renders its share of the jobs: whole cameras, or horizontal bands of one
+camera (border renders) when there are more workers than views. Whole views are written
+straight to output_path; bands are stitched back into one image per view. Every worker
+reports the wall time of each of its jobs, and dispatch_renders returns those together
+with the overall throughput.
+
+Called from the main script (render_skull with render_workers > 1). Blender runs this file
+as the worker entry point:
+
+    blender --background scene.blend --threads 8 --python mri_render_dispatch.py -- --jobs jobs.json
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Extra rows rendered above and below each band, so Blender's rounding of the border never leaves a seam
+BAND_OVERLAP = 2
+
+
+#####################################################################################################
+# Function: plan_jobs(views, workers, tiles)
+# Purpose: Split the renders into per-worker job lists. With tiles > 1 every view is cut into that many
+#          horizontal bands (fractions of the image height, bottom to top as in Blender's border).
+def plan_jobs(views, workers, tiles=1):
+    jobs = []
+    for view in views:
+        if tiles <= 1:
+            jobs.append({"view": view, "band": None})
+        else:
+            for i in range(tiles):
+                jobs.append({"view": view, "band": [i / tiles, (i + 1) / tiles], "tile": i})
+    workers = max(1, min(int(workers), len(jobs)))
+    # Round-robin keeps the tiles of one view spread over different workers
+    return [jobs[k::workers] for k in range(workers)]
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: band_rows(band, height)
+# Purpose: Pixel rows [lo, hi) of a band, counted from the bottom of the image like Blender's pixel buffer.
+def band_rows(band, height):
+    return int(round(band[0] * height)), int(round(band[1] * height))
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: render_jobs(jobs, output_path, tile_dir, threads)
+# Purpose: Worker side (inside Blender): render the assigned jobs and return their wall times.
+def render_jobs(jobs, output_path, tile_dir, threads=None):
+    import bpy
+    scene = bpy.context.scene
+    render = scene.render
+    if threads:
+        render.threads_mode = 'FIXED'
+        render.threads = threads
+    height = int(render.resolution_y * render.resolution_percentage / 100)
+
+    timings = []
+    for job in jobs:
+        scene.camera = bpy.data.objects[job["view"]]
+        if job["band"] is None:
+            render.use_border = False
+            render.filepath = output_path + job["view"]
+        else:
+            lo, hi = band_rows(job["band"], height)
+            render.use_border = True
+            render.use_crop_to_border = False
+            render.border_min_x, render.border_max_x = 0.0, 1.0
+            render.border_min_y = max(lo - BAND_OVERLAP, 0) / height
+            render.border_max_y = min(hi + BAND_OVERLAP, height) / height
+            render.filepath = os.path.join(tile_dir, f"{job['view']}.tile{job['tile']}")
+        start = time.perf_counter()
+        bpy.ops.render.render(write_still=True)
+        # write_still appends the format's extension to the file path
+        timings.append({**job, "seconds": time.perf_counter() - start, "path": render.filepath + render.file_extension})
+        print(f"Rendered {job['view']}" + ("" if job["band"] is None else f" tile {job['tile']}"),
+              f"in {timings[-1]['seconds']:.2f}s")
+    return timings
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: stitch_tiles(view, tile_jobs, output_path)
+# Purpose: Assemble the band renders of one view into output_path/<view><ext> (runs in the calling Blender).
+def stitch_tiles(view, tile_jobs, output_path):
+    import bpy
+    import numpy as np
+    images = [bpy.data.images.load(job["path"]) for job in tile_jobs]
+    width, height = images[0].size
+    channels = images[0].channels
+    pixels = np.zeros(width * height * channels, dtype=np.float32)
+    result = pixels.reshape(height, width, channels)
+    for job, image in zip(tile_jobs, images):
+        tile = np.empty(width * height * channels, dtype=np.float32)
+        image.pixels.foreach_get(tile)
+        lo, hi = band_rows(job["band"], height)
+        result[lo:hi] = tile.reshape(height, width, channels)[lo:hi]
+
+    extension = os.path.splitext(tile_jobs[0]["path"])[1]
+    stitched = bpy.data.images.new(view, width=width, height=height, alpha=channels == 4)
+    stitched.pixels.foreach_set(pixels)
+    stitched.filepath_raw = output_path + view + extension
+    stitched.file_format = images[0].file_format
+    stitched.save()
+    for image in images + [stitched]:
+        bpy.data.images.remove(image)
+    return output_path + view + extension
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: dispatch_renders(views, output_path, workers, tiles, threads, blender, keep_temp)
+# Purpose: Render `views` (camera object names of the current scene) with `workers` Blender processes,
+#          each pinned to `threads` threads (default: the CPU count shared evenly). Returns a report with
+#          per-view seconds (summed over tiles), per-worker wall times and the overall throughput.
+def dispatch_renders(views, output_path, workers=2, tiles=1, threads=None, blender=None, keep_temp=False):
+    import bpy
+    blender = blender or bpy.app.binary_path
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    temp_dir = tempfile.mkdtemp(prefix="mri_render_")
+    blend_path = os.path.join(temp_dir, "scene.blend")
+    tile_dir = os.path.join(temp_dir, "tiles")
+    os.makedirs(tile_dir)
+    os.makedirs(output_path, exist_ok=True)
+
+    start = time.perf_counter()
+    # copy=True leaves the current session's file path untouched
+    bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
+    save_seconds = time.perf_counter() - start
+
+    procs = []
+    for k, jobs in enumerate(plan_jobs(views, workers, tiles)):
+        jobs_path = os.path.join(temp_dir, f"worker{k}.json")
+        with open(jobs_path, "w") as f:
+            json.dump({"jobs": jobs, "output_path": output_path, "tile_dir": tile_dir, "threads": threads}, f)
+        command = [blender, "--background", blend_path, "--threads", str(threads), "--python-exit-code", "1",
+                   "--python", os.path.abspath(__file__), "--", "--jobs", jobs_path]
+        log = open(os.path.join(temp_dir, f"worker{k}.log"), "w")
+        procs.append((k, jobs_path, log, time.perf_counter(), subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)))
+
+    worker_seconds = {}
+    timings = []
+    failed = []
+    for k, jobs_path, log, started, proc in procs:
+        returncode = proc.wait()
+        worker_seconds[k] = time.perf_counter() - started
+        log.close()
+        if returncode != 0:
+            failed.append(log.name)
+            continue
+        with open(jobs_path.replace(".json", ".timings.json")) as f:
+            timings.extend(json.load(f))
+    if failed:
+        raise RuntimeError(f"Render workers failed, see {', '.join(failed)}")
+
+    view_seconds = {}
+    for view in views:
+        view_jobs = sorted((t for t in timings if t["view"] == view), key=lambda t: t.get("tile", 0))
+        view_seconds[view] = sum(t["seconds"] for t in view_jobs)
+        if tiles > 1:
+            stitch_tiles(view, view_jobs, output_path)
+    wall = time.perf_counter() - start
+    if not keep_temp:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        "workers": len(procs),
+        "threads": threads,
+        "tiles": tiles,
+        "save_seconds": save_seconds,
+        "worker_seconds": worker_seconds,
+        "view_seconds": view_seconds,
+        "wall_seconds": wall,
+        "views_per_second": len(views) / wall if wall > 0 else 0.0,
+    }
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: print_render_report(report, sequential_seconds)
+# Purpose: Print per-view timings and, if the sequential loop was timed too, the throughput comparison.
+def print_render_report(report, sequential_seconds=None):
+    print(f"Parallel render: {report['workers']} workers x {report['threads']} threads, {report['tiles']} tile(s) per view")
+    for view, seconds in report["view_seconds"].items():
+        sequential = "" if not sequential_seconds else f"   sequential {sequential_seconds.get(view, 0.0):8.2f}s"
+        print(f"  {view:<20}{seconds:8.2f}s render time{sequential}")
+    n_views = len(report["view_seconds"])
+    print(f"  wall {report['wall_seconds']:.2f}s (scene save {report['save_seconds']:.2f}s), "
+          f"{report['views_per_second']:.3f} views/s")
+    if sequential_seconds:
+        total = sum(sequential_seconds.values())
+        print(f"  sequential loop {total:.2f}s, {n_views / total:.3f} views/s -> speed-up x{total / report['wall_seconds']:.2f}")
+#####################################################################################################
+
+
+if __name__ == "__main__":
+    # Worker entry point: blender --background scene.blend --python mri_render_dispatch.py -- --jobs jobs.json
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", required=True)
+    args = parser.parse_args(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
+    with open(args.jobs) as f:
+        spec = json.load(f)
+    result = render_jobs(spec["jobs"], spec["output_path"], spec["tile_dir"], threads=spec["threads"])
+    with open(args.jobs.replace(".json", ".timings.json"), "w") as f:
+        json.dump(result, f)
@@ -0,0 +1,177 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Render Quality Presets
+======================================================================
+
+Named Cycles quality profiles for the skull renders, so a render's cost is chosen instead
+of inherited from Blender's defaults:
+
+    draft        quick previews, quarter resolution, few samples
+    review       checks of a whole batch
+    publication  final figures, no time limit
+
+Every preset sets samples, the adaptive-sampling noise threshold, a per-view time limit,
+the denoiser, light-path bounces and the resolution scale. "auto" renders two short
+calibration frames, fits render time as (fixed cost + cost per sample), and picks the
+best preset predicted to fit a per-view wall-clock budget, with the budget itself as
+Cycles' time limit so a bad prediction cannot overrun it.
+"""
+
+import time
+
+RENDER_PRESETS = {
+    "draft": {
+        "samples": 16,
+        "adaptive_threshold": 0.1,
+        "time_limit": 10.0,
+        "denoiser": "OPENIMAGEDENOISE",
+        "max_bounces": 2,
+        "diffuse_bounces": 1,
+        "glossy_bounces": 1,
+        "transmission_bounces": 2,
+        "resolution_percentage": 25,
+    },
+    "review": {
+        "samples": 64,
+        "adaptive_threshold": 0.05,
+        "time_limit": 60.0,
+        "denoiser": "OPENIMAGEDENOISE",
+        "max_bounces": 4,
+        "diffuse_bounces": 2,
+        "glossy_bounces": 2,
+        "transmission_bounces": 4,
+        "resolution_percentage": 50,
+    },
+    "publication": {
+        "samples": 512,
+        "adaptive_threshold": 0.01,
+        "time_limit": 0.0,  # no limit
+        "denoiser": "OPENIMAGEDENOISE",
+        "max_bounces": 12,
+        "diffuse_bounces": 4,
+        "glossy_bounces": 4,
+        "transmission_bounces": 12,
+        "resolution_percentage": 100,
+    },
+}
+
+# Preset order from cheapest to best, used by the auto mode
+PRESET_ORDER = ("draft", "review", "publication")
+
+
+#####################################################################################################
+# Function: apply_render_preset(scene, preset)
+# Purpose: Apply a preset (name or settings dict) to a Cycles scene.
+def apply_render_preset(scene, preset):
+    settings = RENDER_PRESETS[preset] if isinstance(preset, str) else preset
+    cycles = scene.cycles
+    cycles.samples = settings["samples"]
+    cycles.use_adaptive_sampling = settings["adaptive_threshold"] > 0
+    cycles.adaptive_threshold = settings["adaptive_threshold"]
+    cycles.time_limit = settings["time_limit"]
+    cycles.max_bounces = settings["max_bounces"]
+    cycles.diffuse_bounces = settings["diffuse_bounces"]
+    cycles.glossy_bounces = settings["glossy_bounces"]
+    cycles.transmission_bounces = settings["transmission_bounces"]
+    cycles.use_denoising = bool(settings["denoiser"])
+    if settings["denoiser"]:
+        try:
+            cycles.denoiser = settings["denoiser"]
+        except TypeError:
+            # Build without OpenImageDenoise: render without denoising rather than fail
+            print(f"Denoiser {settings['denoiser']} not available, denoising disabled")
+            cycles.use_denoising = False
+    scene.render.resolution_percentage = settings["resolution_percentage"]
+    return settings
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: predict_seconds(settings, calibration)
+# Purpose: Predicted render time of a preset from a calibration fit (fixed seconds + seconds per
+#          sample and per pixel at the calibration resolution). Adaptive sampling only makes it faster.
+def predict_seconds(settings, calibration):
+    pixel_scale = (settings["resolution_percentage"] / calibration["resolution_percentage"]) ** 2
+    return calibration["fixed_seconds"] + calibration["seconds_per_sample"] * settings["samples"] * pixel_scale
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: calibrate(scene, camera, samples, resolution_percentage)
+# Purpose: Render two short frames (samples[0] and samples[1], no denoising, no adaptive sampling) and fit
+#          render time = fixed_seconds + seconds_per_sample * samples. Nothing is written to disk.
+def calibrate(scene, camera=None, samples=(4, 16), resolution_percentage=25):
+    import bpy
+    if camera is not None:
+        scene.camera = camera
+    settings = dict(RENDER_PRESETS["draft"], adaptive_threshold=0.0, time_limit=0.0, denoiser=None,
+                    resolution_percentage=resolution_percentage)
+    timings = []
+    for n in samples:
+        apply_render_preset(scene, dict(settings, samples=n))
+        start = time.perf_counter()
+        bpy.ops.render.render(write_still=False)
+        timings.append(time.perf_counter() - start)
+    # The first render also pays for scene sync and BVH build; both frames share them after that,
+    # so clamp the slope to stay positive if timer noise dominates
+    seconds_per_sample = max((timings[1] - timings[0]) / (samples[1] - samples[0]), 1e-6)
+    fixed_seconds = max(timings[1] - seconds_per_sample * samples[1], 0.0)
+    calibration = {
+        "samples": list(samples),
+        "seconds": timings,
+        "resolution_percentage": resolution_percentage,
+        "seconds_per_sample": seconds_per_sample,
+        "fixed_seconds": fixed_seconds,
+    }
+    print(f"Calibration: {fixed_seconds:.2f}s fixed + {seconds_per_sample * 1000:.1f}ms/sample "
+          f"at {resolution_percentage}% resolution")
+    return calibration
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: auto_settings(calibration, view_budget)
+# Purpose: Best preset predicted to fit view_budget [s]; if even draft does not fit, draft with its samples
+#          scaled down. The budget becomes the time limit in every case.
+def auto_settings(calibration, view_budget):
+    chosen = None
+    for name in PRESET_ORDER:
+        settings = RENDER_PRESETS[name]
+        if predict_seconds(settings, calibration) <= view_budget:
+            chosen = name
+    if chosen is not None:
+        settings = dict(RENDER_PRESETS[chosen])
+    else:
+        chosen = "draft"
+        settings = dict(RENDER_PRESETS["draft"])
+        pixel_scale = (settings["resolution_percentage"] / calibration["resolution_percentage"]) ** 2
+        affordable = (view_budget - calibration["fixed_seconds"]) / (calibration["seconds_per_sample"] * pixel_scale)
+        settings["samples"] = max(1, int(affordable))
+    settings["time_limit"] = float(view_budget)
+    settings["preset"] = chosen
+    settings["predicted_seconds"] = predict_seconds(settings, calibration)
+    return settings
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: configure_render_quality(scene, quality, view_budget, camera)
+# Purpose: Apply a named preset, or with quality="auto" calibrate on `camera` and apply the settings that fit
+#          view_budget seconds per view. Returns the applied settings.
+def configure_render_quality(scene, quality="review", view_budget=None, camera=None):
+    if quality == "auto":
+        if not view_budget:
+            raise ValueError("quality='auto' needs a per-view budget in seconds")
+        settings = auto_settings(calibrate(scene, camera), view_budget)
+        print(f"Auto quality: {settings['preset']} with {settings['samples']} samples, "
+              f"predicted {settings['predicted_seconds']:.1f}s per view (budget {view_budget:.1f}s)")
+    elif quality in RENDER_PRESETS:
+        settings = dict(RENDER_PRESETS[quality])
+        if view_budget:
+            settings["time_limit"] = float(view_budget)
+        print(f"Render quality: {quality}")
+    else:
+        raise ValueError(f"Unknown render quality {quality!r}, expected one of {list(RENDER_PRESETS)} or 'auto'")
+    apply_render_preset(scene, settings)
+    return settings
+#####################################################################################################
@@ -0,0 +1,98 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Slab Streaming Preprocessing
+======================================================================
+
+Out-of-core versions of filter_volume and close_mask. The volume is processed in Z-slabs
+extended by a halo that covers the operator's reach (the Gaussian kernel radius, or twice
+the structuring-element radius for a closing), and only the slab interior is written to the
+output, which can be a memory-mapped .npy. Interior voxels see exactly the same
+neighbourhood as in the in-memory path, and slabs on the volume border see the same border,
+so the results are identical while peak memory is bounded by the slab size.
+
+Inversion is done per slab in float32, so no full-size inverted or float64 copy is created.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+#####################################################################################################
+# Function: gaussian_halo(sigma, truncate)
+# Purpose: Number of voxels scipy's gaussian_filter reaches on each side (its kernel radius).
+def gaussian_halo(sigma, truncate=4.0):
+    return int(truncate * float(sigma) + 0.5)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: open_output(out, shape, dtype)
+# Purpose: Resolve an output argument: an existing array, a path to a new memory-mapped .npy, or None (in memory).
+def open_output(out, shape, dtype):
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+    if out.shape != tuple(shape) or out.dtype != np.dtype(dtype):
+        raise ValueError(f"out must have shape {tuple(shape)} and dtype {np.dtype(dtype)}")
+    return out
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: process_slabs(source, out, slab_fn, halo, slab_depth, workers)
+# Purpose: Apply slab_fn to Z-slabs of `source` extended by `halo` slices and store the slab interiors in `out`.
+def process_slabs(source, out, slab_fn, halo, slab_depth=32, workers=1):
+    depth = source.shape[0]
+    slab_depth = max(int(slab_depth), 1)
+
+    def run(z0):
+        z1 = min(z0 + slab_depth, depth)
+        lo = max(z0 - halo, 0)
+        hi = min(z1 + halo, depth)
+        result = slab_fn(np.asarray(source[lo:hi]))
+        out[z0:z1] = result[z0 - lo:z1 - lo]
+
+    starts = range(0, depth, slab_depth)
+    if workers and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, starts))
+    else:
+        for z0 in starts:
+            run(z0)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: slab_filter_volume(volume_data, sigma, slab_depth, out, workers)
+# Purpose: Slab-streamed equivalent of mri_surface.filter_volume (inversion + Gaussian filter) in float32.
+def slab_filter_volume(volume_data, sigma=0.7, slab_depth=32, out=None, workers=1):
+    import scipy.ndimage
+    out = open_output(out, volume_data.shape, np.float32)
+
+    def invert_and_filter(slab):
+        inv_slab = np.subtract(1.0, slab, dtype=np.float32)
+        return scipy.ndimage.gaussian_filter(inv_slab, sigma=sigma)
+
+    return process_slabs(volume_data, out, invert_and_filter, gaussian_halo(sigma), slab_depth, workers)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: slab_close_mask(filtered_data, threshold, ball_radius, slab_depth, out, workers)
+# Purpose: Slab-streamed equivalent of mri_surface.close_mask (threshold + binary closing).
+def slab_close_mask(filtered_data, threshold=0.65, ball_radius=1, slab_depth=32, out=None, workers=1):
+    from skimage import morphology
+    out = open_output(out, filtered_data.shape, bool)
+    structuring_element = morphology.ball(ball_radius)
+
+    def threshold_and_close(slab):
+        return morphology.binary_closing(slab > threshold, structuring_element)
+
+    # Dilation then erosion: each reaches ball_radius slices, so the closing reaches twice that
+    return process_slabs(filtered_data, out, threshold_and_close, 2 * ball_radius, slab_depth, workers)
+#####################################################################################################
@@ -0,0 +1,171 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Sparse Brick Processing
+======================================================================
+
+Runs the filter, threshold, closing and marching-cubes stages only where the skull mask
+can change, instead of over the whole dense box.
+
+A cheap low-resolution pass takes the min and max of every fixed-size brick. Because the
+Gaussian filter is a weighted mean of the voxels within its kernel radius, and the closing
+only adds voxels within the ball radius of the thresholded set, a brick can be classified
+from the min/max of its neighbouring bricks alone:
+
+    empty   no voxel within reach can exceed the threshold -> mask stays False
+    full    every voxel within the kernel radius exceeds it -> mask is True
+    active  anything else -> computed
+
+Active bricks are processed in boxes (runs along X merged along Y), each extended by the
+same halo as the slab path (kernel radius plus twice the ball radius), so their interiors
+are bitwise equal to dense processing. Marching cubes then runs on the blocks of the active bricks and their
+neighbours only (mri_chunked), as a full or empty region produces no surface.
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from mri_chunked import block_slices
+from mri_profile import profiled
+from mri_slab import gaussian_halo, open_output
+
+# Margin on the threshold tests, so float32 rounding in the filter can never flip a classification
+CLASSIFY_EPS = 1e-4
+
+
+#####################################################################################################
+# Function: brick_minmax(volume, brick)
+# Purpose: Per-brick min and max of a volume (the low-resolution pass); edge bricks are padded by replication.
+def brick_minmax(volume, brick):
+    pad = [(0, -n % brick) for n in volume.shape]
+    data = np.pad(volume, pad, mode='edge') if any(p for _, p in pad) else np.asarray(volume)
+    nz, ny, nx = (n // brick for n in data.shape)
+    bricks = data.reshape(nz, brick, ny, brick, nx, brick)
+    return bricks.min(axis=(1, 3, 5)), bricks.max(axis=(1, 3, 5))
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: classify_bricks(volume_data, threshold, sigma, ball_radius, brick)
+# Purpose: Split the bricks into full (mask certainly True), active (to compute) and empty (the rest).
+def classify_bricks(volume_data, threshold=0.65, sigma=0.7, ball_radius=1, brick=16):
+    import scipy.ndimage
+    vmin, vmax = brick_minmax(volume_data, brick)
+    # The pipeline thresholds the inverted volume 1 - v
+    inv_max = 1.0 - vmin
+    inv_min = 1.0 - vmax
+    reach_filter = math.ceil(gaussian_halo(sigma) / brick)
+    reach_mask = math.ceil((gaussian_halo(sigma) + ball_radius) / brick)
+    may_be_true = scipy.ndimage.maximum_filter(inv_max > threshold - CLASSIFY_EPS, size=2 * reach_mask + 1,
+                                               mode='constant', cval=False)
+    may_be_false = scipy.ndimage.maximum_filter(inv_min <= threshold + CLASSIFY_EPS, size=2 * reach_filter + 1,
+                                                mode='constant', cval=False)
+    return {
+        "brick": brick,
+        "full": ~may_be_false,
+        "active": may_be_true & may_be_false,
+    }
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: active_boxes(active)
+# Purpose: Cover the active bricks with boxes (bz, by0, by1, bx0, bx1): runs of consecutive active bricks along X,
+#          merged along Y while the run is the same, so fewer halos are computed.
+def active_boxes(active):
+    boxes = []
+    for bz in np.flatnonzero(active.any(axis=(1, 2))):
+        open_runs = {}
+        for by in range(active.shape[1]):
+            row = np.concatenate([[False], active[bz, by], [False]])
+            edges = np.flatnonzero(np.diff(row.astype(np.int8)))
+            runs = set(zip(edges[::2].tolist(), edges[1::2].tolist()))
+            for run in list(open_runs):
+                if run not in runs:
+                    boxes.append((bz, open_runs.pop(run), by) + run)
+            for run in runs:
+                open_runs.setdefault(run, by)
+        boxes.extend((bz, by0, active.shape[1]) + run for run, by0 in open_runs.items())
+    return boxes
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: expand_bricks(flags, brick, shape)
+# Purpose: Voxel-resolution view of a brick flag grid, cut to the volume shape.
+def expand_bricks(flags, brick, shape):
+    voxels = flags.repeat(brick, axis=0).repeat(brick, axis=1).repeat(brick, axis=2)
+    return voxels[:shape[0], :shape[1], :shape[2]]
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: sparse_close_mask(volume_data, threshold, sigma, ball_radius, brick, out, workers)
+# Purpose: Closed skull mask (filter_volume + close_mask) computed on active bricks only.
+#          Returns (mask, info) where info holds the brick classification, the marching-cubes blocks
+#          that can contain the surface, the tight bounding box and the voxel-work counts.
+@profiled("sparse_close_mask")
+def sparse_close_mask(volume_data, threshold=0.65, sigma=0.7, ball_radius=1, brick=16, out=None, workers=1):
+    import scipy.ndimage
+    from skimage import morphology
+    shape = volume_data.shape
+    bricks = classify_bricks(volume_data, threshold=threshold, sigma=sigma, ball_radius=ball_radius, brick=brick)
+    active = bricks["active"]
+    mask = open_output(out, shape, bool)
+    mask[...] = expand_bricks(bricks["full"], brick, shape)
+
+    halo = gaussian_halo(sigma) + 2 * ball_radius
+    structuring_element = morphology.ball(ball_radius)
+    work = []
+
+    def run(box):
+        bz, by0, by1, bx0, bx1 = box
+        lo = (bz * brick, by0 * brick, bx0 * brick)
+        hi = tuple(min(l + n * brick, size) for l, n, size in zip(lo, (1, by1 - by0, bx1 - bx0), shape))
+        crop_lo = tuple(max(l - halo, 0) for l in lo)
+        crop_hi = tuple(min(h + halo, size) for h, size in zip(hi, shape))
+        crop = np.asarray(volume_data[tuple(slice(a, b) for a, b in zip(crop_lo, crop_hi))])
+        filtered = scipy.ndimage.gaussian_filter(1.0 - crop, sigma=sigma)
+        closed = morphology.binary_closing(filtered > threshold, structuring_element)
+        interior = tuple(slice(l - cl, h - cl) for l, h, cl in zip(lo, hi, crop_lo))
+        mask[tuple(slice(l, h) for l, h in zip(lo, hi))] = closed[interior]
+        work.append(crop.size)
+
+    boxes = active_boxes(active)
+    if workers and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, boxes))
+    else:
+        for box in boxes:
+            run(box)
+    if isinstance(mask, np.memmap):
+        mask.flush()
+
+    # A marching-cubes block also reads the first layer of its +X/+Y/+Z neighbours, so the blocks next to
+    # active bricks can hold surface as well; full and empty bricks never touch (their reaches overlap)
+    surface = scipy.ndimage.binary_dilation(active, structure=np.ones((3, 3, 3), bool))
+    blocks = [b for b in block_slices(shape, brick) if surface[tuple(s.start // brick for s in b)]]
+    if surface.any():
+        idx = np.nonzero(surface)
+        bbox = [(int(i.min()) * brick, min((int(i.max()) + 1) * brick, n)) for i, n in zip(idx, shape)]
+    else:
+        bbox = None
+
+    total = int(np.prod(shape))
+    info = {
+        "brick": brick,
+        "bricks": int(active.size),
+        "active_bricks": int(active.sum()),
+        "full_bricks": int(bricks["full"].sum()),
+        "boxes": len(boxes),
+        "blocks": blocks,
+        "bbox": bbox,
+        "dense_voxels": total,
+        "filter_voxels": int(sum(work)),
+        "surface_voxels": int(sum(np.prod([s.stop - s.start for s in b]) for b in blocks)),
+    }
+    print(f"Sparse bricks ({brick}^3): {info['active_bricks']} active, {info['full_bricks']} full of {info['bricks']}; "
+          f"filter/closing on {100 * info['filter_voxels'] / total:.1f}% of the voxels, "
+          f"marching cubes on {100 * info['surface_voxels'] / total:.1f}%, bbox {bbox}")
+    return mask, info
+#####################################################################################################
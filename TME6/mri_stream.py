@@ -0,0 +1,328 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Streaming Slice Ingestion
+======================================================================
+
+Builds the skull mask and surface while the slices of a scan are still arriving, so the
+final mesh is ready one slab after the last slice instead of one full pipeline later.
+
+Pages are appended as they come (decimated like load_tiff_volume) and the running min and
+max are updated from every page, kept or skipped, as load_tiff_volume does by default. Normalization is never applied to the stored data:
+the Gaussian filter is linear and preserves constants, so for the normalized volume
+
+    gaussian(1 - (v - min) / (max - min)) > threshold
+        <=>  gaussian(v) < min + (1 - threshold) * (max - min)
+
+and the filtered raw slices stay valid when min or max change; only the cutoff moves.
+Each update then recomputes
+
+    filter    the new slices plus the last `halo` slices (their Z border was the old end)
+    mask      the Z-slices whose thresholded values changed, plus twice the ball radius
+    surface   the Z-bands of marching-cubes cells that touch a changed mask slice
+
+Band meshes are kept and welded (mri_chunked) into a preview whenever one is asked for.
+A new global min or max moves the cutoff for the whole volume, which may change the mask
+far from the new slices; that is detected by comparing thresholds, so the result matches
+dense processing up to float rounding (the raw values are filtered here, the normalized
+ones in the dense path, so a voxel right at the cutoff may land on the other side), but
+such an update costs more than one slab.
+"""
+
+import glob
+import os
+import time
+import numpy as np
+
+from mri_chunked import weld_vertices
+from mri_profile import profiled, stage
+from mri_slab import gaussian_halo
+
+
+#####################################################################################################
+# Function: dirty_runs(flags, reach, limit)
+# Purpose: Runs [start, stop) of True entries of a per-slice flag array, each extended by `reach` slices on
+#          both sides (clipped to [0, limit)) and merged where they overlap.
+def dirty_runs(flags, reach, limit):
+    runs = []
+    for z in np.flatnonzero(flags):
+        lo, hi = max(int(z) - reach, 0), min(int(z) + 1 + reach, limit)
+        if runs and lo <= runs[-1][1]:
+            runs[-1][1] = max(runs[-1][1], hi)
+        else:
+            runs.append([lo, hi])
+    return [tuple(r) for r in runs]
+#####################################################################################################
+
+
+class StreamingVolume:
+    """
+    Incremental filter_volume + close_mask + marching_cubes_mesh over a growing Z-stack.
+
+        stream = StreamingVolume(downsample=2, threshold=0.65)
+        for pages in source:
+            stream.add_slices(pages)
+            if stream.depth % 32 == 0:
+                verts, faces, normals = stream.mesh()   # preview of what has arrived
+        verts, faces, normals = stream.mesh()           # final
+    """
+
+    def __init__(self, downsample=1, threshold=0.65, sigma=0.7, ball_radius=1, band=16, expected_depth=None):
+        self.step = max(int(downsample), 1)
+        self.threshold = threshold
+        self.sigma = sigma
+        self.ball_radius = ball_radius
+        self.band = max(int(band), 1)
+        self.halo = gaussian_halo(sigma)
+        self.pages_seen = 0
+        self.depth = 0
+        self.min_val = np.inf
+        self.max_val = -np.inf
+        self._capacity = 0
+        self._expected = -(-int(expected_depth) // self.step) if expected_depth else None
+        self._cutoff = None
+        self._bands = {}
+        self._ball = None
+        self.stats = {"updates": 0, "filtered_slices": 0, "closed_slices": 0, "meshed_bands": 0}
+
+    # Views of the slices received so far
+    @property
+    def raw(self):
+        return self._raw[:self.depth]
+
+    @property
+    def filtered(self):
+        """Gaussian of the raw slices (not inverted nor normalized)."""
+        return self._filtered[:self.depth]
+
+    @property
+    def mask(self):
+        """Closed skull mask, close_mask(filter_volume(normalized volume)) up to float rounding at the cutoff."""
+        return self._closed[:self.depth]
+
+    def _reserve(self, depth, plane):
+        if depth <= self._capacity:
+            return
+        # Grow geometrically, or straight to the expected depth when the scanner announced it
+        capacity = max(depth, 2 * self._capacity, self._expected or 0, 16)
+        for name, dtype in (("_raw", np.float32), ("_filtered", np.float32), ("_binary", bool), ("_closed", bool)):
+            grown = np.empty((capacity,) + plane, dtype=dtype)
+            if self._capacity:
+                grown[:self.depth] = getattr(self, name)[:self.depth]
+            setattr(self, name, grown)
+        self._capacity = capacity
+
+    def cutoff(self):
+        """Raw-intensity cutoff of the threshold under the current min/max (None while the range is empty)."""
+        if not self.max_val > self.min_val:
+            return None
+        return np.float32(self.min_val + (1.0 - self.threshold) * (self.max_val - self.min_val))
+
+    def _threshold(self, lo, hi):
+        if self._cutoff is None:
+            # Constant volume: normalization gives 0 everywhere, so the inverted value is 1
+            return np.full((hi - lo,) + self._binary.shape[1:], 1.0 > self.threshold)
+        return self._filtered[lo:hi] < self._cutoff
+
+    #################################################################################################
+    # Method: add_slices(pages)
+    # Purpose: Append raw pages (2D arrays, in scan order) and bring the mask and the band meshes up to date.
+    #          Returns the number of slices kept.
+    @profiled("stream_update")
+    def add_slices(self, pages):
+        import scipy.ndimage
+        from skimage import morphology
+        if self._ball is None:
+            self._ball = morphology.ball(self.ball_radius)
+        old_depth = self.depth
+        kept = []
+        for page in pages:
+            page = np.asarray(page)
+            if self.pages_seen % self.step == 0:
+                kept.append(page[::self.step, ::self.step])
+            if self.step > 1:
+                # The range covers the skipped samples too (exact_range in load_tiff_volume)
+                self.min_val = min(self.min_val, float(page.min()))
+                self.max_val = max(self.max_val, float(page.max()))
+            self.pages_seen += 1
+        if not kept and (not old_depth or self.cutoff() == self._cutoff):
+            return 0
+        if kept:
+            self._reserve(old_depth + len(kept), kept[0].shape)
+        for z, page in enumerate(kept, old_depth):
+            self._raw[z] = page
+            self.min_val = min(self.min_val, float(self._raw[z].min()))
+            self.max_val = max(self.max_val, float(self._raw[z].max()))
+        depth = self.depth = old_depth + len(kept)
+
+        # Filter the new slices and the old ones whose reflected Z border moved (nothing if only skipped pages
+        # came and moved the range)
+        f_lo = max(old_depth - self.halo, 0) if kept else depth
+        with stage("stream_filter", slices=depth - f_lo):
+            src_lo = max(f_lo - self.halo, 0)
+            result = scipy.ndimage.gaussian_filter(self._raw[src_lo:depth], sigma=self.sigma)
+            self._filtered[f_lo:depth] = result[f_lo - src_lo:]
+
+        # Threshold: everywhere if the cutoff moved, else only the refiltered slices
+        cutoff = self.cutoff()
+        t_lo = 0 if cutoff != self._cutoff else f_lo
+        self._cutoff = cutoff
+        binary = self._threshold(t_lo, depth)
+        changed = np.zeros(depth, dtype=bool)
+        changed[old_depth:] = True
+        if old_depth > t_lo:
+            changed[t_lo:old_depth] = (binary[:old_depth - t_lo] != self._binary[t_lo:old_depth]).any(axis=(1, 2))
+        self._binary[t_lo:depth] = binary
+
+        # Closing: dilation then erosion each reach ball_radius slices; the old last slices also saw the end border
+        reach = 2 * self.ball_radius
+        changed[max(old_depth - reach, 0):old_depth] = True
+        closed_changed = np.zeros(depth, dtype=bool)
+        with stage("stream_close") as s:
+            for lo, hi in dirty_runs(changed, reach, depth):
+                src_lo, src_hi = max(lo - reach, 0), min(hi + reach, depth)
+                closed = morphology.binary_closing(self._binary[src_lo:src_hi], self._ball)[lo - src_lo:hi - src_lo]
+                diff = (closed != self._closed[lo:hi]).any(axis=(1, 2)) if lo < old_depth else np.ones(hi - lo, bool)
+                diff[max(old_depth - lo, 0):] = True
+                closed_changed[lo:hi] = diff
+                self._closed[lo:hi] = closed
+                self.stats["closed_slices"] += hi - lo
+            s.info["slices"] = int(closed_changed.sum())
+
+        # Cells z-1 and z read mask slice z; the band that held the old last cell has new cells now
+        touched = {z // self.band for z in np.flatnonzero(closed_changed)}
+        touched |= {max(z - 1, 0) // self.band for z in np.flatnonzero(closed_changed)}
+        touched.add(max(old_depth - 2, 0) // self.band)
+        for b in touched:
+            self._bands.pop(b, None)
+
+        self.stats["updates"] += 1
+        self.stats["filtered_slices"] += depth - f_lo
+        return len(kept)
+
+    def _band_mesh(self, b):
+        # Cells [z0, z1) of band b need mask slices z0 .. z1 (the last one shared with the next band)
+        from skimage import measure
+        z0 = b * self.band
+        z1 = min(z0 + self.band, self.depth - 1)
+        data = self._closed[z0:z1 + 1]
+        if z1 <= z0 or not data.any() or data.all():
+            return None
+        verts, faces, normals, _ = measure.marching_cubes(data, level=0.5)
+        verts = verts.astype(np.float64)
+        verts[:, 0] += z0
+        return verts, faces, normals
+
+    #################################################################################################
+    # Method: mesh()
+    # Purpose: Surface of the slices received so far (verts, faces, normals), in the same voxel coordinates
+    #          and orientation as marching_cubes_mesh; bands that did not change are reused.
+    @profiled("stream_mesh")
+    def mesh(self):
+        n_bands = -(-(self.depth - 1) // self.band)
+        for b in range(n_bands):
+            if b not in self._bands:
+                self._bands[b] = self._band_mesh(b)
+                self.stats["meshed_bands"] += 1
+        parts = [self._bands[b] for b in range(n_bands) if self._bands.get(b) is not None]
+        if not parts:
+            return (np.zeros((0, 3), np.float32), np.zeros((0, 3), np.int32), np.zeros((0, 3), np.float32))
+        offsets = np.cumsum([0] + [len(p[0]) for p in parts[:-1]])
+        verts, faces, normals = weld_vertices(np.concatenate([p[0] for p in parts]),
+                                              np.concatenate([p[1] + o for p, o in zip(parts, offsets)]),
+                                              np.concatenate([p[2] for p in parts]), self.mask.shape)
+        verts[:, 2] = -verts[:, 2]
+        normals[:, 2] = -normals[:, 2]
+        return verts, faces, normals
+
+    def normalized(self):
+        """Normalized copy of the volume received so far (what load_tiff_volume would return)."""
+        volume = self.raw.copy()
+        if self.max_val > self.min_val:
+            volume -= np.float32(self.min_val)
+            volume /= np.float32(self.max_val) - np.float32(self.min_val)
+        else:
+            volume.fill(0.0)
+        return volume
+
+
+#####################################################################################################
+# Function: tiff_page_batches(file_path, batch)
+# Purpose: Yield the pages of a TIFF stack `batch` at a time, e.g. to replay a finished scan as a stream.
+def tiff_page_batches(file_path, batch=1):
+    import tifffile
+    with tifffile.TiffFile(file_path) as tif:
+        for start in range(0, len(tif.pages), batch):
+            yield [tif.pages[z].asarray() for z in range(start, min(start + batch, len(tif.pages)))]
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: watch_slice_files(directory, pattern, expected, poll, timeout)
+# Purpose: Yield lists of slice images as the scanner export writes them (one 2D TIFF per slice, in file-name
+#          order). A file is read once the next one exists, or when it is the `expected`-th; stops after
+#          `expected` slices or when nothing new arrives for `timeout` seconds.
+def watch_slice_files(directory, pattern="*.tif", expected=None, poll=0.5, timeout=60.0):
+    import tifffile
+    done = 0
+    last_arrival = time.monotonic()
+    while expected is None or done < expected:
+        names = sorted(glob.glob(os.path.join(directory, pattern)))
+        # The newest file may still be written, unless it completes the stack
+        ready = names[done:] if expected is not None and len(names) >= expected else names[done:-1]
+        if ready:
+            yield [tifffile.imread(name) for name in ready]
+            done += len(ready)
+            last_arrival = time.monotonic()
+        elif time.monotonic() - last_arrival > timeout:
+            remaining = names[done:]
+            if remaining:
+                yield [tifffile.imread(name) for name in remaining]
+            return
+        else:
+            time.sleep(poll)
+#####################################################################################################
+
+
+if __name__ == "__main__":
+    # Replay a TIFF (or follow a folder of slice files) and write preview meshes as they become available:
+    #   python mri_stream.py --input t1-rendering.tif --batch 8 --preview-every 32 --output previews/
+    import argparse
+    from mri_export import export_mesh
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True, help="TIFF stack to replay, or folder of slice files to follow")
+    parser.add_argument("--output", required=True, help="Folder for the preview and final meshes")
+    parser.add_argument("--downsample", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    parser.add_argument("--batch", type=int, default=8, help="Pages per update when replaying a TIFF")
+    parser.add_argument("--preview-every", type=int, default=32, help="Kept slices between preview meshes")
+    parser.add_argument("--expected", type=int, default=None, help="Number of slice files in the scan")
+    parser.add_argument("--format", default="npz", choices=["npz", "ply", "glb"])
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    if os.path.isdir(args.input):
+        source = watch_slice_files(args.input, expected=args.expected)
+    else:
+        source = tiff_page_batches(args.input, batch=args.batch)
+    stream = StreamingVolume(downsample=args.downsample, threshold=args.threshold, expected_depth=args.expected)
+    next_preview = args.preview_every
+    last_update = 0.0
+    for pages in source:
+        start = time.perf_counter()
+        stream.add_slices(pages)
+        last_update = time.perf_counter() - start
+        if stream.depth >= next_preview:
+            verts, faces, normals = stream.mesh()
+            path = os.path.join(args.output, f"preview_{stream.depth:04d}.{args.format}")
+            export_mesh(path, verts, faces, normals)
+            next_preview = stream.depth + args.preview_every
+            print(f"{stream.depth} slices: preview {len(faces)} triangles -> {path}")
+    start = time.perf_counter()
+    verts, faces, normals = stream.mesh()
+    final_mesh = time.perf_counter() - start
+    path = os.path.join(args.output, f"skull.{args.format}")
+    export_mesh(path, verts, faces, normals)
+    print(f"Final: {stream.depth} slices, {len(faces)} triangles -> {path} "
+          f"({last_update + final_mesh:.3f}s after the last slice)")
+#####################################################################################################
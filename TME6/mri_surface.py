@@ -0,0 +1,105 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Surface Stages
+======================================================================
+
+The numpy side of extract_skull_surface_improved, split into stages so they can be
+cached, swept and benchmarked without Blender:
+
+    volume -> filter_volume -> close_mask [-> isolate_components] -> marching_cubes_mesh
+
+scipy and scikit-image are imported inside the stages, so importing this module is cheap.
+"""
+
+import numpy as np
+
+from mri_profile import profiled
+
+
+#####################################################################################################
+# Function: filter_volume(volume_data, sigma, slab_depth, out, workers)
+# Purpose: Invert the normalized volume (bone is dark in T1) and smooth it with a Gaussian filter.
+#          With slab_depth set, the volume is streamed in Z-slabs into `out` (see mri_slab).
+@profiled("filter_volume")
+def filter_volume(volume_data, sigma=0.7, slab_depth=None, out=None, workers=None):
+    if slab_depth:
+        from mri_slab import slab_filter_volume
+        return slab_filter_volume(volume_data, sigma=sigma, slab_depth=slab_depth, out=out, workers=workers)
+    import scipy.ndimage
+    inv_data = 1.0 - volume_data
+    return scipy.ndimage.gaussian_filter(inv_data, sigma=sigma)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: close_mask(filtered_data, threshold, ball_radius, slab_depth, out, workers)
+# Purpose: Threshold the filtered volume and fill small holes with a binary closing.
+#          With slab_depth set, the volume is streamed in Z-slabs into `out` (see mri_slab).
+@profiled("close_mask")
+def close_mask(filtered_data, threshold=0.65, ball_radius=1, slab_depth=None, out=None, workers=None):
+    if slab_depth:
+        from mri_slab import slab_close_mask
+        return slab_close_mask(filtered_data, threshold=threshold, ball_radius=ball_radius,
+                               slab_depth=slab_depth, out=out, workers=workers)
+    from skimage import morphology
+    binary_data = filtered_data > threshold
+    structuring_element = morphology.ball(ball_radius)
+    return morphology.binary_closing(binary_data, structuring_element)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: isolate_components(closed_data, keep_largest, min_voxels, connectivity, margin)
+# Purpose: Drop the small disconnected blobs (noise outside the head) from the closed mask. Keeps the
+#          `keep_largest` biggest components and/or those with at least `min_voxels` voxels, and crops
+#          the result to their bounding box plus `margin` empty voxels so marching cubes sees the same
+#          surface. Returns (cropped mask, offset of the crop in the full volume).
+@profiled("isolate_components")
+def isolate_components(closed_data, keep_largest=1, min_voxels=None, connectivity=3, margin=1):
+    import scipy.ndimage
+    structure = scipy.ndimage.generate_binary_structure(3, connectivity)
+    labels, n_labels = scipy.ndimage.label(closed_data, structure=structure)
+    if n_labels == 0:
+        raise ValueError("The closed mask is empty")
+    sizes = np.bincount(labels.ravel(), minlength=n_labels + 1)
+    sizes[0] = 0
+    keep = np.zeros(n_labels + 1, dtype=bool)
+    if keep_largest:
+        keep[np.argsort(sizes)[::-1][:keep_largest]] = True
+    if min_voxels:
+        keep |= sizes >= min_voxels
+    keep[0] = False
+
+    objects = scipy.ndimage.find_objects(labels)
+    kept = [objects[i - 1] for i in np.flatnonzero(keep)]
+    lo = [max(min(sl[d].start for sl in kept) - margin, 0) for d in range(3)]
+    hi = [min(max(sl[d].stop for sl in kept) + margin, n) for d, n in enumerate(closed_data.shape)]
+    crop = tuple(slice(a, b) for a, b in zip(lo, hi))
+    print(f"Kept {int(keep.sum())} of {n_labels} components ({int(sizes[keep].sum())} of {int(sizes.sum())} voxels), "
+          f"crop {[b - a for a, b in zip(lo, hi)]} of {list(closed_data.shape)}")
+    return keep[labels[crop]], np.array(lo)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: marching_cubes_mesh(closed_data, level, block_size, workers, offset, blocks)
+# Purpose: Run marching cubes on the closed mask; Z is flipped so the face ends up in front.
+#          With block_size set, the volume is processed in overlapping blocks across `workers` processes
+#          and the block meshes are welded back together (see mri_chunked).
+#          `offset` places a cropped mask (see isolate_components) back in full-volume voxel coordinates;
+#          `blocks` limits the chunked path to the given blocks (see mri_sparse).
+@profiled("marching_cubes")
+def marching_cubes_mesh(closed_data, level=0.5, block_size=None, workers=None, offset=None, blocks=None):
+    if block_size:
+        from mri_chunked import chunked_marching_cubes
+        verts, faces, normals = chunked_marching_cubes(closed_data, level=level, block_size=block_size, workers=workers,
+                                                       blocks=blocks)
+    else:
+        from skimage import measure
+        verts, faces, normals, values = measure.marching_cubes(closed_data, level=level)
+    if offset is not None:
+        verts += np.asarray(offset, dtype=verts.dtype)
+    verts[:, 2] = -verts[:, 2]
+    normals[:, 2] = -normals[:, 2]
+    return verts, faces, normals
+#####################################################################################################
@@ -0,0 +1,105 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Threshold Sweep
+======================================================================
+
+Runs the skull extraction at many thresholds while filtering the volume only once.
+The filtered volume is shared with the worker processes through a memory-mapped .npy,
+and each worker thresholds, closes and runs marching cubes for one iso-level.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from mri_io import load_tiff_volume, npy_backed
+from mri_surface import filter_volume, close_mask, marching_cubes_mesh
+
+
+_worker_filtered = None
+
+
+def _init_worker(filtered_path):
+    global _worker_filtered
+    _worker_filtered = np.load(filtered_path, mmap_mode='r')
+
+
+def _extract_at_threshold(threshold, ball_radius, filtered=None):
+    if filtered is None:
+        filtered = _worker_filtered
+    result = {"threshold": threshold}
+    start = time.perf_counter()
+    closed_data = close_mask(filtered, threshold=threshold, ball_radius=ball_radius)
+    result["closing_seconds"] = time.perf_counter() - start
+    result["voxels"] = int(np.count_nonzero(closed_data))
+
+    start = time.perf_counter()
+    try:
+        verts, faces, normals = marching_cubes_mesh(closed_data, level=0.5)
+        result["error"] = None
+    except (ValueError, RuntimeError) as e:
+        # Empty or full mask: no surface at this level
+        verts = np.zeros((0, 3), np.float32)
+        faces = np.zeros((0, 3), np.int32)
+        normals = np.zeros((0, 3), np.float32)
+        result["error"] = str(e)
+    result["marching_cubes_seconds"] = time.perf_counter() - start
+    result["seconds"] = result["closing_seconds"] + result["marching_cubes_seconds"]
+    result["verts"] = verts
+    result["faces"] = faces
+    result["normals"] = normals
+    result["triangles"] = len(faces)
+    return result
+
+
+#####################################################################################################
+# Function: sweep_thresholds(filtered_data, thresholds, ball_radius, workers)
+# Purpose: Produce the closed mask and marching-cubes mesh for every threshold from one filtered volume.
+def sweep_thresholds(filtered_data, thresholds, ball_radius=1, workers=None):
+    """
+    Returns one dict per threshold, in the order given, with plain numpy arrays
+    (verts, faces, normals) plus triangles, voxels and per-stage timings.
+    workers=1 runs in-process; otherwise a process pool of `workers` (default: CPU count).
+    """
+    thresholds = list(thresholds)
+    if workers is None:
+        workers = min(len(thresholds), os.cpu_count() or 1)
+    if workers <= 1 or len(thresholds) <= 1:
+        return [_extract_at_threshold(t, ball_radius, filtered=filtered_data) for t in thresholds]
+
+    # Share the filtered volume with the workers through the file system instead of pickling it per task
+    with npy_backed(filtered_data, prefix="mri_sweep_") as filtered_path:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(filtered_path,)) as pool:
+            futures = [pool.submit(_extract_at_threshold, t, ball_radius) for t in thresholds]
+            results = [f.result() for f in futures]
+    return results
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: sweep_file(file_path, thresholds, downsample, sigma, ball_radius, workers, cache)
+# Purpose: Load and filter a TIFF once (through the preprocessing cache if given), then sweep thresholds.
+def sweep_file(file_path, thresholds, downsample=4, sigma=0.7, ball_radius=1, workers=None, cache=None):
+    start = time.perf_counter()
+    if cache is not None:
+        from mri_cache import cached_filtered
+        filtered_data = cached_filtered(cache, file_path, downsample=downsample, sigma=sigma)
+    else:
+        volume_data, _, _ = load_tiff_volume(file_path, downsample=downsample)
+        filtered_data = filter_volume(volume_data, sigma=sigma)
+    print(f"Filtered volume {filtered_data.shape} in {time.perf_counter() - start:.2f}s")
+    return sweep_thresholds(filtered_data, thresholds, ball_radius=ball_radius, workers=workers)
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: print_sweep_summary(results)
+# Purpose: Print a per-threshold table of triangle counts and timings.
+def print_sweep_summary(results):
+    print(f"{'threshold':>10}{'voxels':>12}{'triangles':>12}{'closing [s]':>13}{'mcubes [s]':>12}")
+    for r in results:
+        print(f"{r['threshold']:>10.3f}{r['voxels']:>12}{r['triangles']:>12}"
+              f"{r['closing_seconds']:>13.3f}{r['marching_cubes_seconds']:>12.3f}"
+              + ("" if r["error"] is None else "  (no surface)"))
+#####################################################################################################
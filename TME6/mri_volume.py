@@ -0,0 +1,169 @@
+"""
+======================================================================
+ Title:                   T1 MRI Head Reconstruction Lab – Direct Volume Rendering
+======================================================================
+
+Renders the scan itself instead of an iso-surface. The normalized (or filtered) volume is
+written once to an OpenVDB grid and loaded as a Blender volume object, whose material maps
+the voxel value to colour and density through a transfer function:
+
+    Attribute "density" -> Color Ramp (transfer function) -> Principled Volume
+                                  color -> Color, alpha * density_scale -> Density
+
+A tissue class is a set of ramp stops, so changing what is visible is a shader edit
+(set_transfer_function) with no re-thresholding, no marching cubes and no geometry upload.
+The grid is sparse: voxels within `tolerance` of the background are not stored.
+
+Grid axes follow the marching-cubes vertices (array axis 0 -> X, 1 -> Y, 2 -> -Z, as in
+marching_cubes_mesh), so a volume and a surface extracted from the same array line up.
+Writing needs the openvdb module that ships with Blender (pyopenvdb before Blender 4.4);
+bpy is imported inside the Blender-side functions only.
+"""
+
+import numpy as np
+
+from mri_profile import profiled
+
+# Transfer functions over the normalized T1 intensity: (position, (r, g, b, opacity)) stops and a density
+# scale. In T1, air and cortical bone are dark, grey/white matter mid-grey, fat and scalp bright.
+TRANSFER_FUNCTIONS = {
+    "skin": {
+        "stops": [(0.55, (0.9, 0.7, 0.6, 0.0)), (0.7, (0.95, 0.75, 0.65, 0.6)), (1.0, (1.0, 0.85, 0.75, 1.0))],
+        "density_scale": 2.0,
+    },
+    "brain": {
+        "stops": [(0.3, (0.8, 0.6, 0.6, 0.0)), (0.4, (0.9, 0.7, 0.7, 0.8)), (0.6, (1.0, 0.85, 0.85, 0.8)),
+                  (0.7, (1.0, 0.9, 0.9, 0.0))],
+        "density_scale": 1.0,
+    },
+    "skull": {
+        "stops": [(0.04, (0.9, 0.9, 0.85, 0.0)), (0.08, (0.95, 0.95, 0.9, 1.0)), (0.2, (0.95, 0.95, 0.9, 1.0)),
+                  (0.28, (0.95, 0.95, 0.9, 0.0))],
+        "density_scale": 4.0,
+    },
+}
+
+GRID_NAME = "density"
+LEAF_SIZE = 8  # voxels per axis of an OpenVDB leaf node
+
+
+def _openvdb():
+    try:
+        import openvdb
+    except ImportError:
+        try:
+            import pyopenvdb as openvdb
+        except ImportError:
+            raise ImportError("Writing VDB grids needs the openvdb module bundled with Blender "
+                              "(run inside Blender, or install OpenVDB's Python bindings)") from None
+    return openvdb
+
+
+#####################################################################################################
+# Function: grid_array(volume)
+# Purpose: The volume in grid axis order: axis 2 reversed so index k maps to Z = -k as in marching_cubes_mesh.
+#          Returns (array, ijk origin of its first voxel).
+def grid_array(volume):
+    volume = np.asarray(volume, dtype=np.float32)
+    return np.ascontiguousarray(volume[:, :, ::-1]), (0, 0, -(volume.shape[2] - 1))
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: sparse_footprint(volume, tolerance, background)
+# Purpose: Active voxels and active 8^3 leaves of the grid a sparse VDB would store, and its approximate memory
+#          (a dense float leaf per active leaf plus its masks), without needing openvdb.
+def sparse_footprint(volume, tolerance=0.0, background=0.0):
+    active = np.abs(np.asarray(volume, dtype=np.float32) - background) > tolerance
+    pad = [(0, -n % LEAF_SIZE) for n in active.shape]
+    padded = np.pad(active, pad) if any(p for _, p in pad) else active
+    nz, ny, nx = (n // LEAF_SIZE for n in padded.shape)
+    leaves = int(padded.reshape(nz, LEAF_SIZE, ny, LEAF_SIZE, nx, LEAF_SIZE).any(axis=(1, 3, 5)).sum())
+    leaf_bytes = LEAF_SIZE**3 * 4 + 2 * LEAF_SIZE**3 // 8 + 16
+    return {"active_voxels": int(active.sum()), "leaves": leaves, "estimated_bytes": leaves * leaf_bytes}
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: write_vdb(volume, path, tolerance, background, voxel_size)
+# Purpose: Write the volume as a float grid named GRID_NAME to a .vdb file. Voxels within `tolerance` of the
+#          background are pruned. Returns a dict with the active voxels, grid memory and file size.
+@profiled("write_vdb")
+def write_vdb(volume, path, tolerance=0.0, background=0.0, voxel_size=1.0):
+    import os
+    openvdb = _openvdb()
+    array, ijk = grid_array(volume)
+    grid = openvdb.FloatGrid(background)
+    grid.copyFromArray(array, ijk=ijk, tolerance=tolerance)
+    grid.name = GRID_NAME
+    grid.transform = openvdb.createLinearTransform(voxelSize=voxel_size)
+    openvdb.write(path, grids=[grid])
+    return {
+        "path": path,
+        "active_voxels": int(grid.activeVoxelCount()),
+        "memory_bytes": int(grid.memUsage()),
+        "file_bytes": os.path.getsize(path),
+    }
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: create_volume_object(vdb_path, name)
+# Purpose: Load a .vdb file as a Blender volume object linked to the scene collection.
+def create_volume_object(vdb_path, name="T1_Volume"):
+    import bpy
+    volume = bpy.data.volumes.new(name)
+    volume.filepath = vdb_path
+    volume.grids.load()
+    obj = bpy.data.objects.new(name, volume)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: create_transfer_material(name, transfer)
+# Purpose: Volume material mapping the grid value through a Color Ramp transfer function (preset name or dict).
+def create_transfer_material(name="T1_Transfer", transfer="skull"):
+    import bpy
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    nodes.clear()
+    attribute = nodes.new("ShaderNodeAttribute")
+    attribute.attribute_name = GRID_NAME
+    ramp = nodes.new("ShaderNodeValToRGB")
+    ramp.name = "Transfer"
+    scale = nodes.new("ShaderNodeMath")
+    scale.name = "DensityScale"
+    scale.operation = 'MULTIPLY'
+    shader = nodes.new("ShaderNodeVolumePrincipled")
+    output = nodes.new("ShaderNodeOutputMaterial")
+    links.new(attribute.outputs["Fac"], ramp.inputs["Fac"])
+    links.new(ramp.outputs["Color"], shader.inputs["Color"])
+    links.new(ramp.outputs["Alpha"], scale.inputs[0])
+    links.new(scale.outputs["Value"], shader.inputs["Density"])
+    links.new(shader.outputs["Volume"], output.inputs["Volume"])
+    set_transfer_function(material, transfer)
+    return material
+#####################################################################################################
+
+
+#####################################################################################################
+# Function: set_transfer_function(material, transfer)
+# Purpose: Replace the ramp stops and density scale of a transfer material; the volume object is not touched.
+def set_transfer_function(material, transfer):
+    settings = TRANSFER_FUNCTIONS[transfer] if isinstance(transfer, str) else transfer
+    nodes = material.node_tree.nodes
+    ramp = nodes["Transfer"].color_ramp
+    stops = sorted(settings["stops"])
+    while len(ramp.elements) > 1:
+        ramp.elements.remove(ramp.elements[-1])
+    ramp.elements[0].position = stops[0][0]
+    ramp.elements[0].color = stops[0][1]
+    for position, color in stops[1:]:
+        ramp.elements.new(position).color = color
+    nodes["DensityScale"].inputs[1].default_value = settings["density_scale"]
+    return settings
+#####################################################################################################